@@ -0,0 +1 @@
+"""Benchmarks for the demo data generators"""
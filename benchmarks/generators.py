@@ -0,0 +1,323 @@
+"""
+Time the generators, and the whole coordinator, at increasing sizes.
+
+Every case runs in a fresh worker process, so memory peaks do not carry
+over from one case to the next. For each case and size the best wall time
+of a few runs is kept, with the records generated per second and the peak
+memory growth during the run (from the peak resident set size, as Python 2
+has no tracemalloc).
+
+Run with ``python -m benchmarks.generators``, writing the results to JSON
+with ``--output`` and comparing them with an earlier run's with
+``--baseline``, which lists the regressions and exits with status 1 if
+there are any.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from demo_data_generators.admissions import AdmissionsGenerator
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.news import NewsGenerator
+from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.placements import PlacementsGenerator
+from demo_data_generators.spells import SpellsGenerator
+from demo_data_generators.users import UsersGenerator
+from demo_data_generators.ward_strategy import WardStrategy
+
+# Wards, patients per ward and days of history of each size
+SIZES = [
+    ('small', 1, 40, 2),
+    ('medium', 3, 100, 4),
+    ('large', 5, 200, 7),
+]
+CASES = ['patients', 'spells', 'admissions', 'placements', 'news', 'users',
+         'coordinator']
+REPEAT = 3
+# Slowdown (or memory growth) over the baseline reported as a regression
+THRESHOLD = 0.2
+# Changes too small to tell from noise, in seconds and KiB
+NOISE = {'seconds': 0.05, 'peak_memory_kb': 1024}
+
+# Patients in bed the coordinator's ward risk profiles are made for
+WARD_BEDS = 28
+RISK_DISTRIBUTION = {'high': 0.1, 'medium': 0.15, 'low': 0.5, 'none': 0.25}
+
+PARSER = argparse.ArgumentParser('Benchmark the demo data generators')
+PARSER.add_argument('--sizes', type=str,
+                    help='CSV list of sizes to run, out of {0}'.format(
+                        ', '.join(size[0] for size in SIZES)),
+                    default=','.join(size[0] for size in SIZES))
+PARSER.add_argument('--cases', type=str,
+                    help='CSV list of cases to run, out of {0}'.format(
+                        ', '.join(CASES)),
+                    default=','.join(CASES))
+PARSER.add_argument('--repeat', type=int,
+                    help='Runs of every case, the best one is kept',
+                    default=REPEAT)
+PARSER.add_argument('--output', type=str,
+                    help='File to write the results to, as JSON')
+PARSER.add_argument('--baseline', type=str,
+                    help='Results of an earlier run to compare with')
+PARSER.add_argument('--threshold', type=float,
+                    help='Relative slowdown or memory growth over the '
+                         'baseline reported as a regression',
+                    default=THRESHOLD)
+
+
+def count_records(generator):
+    """Return the number of records in a generator's tree."""
+    return len(generator.data.findall('record'))
+
+
+def count_files_records(folder):
+    """Return the number of records in the XML files under a folder."""
+    records = 0
+    for path, _, names in os.walk(folder):
+        for name in names:
+            if name.endswith('.xml'):
+                with open(os.path.join(path, name)) as xml_file:
+                    records += xml_file.read().count('<record ')
+    return records
+
+
+def get_users_schema(patients):
+    """Users for wards of so many patients."""
+    per_ward = max(1, patients // 8)
+    return {
+        'hca': {'total': per_ward, 'per_ward': per_ward, 'unassigned': 5},
+        'nurse': {'total': per_ward, 'per_ward': per_ward, 'unassigned': 5},
+        'doctor': {'total': 1, 'per_ward': 1, 'unassigned': 1},
+        'ward_manager': {'total': 1, 'per_ward': 1, 'unassigned': 1},
+        'admin': {'total': 1, 'per_ward': 0, 'unassigned': 0,
+                  'multi_wards': 'all'}
+    }
+
+
+class Ward(object):
+    """The inputs of the generators for a ward, built before timing."""
+
+    def __init__(self, index, patients, history_days):
+        self.name = chr(ord('a') + index)
+        self.in_bed = patients * 7 // 10
+        self.out_bed = patients - self.in_bed
+        self.history_days = history_days
+        self.patients = PatientsGenerator(index * patients + 1, self.in_bed,
+                                          self.out_bed, self.name, seed=1)
+        self.offsets = [
+            -(1 + number % history_days)
+            for number in xrange(len(self.patients.patients))
+        ]
+        for patient, offset in zip(self.patients.patients, self.offsets):
+            patient.admit_offset = offset
+
+    def get_strategy(self):
+        """Return a fresh strategy for the ward's patients in bed."""
+        # Placing the patients gives them the ids NEWS refers to
+        PlacementsGenerator(self.patients, self.offsets)
+        news_patients = [
+            patient for patient in self.patients.patients if patient.in_bed]
+        risk_distribution = dict(
+            (risk, int(ratio * len(news_patients)))
+            for risk, ratio in RISK_DISTRIBUTION.iteritems())
+        risk_distribution['none'] += \
+            len(news_patients) - sum(risk_distribution.values())
+        return WardStrategy(news_patients, ['user_1', 'user_2'],
+                            risk_distribution, 0.5, [30], seed=1,
+                            ward=self.name)
+
+
+def setup_case(case, wards, patients, history_days):
+    """
+    Build the inputs of a case and return the run to time.
+
+    :return: function running the case, returning the records generated
+    :rtype: callable
+    """
+    if case == 'coordinator':
+        folder = tempfile.mkdtemp()
+        in_bed = min(WARD_BEDS, patients * 7 // 10)
+
+        def run_coordinator():
+            try:
+                DemoDataCoordinator(DemoDataConfig(
+                    [chr(ord('a') + index) for index in xrange(wards)],
+                    patients, in_bed, patients - in_bed,
+                    get_users_schema(patients), folder,
+                    history_days=history_days, seed=1, cache=False)).run()
+                return count_files_records(folder)
+            finally:
+                shutil.rmtree(folder)
+        return run_coordinator
+
+    ward_list = [Ward(index, patients, history_days)
+                 for index in xrange(wards)]
+
+    if case == 'users':
+        def run_users():
+            users = UsersGenerator(get_users_schema(patients))
+            users.generate_multi_wards_users([ward.name for ward in ward_list])
+            users.generate_users_not_assigned()
+            records = len(users.class_data.findall('record'))
+            for ward in ward_list:
+                root = users.generate_users_per_ward(ward.name, ward.in_bed)
+                records += len(root.findall('data/record'))
+            return records
+        return run_users
+
+    if case == 'news':
+        strategies = [ward.get_strategy() for ward in ward_list]
+
+        def run_news():
+            return sum(count_records(NewsGenerator(strategy, 0, 0, 0))
+                       for strategy in strategies)
+        return run_news
+
+    generator_class = {
+        'spells': SpellsGenerator,
+        'admissions': AdmissionsGenerator,
+        'placements': PlacementsGenerator
+    }.get(case)
+    if generator_class is not None:
+        def run_generator():
+            return sum(
+                count_records(generator_class(ward.patients, ward.offsets))
+                for ward in ward_list)
+        return run_generator
+
+    if case == 'patients':
+        def run_patients():
+            return sum(
+                count_records(PatientsGenerator(
+                    index * patients + 1, ward.in_bed, ward.out_bed,
+                    ward.name, seed=1))
+                for index, ward in enumerate(ward_list))
+        return run_patients
+
+    raise ValueError('Unknown case: {0}'.format(case))
+
+
+def run_case(args):
+    """
+    Run a case once, in a worker process.
+
+    :param args: case, then the wards, patients and days of history
+    :type args: tuple
+    :return: wall time, records generated and peak memory growth in KiB
+    :rtype: tuple
+    """
+    run = setup_case(*args)
+    gc.collect()
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    records = run()
+    seconds = time.time() - start
+    peak_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, records, peak_after - peak_before
+
+
+def measure(case, wards, patients, history_days, repeat):
+    """
+    Return the best of a few runs of a case, each in a fresh process.
+
+    :return: result of the case
+    :rtype: dict
+    """
+    runs = []
+    for _ in xrange(repeat):
+        pool = Pool(1)
+        try:
+            runs.append(pool.apply(run_case,
+                                   ((case, wards, patients, history_days),)))
+        finally:
+            pool.close()
+            pool.join()
+    seconds, records, _ = min(runs)
+    return {
+        'seconds': round(seconds, 4),
+        'records': records,
+        'records_per_second': int(records / seconds) if seconds else None,
+        'peak_memory_kb': min(run[2] for run in runs)
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the results worse than the baseline by more than the threshold.
+
+    :param results: results of this run
+    :type results: dict
+    :param baseline: results of an earlier run
+    :type baseline: dict
+    :param threshold: relative slowdown or memory growth tolerated
+    :type threshold: float
+    :return: case, size, measure, baseline value and value of every
+             regression
+    :rtype: list
+    """
+    regressions = []
+    for key, result in sorted(results['results'].iteritems()):
+        previous = baseline['results'].get(key)
+        if previous is None:
+            continue
+        case, size = key.split('/')
+        for name, noise in sorted(NOISE.iteritems()):
+            if result[name] > max(previous[name] * (1 + threshold),
+                                  previous[name] + noise):
+                regressions.append(
+                    (case, size, name, previous[name], result[name]))
+    return regressions
+
+
+def main():
+    args = PARSER.parse_args()
+    sizes = [size for size in SIZES if size[0] in args.sizes.split(',')]
+    cases = [case for case in CASES if case in args.cases.split(',')]
+
+    results = {
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'results': {}
+    }
+    print('{0:<12} {1:<7} {2:>9} {3:>9} {4:>11} {5:>10}'.format(
+        'case', 'size', 'seconds', 'records', 'records/s', 'peak KiB'))
+    for name, wards, patients, history_days in sizes:
+        for case in cases:
+            result = measure(case, wards, patients, history_days,
+                             args.repeat)
+            result.update({'wards': wards, 'patients': patients,
+                           'history_days': history_days})
+            results['results']['{0}/{1}'.format(case, name)] = result
+            print('{0:<12} {1:<7} {2:>9.3f} {3:>9} {4:>11} {5:>10}'.format(
+                case, name, result['seconds'], result['records'],
+                result['records_per_second'], result['peak_memory_kb']))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        for case, size, name, previous, value in regressions:
+            print('REGRESSION {0} {1} {2}: {3} -> {4}'.format(
+                case, size, name, previous, value))
+        if regressions:
+            return 1
+        print('No regressions against {0}'.format(args.baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Compare stamping NEWS and notification records from compiled templates
+against building them one ``SubElement`` at a time, as ``NewsGenerator``
+did before templates.
+
+The baseline is ``SubElementTemplate``, a template building every field of
+every record with ``SubElement``. Both generators write to a file, keeping
+the records in a tree and streaming them, and the files must be byte for
+byte the same. Elements allocated are counted on both paths: kept records
+build their own fields, streamed records share the fixed ones.
+
+Run with ``python -m benchmarks.news_templates``.
+"""
+import filecmp
+import gc
+import os
+import shutil
+import tempfile
+import time
+from xml.etree.ElementTree import SubElement
+
+from demo_data_generators.news import NewsGenerator
+from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.placements import PlacementsGenerator
+from demo_data_generators.sinks import StreamingXMLSink, write_xml
+from demo_data_generators.templates import RecordTemplate
+from demo_data_generators.ward_strategy import patients_factory, WardStrategy
+
+PATIENTS = 200
+HISTORY_DAYS = 7
+REPEAT = 5
+
+
+class SubElementTemplate(RecordTemplate):
+    """A template building every field of every record with SubElement."""
+
+    def __init__(self, model, fields, share=False):
+        super(SubElementTemplate, self).__init__(model, fields, share=share)
+        self.shape = list(fields)
+
+    def stamp(self, parent, record_id, *values):
+        record = SubElement(parent, 'record',
+                            {'model': self.model, 'id': record_id})
+        values = iter(values)
+        for name, kind, value in self.shape:
+            if value is None:
+                value = next(values)
+            if kind == 'text':
+                field = SubElement(record, 'field', {'name': name})
+                field.text = value
+            else:
+                SubElement(record, 'field', {'name': name, kind: value})
+        return record
+
+
+class SubElementNewsGenerator(NewsGenerator):
+    """NewsGenerator building every record field by field."""
+
+    template_class = SubElementTemplate
+
+
+class CountingSink(StreamingXMLSink):
+    """
+    Stream records to a file, keeping hold of every element written so the
+    elements allocated can be counted (ids are not reused).
+    """
+
+    def __init__(self, path):
+        super(CountingSink, self).__init__(path)
+        self.elements = []
+
+    def flush(self):
+        for element in self.data:
+            self.elements.extend(element.iter())
+        super(CountingSink, self).flush()
+
+
+def build_strategy():
+    """A ward of patients admitted a week ago, at every risk."""
+    patients = PatientsGenerator(1, PATIENTS, 0, 'a', seed=1)
+    offsets = [-HISTORY_DAYS] * PATIENTS
+    placements = PlacementsGenerator(patients, offsets)
+    quarter = PATIENTS // 4
+    risk_distribution = {'high': quarter, 'medium': quarter, 'low': quarter,
+                         'none': PATIENTS - 3 * quarter}
+    return WardStrategy(
+        patients_factory(placements.root, placements.admit_offsets), ['user'],
+        risk_distribution, 0.5, [30], seed=1, ward='a')
+
+
+def count_elements(elements):
+    """Count elements, and the distinct ones allocated."""
+    return len(elements), len(set(id(element) for element in elements))
+
+
+def measure(generator, folder):
+    """
+    Time a generator keeping its records and streaming them, and count the
+    elements allocated on both paths.
+
+    :return: timings, element counts and the paths of the files written
+    :rtype: dict
+    """
+    timings = {'tree': [], 'stream': []}
+    for _ in xrange(REPEAT):
+        strategy = build_strategy()
+        gc.collect()
+        start = time.time()
+        news = generator(strategy, 0, 0, 0)
+        timings['tree'].append(time.time() - start)
+
+        strategy = build_strategy()
+        sink = StreamingXMLSink(os.devnull)
+        gc.collect()
+        start = time.time()
+        generator(strategy, 0, 0, 0, sink=sink)
+        sink.close()
+        timings['stream'].append(time.time() - start)
+
+    tree_path = os.path.join(folder, '{0}_tree.xml'.format(generator.__name__))
+    write_xml(news.root, tree_path)
+    tree_elements = count_elements(list(news.root.iter()))
+
+    stream_path = os.path.join(folder,
+                               '{0}_stream.xml'.format(generator.__name__))
+    sink = CountingSink(stream_path)
+    generator(build_strategy(), 0, 0, 0, sink=sink)
+    sink.close()
+    return {'tree': min(timings['tree']), 'stream': min(timings['stream']),
+            'tree_elements': tree_elements,
+            'stream_elements': count_elements(sink.elements),
+            'paths': (tree_path, stream_path)}
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    try:
+        results = [(name, measure(generator, folder)) for name, generator in
+                   [('SubElement', SubElementNewsGenerator),
+                    ('templates', NewsGenerator)]]
+        for baseline_path, path in zip(results[0][1]['paths'],
+                                       results[1][1]['paths']):
+            if not filecmp.cmp(baseline_path, path, False):
+                raise AssertionError('Templates produce different XML')
+    finally:
+        shutil.rmtree(folder)
+
+    print('{0} patients over {1} days, best of {2}'.format(
+        PATIENTS, HISTORY_DAYS, REPEAT))
+    for name, result in results:
+        print('{0:<12} tree {1:.3f}s  stream {2:.3f}s'.format(
+            name, result['tree'], result['stream']))
+        for path in ('tree', 'stream'):
+            elements, allocated = result['{0}_elements'.format(path)]
+            print('{0:<12} {1:<6} {2} elements allocated for {3}'.format(
+                '', path, allocated, elements))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare pretty printing while writing against the recursive indent pass it
+replaced, on the default 5 ward dataset.
+
+Run with ``python -m benchmarks.pretty_print``.
+"""
+import copy
+import gc
+import os
+import random
+import shutil
+import tempfile
+import time
+from xml.etree.ElementTree import ElementTree
+
+from demo_data_generators.admissions import AdmissionsGenerator
+from demo_data_generators.locations import LocationsGenerator
+from demo_data_generators.news import NewsGenerator
+from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.placements import PlacementsGenerator
+from demo_data_generators.sinks import write_xml
+from demo_data_generators.spells import SpellsGenerator
+from demo_data_generators.ward_strategy import patients_factory, WardStrategy
+
+WARDS = ['a', 'b', 'c', 'd', 'e']
+REPEAT = 5
+
+
+def indent(elem, level=0):
+    """The recursive indent pass DemoDataCoordinator used to run."""
+    i = "\n" + level*"  "
+    if len(elem):
+        if not elem.text or not elem.text.strip():
+            elem.text = i + "  "
+        if not elem.tail or not elem.tail.strip():
+            elem.tail = i
+        for elem in elem:
+            indent(elem, level+1)
+        if not elem.tail or not elem.tail.strip():
+            elem.tail = i
+    else:
+        if level and (not elem.tail or not elem.tail.strip()):
+            elem.tail = i
+
+
+def build_trees():
+    """Generate the in-memory trees for the default dataset."""
+    trees = []
+    for index, ward in enumerate(WARDS):
+        patients = PatientsGenerator(index * 40 + 1, 28, 12, ward)
+        offsets = [random.choice([-1, -2]) for _ in range(40)]
+        placements = PlacementsGenerator(patients, offsets)
+        strategy = WardStrategy(
+            patients_factory(placements.root, placements.admit_offsets),
+            ['user'], {'high': 3, 'medium': 4, 'low': 20, 'none': 1}, 0.5,
+            [30])
+        trees.extend([
+            LocationsGenerator(ward, 30).root, patients.root,
+            SpellsGenerator(patients, offsets).root,
+            AdmissionsGenerator(patients, offsets).root, placements.root,
+            NewsGenerator(strategy, 0, 0, 0).root,
+        ])
+    return trees
+
+
+def indent_and_write(trees, folder):
+    for number, root in enumerate(trees):
+        indent(root)
+        ElementTree(root).write(os.path.join(folder, '{0}.xml'.format(number)))
+
+
+def write_pretty(trees, folder):
+    for number, root in enumerate(trees):
+        write_xml(root, os.path.join(folder, '{0}.xml'.format(number)))
+
+
+def write_compact(trees, folder):
+    for number, root in enumerate(trees):
+        write_xml(root, os.path.join(folder, '{0}.xml'.format(number)),
+                  compact=True)
+
+
+def main():
+    trees = build_trees()
+    records = sum(len(root[0]) for root in trees)
+    folder = tempfile.mkdtemp()
+    try:
+        print('{0} records in {1} files, best of {2}'.format(
+            records, len(trees), REPEAT))
+        for name, writer in [('indent + ElementTree.write', indent_and_write),
+                             ('write_xml', write_pretty),
+                             ('write_xml compact', write_compact)]:
+            timings = []
+            for _ in xrange(REPEAT):
+                # Fresh copies each run, indent leaves whitespace behind
+                copies = copy.deepcopy(trees)
+                gc.collect()
+                start = time.time()
+                writer(copies, folder)
+                timings.append(time.time() - start)
+            print('{0:<28} {1:.3f}s'.format(name, min(timings)))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
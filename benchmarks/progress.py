@@ -0,0 +1,75 @@
+"""
+Measure what reporting progress costs the NEWS generator.
+
+The reporter is told about every patient, so its cost is paid once per
+patient rather than per observation. This times a ward with no reporter,
+with one logging every 10 seconds (as when not on a terminal), one
+redrawing a terminal line 5 times a second and, as a worst case, one
+redrawing it after every patient.
+
+Run with ``python -m benchmarks.progress``.
+"""
+import gc
+import logging
+import os
+import time
+from StringIO import StringIO
+
+from benchmarks.news_templates import build_strategy
+from demo_data_generators.news import NewsGenerator
+from demo_data_generators.progress import ProgressReporter
+from demo_data_generators.sinks import StreamingXMLSink
+
+REPEAT = 3
+
+
+class Terminal(StringIO):
+    """A stream passing for a terminal."""
+
+    def isatty(self):
+        return True
+
+
+def get_reporters(patients):
+    """Return the reporters to time, by name."""
+    return [
+        ('none', lambda: None),
+        ('log 10s', lambda: ProgressReporter(1, patients, StringIO())),
+        ('tty 0.2s', lambda: ProgressReporter(1, patients, Terminal())),
+        ('tty always', lambda: ProgressReporter(1, patients, Terminal(),
+                                                interval=0)),
+    ]
+
+
+def main():
+    # Logged reports go nowhere, only their cost counts
+    logging.basicConfig(level=logging.INFO, stream=StringIO())
+    patients = len(build_strategy().patients)
+    reporters = get_reporters(patients)
+    timings = dict((name, []) for name, _ in reporters)
+    # Taking turns, so a slower spell of the machine hits them all
+    for _ in xrange(REPEAT):
+        for name, reporter_factory in reporters:
+            strategy = build_strategy()
+            sink = StreamingXMLSink(os.devnull)
+            progress = reporter_factory()
+            if progress is not None:
+                progress.start_ward([sink])
+            gc.collect()
+            start = time.time()
+            news = NewsGenerator(strategy, 0, 0, 0, sink=sink,
+                                 progress=progress)
+            timings[name].append(time.time() - start)
+            sink.close()
+    results = [(name, min(timings[name])) for name, _ in reporters]
+
+    print('{0} records for {1} patients, best of {2}'.format(
+        sum(news.sink.models.values()), patients, REPEAT))
+    baseline = results[0][1]
+    for name, timing in results:
+        print('{0:<12} {1:.3f}s  {2:+.1f}%'.format(
+            name, timing, 100 * (timing - baseline) / baseline))
+
+
+if __name__ == '__main__':
+    main()
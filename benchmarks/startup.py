@@ -0,0 +1,66 @@
+"""
+Time how long each console script takes to start, running ``--help`` in a
+fresh interpreter, and count the modules it imports to get there.
+
+Run with ``python -m benchmarks.startup``.
+"""
+import os
+import subprocess
+import sys
+import time
+
+# Console scripts (see setup.py) and the module each one runs
+SCRIPTS = [
+    ('generate_openeobs_demo_data', 'demo_data_generators.__main__'),
+    ('run_smoke_tests', 'smoketest.__main__'),
+    ('setup_openeobs_demo', 'demo_setup_tools.__main__'),
+    ('change_odoo_admin_password', 'security.__main__'),
+    ('refresh_openeobs_demo', 'demo_refresh_tools.__main__'),
+]
+REPEAT = 10
+
+# Parse --help the way the script would, and report what got imported
+COUNT_MODULES = '''
+import sys
+sys.argv = ['{0}', '--help']
+import {1} as script
+try:
+    script.main()
+except SystemExit:
+    pass
+sys.stderr.write('%d' % len([m for m in sys.modules.values() if m]))
+'''
+
+
+def time_command(arguments):
+    """Return the best wall time of running the interpreter."""
+    timings = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in xrange(REPEAT):
+            start = time.time()
+            subprocess.check_call([sys.executable] + arguments,
+                                  stdout=devnull)
+            timings.append(time.time() - start)
+    return min(timings)
+
+
+def count_modules(name, module):
+    """Return the number of modules loaded by the time --help is shown."""
+    with open(os.devnull, 'w') as devnull:
+        process = subprocess.Popen(
+            [sys.executable, '-c', COUNT_MODULES.format(name, module)],
+            stdout=devnull, stderr=subprocess.PIPE)
+        return int(process.communicate()[1])
+
+
+def main():
+    print('{0:<28} {1:.3f}s, best of {2}'.format(
+        'python (baseline)', time_command(['-c', 'pass']), REPEAT))
+    for name, module in SCRIPTS:
+        print('{0:<28} {1:.3f}s {2:>4} modules'.format(
+            name, time_command(['-m', module, '--help']),
+            count_modules(name, module)))
+
+
+if __name__ == '__main__':
+    main()
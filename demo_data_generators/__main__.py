@@ -4,7 +4,7 @@ import sys
 import os
 import argparse
 import json
-from demo_data_generators.demo_data_coordinator import DemoDataCoordinator
+import logging
 
 DEFAULT_USERS = '{"doctor": {"unassigned": 4, "total": 24, "per_ward": 4}, ' \
                 '"admin": {"unassigned": 0, "multi_wards": "all", "total": 1' \
@@ -32,6 +32,64 @@ PARSER.add_argument('--patientsnotinbed', type=int,
                     help='Number of patients not in a bed', default=12)
 PARSER.add_argument('--users', type=str,
                     help='JSON for user break down', default=DEFAULT_USERS)
+PARSER.add_argument('--jobs', type=int,
+                    help='Number of processes generating wards in parallel',
+                    default=1)
+PARSER.add_argument('--compact', action='store_true',
+                    help='Write the XML files without indentation')
+PARSER.add_argument('--seed', type=int,
+                    help='Seed making the generated data reproducible',
+                    default=None)
+PARSER.add_argument('--no-cache', action='store_true',
+                    help='Generate every ward, even those whose inputs have '
+                         'not changed since the last seeded run')
+PARSER.add_argument('--demographics-pool', type=str,
+                    help='File to keep the names pool in between runs, '
+                         'written on first use',
+                    default=None)
+PARSER.add_argument('--history-days', type=int,
+                    help='Days of history to admit patients and generate '
+                         'observations over',
+                    default=2)
+PARSER.add_argument('--format', type=str, choices=['xml', 'csv', 'copy'],
+                    help='Also write the data as one CSV file per model and '
+                         'set of fields, numbered in load order, to the csv '
+                         'folder, for Odoo\'s load() (csv), or the '
+                         'patients, activities and NEWS observations as '
+                         'PostgreSQL COPY files to the copy folder, with '
+                         'the rest of the data as XML files leaving them '
+                         'out (copy)',
+                    default='xml')
+PARSER.add_argument('--copy-first-id', type=int,
+                    help='First database id given to the rows of each table '
+                         'in the COPY files',
+                    default=1000000)
+PARSER.add_argument('--shard-size', type=int,
+                    help='Split every data file into files of at most this '
+                         'many records, listed in load order in '
+                         'manifest.json',
+                    default=None)
+PARSER.add_argument('--profile', type=str, metavar='DIR',
+                    help='Profile every stage of the run (POS, users, then '
+                         'locations, patients, spells, admissions, '
+                         'placements, NEWS and writing of each ward), '
+                         'writing the profiles, memory usage and a summary '
+                         'to this folder. Cached wards are not profiled.',
+                    default=None)
+PARSER.add_argument('--metrics', action='store_true',
+                    help='Write metrics.json to the data folder: records '
+                         'per model and risk band, bytes per file and ward, '
+                         'time and records per second per generator')
+PARSER.add_argument('--prometheus', type=str, metavar='FILE',
+                    help='Also write the metrics to this file, in the '
+                         'Prometheus text format',
+                    default=None)
+PARSER.add_argument('--index', action='store_true',
+                    help='Write index.sqlite to the data folder: logins by '
+                         'role and ward, patients by bed and spells by '
+                         'patient, for get_users_by_role and load tests')
+PARSER.add_argument('--quiet', action='store_true',
+                    help='Do not report the progress of the run')
 
 
 def main():
@@ -39,12 +97,29 @@ def main():
     Parse the args and generate the demo data
     """
     args = PARSER.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # Imported once the arguments are parsed, so --help stays quick
+    from demo_data_generators.demo_data_coordinator import \
+        DemoDataConfig, DemoDataCoordinator
     data_folder = args.data_folder
     wards = args.wards
     beds_per_ward = args.beds
     bed_patient_per_ward = args.patientsinbed
     non_bed_patient_per_ward = args.patientsnotinbed
     users_schema = args.users
+    jobs = args.jobs
+    compact = args.compact
+    history_days = args.history_days
+    seed = args.seed
+    cache = not args.no_cache
+    demographics_file = args.demographics_pool
+    output_format = args.format
+    copy_first_id = args.copy_first_id
+    shard_size = args.shard_size
+    profile_folder = args.profile
+    metrics = args.metrics
+    prometheus_path = args.prometheus
+    index = args.index
 
     if wards:
         wards = wards.replace(' ', '').split(',')
@@ -52,13 +127,34 @@ def main():
         users_schema = json.loads(users_schema)
     if data_folder:
         data_folder = sanitise_data_folder(data_folder)
+    if profile_folder:
+        profile_folder = sanitise_data_folder(profile_folder)
 
-    DemoDataCoordinator(wards=wards,
-                        beds_per_ward=beds_per_ward,
-                        bed_patient_per_ward=bed_patient_per_ward,
-                        non_bed_patient_per_ward=non_bed_patient_per_ward,
-                        users_schema=users_schema,
-                        data_folder=data_folder)
+    config = DemoDataConfig(
+        wards=wards,
+        beds_per_ward=beds_per_ward,
+        bed_patient_per_ward=bed_patient_per_ward,
+        non_bed_patient_per_ward=non_bed_patient_per_ward,
+        users_schema=users_schema,
+        data_folder=data_folder,
+        jobs=jobs,
+        compact=compact,
+        history_days=history_days,
+        seed=seed,
+        cache=cache,
+        demographics_file=demographics_file,
+        output_format=output_format,
+        copy_first_id=copy_first_id,
+        shard_size=shard_size,
+        profile_folder=profile_folder,
+        metrics=metrics,
+        prometheus_path=prometheus_path,
+        progress=not args.quiet,
+        index=index)
+    coordinator = DemoDataCoordinator(config)
+    coordinator.run()
+    if coordinator.profiler is not None:
+        print(coordinator.profiler.get_summary())
 
 
 def sanitise_data_folder(folder_path):
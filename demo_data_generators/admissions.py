@@ -1,43 +1,30 @@
 # pylint: disable=C0103
 """Generates admissions"""
-from xml.etree.ElementTree import Element, SubElement, Comment
-import re
+from xml.etree.ElementTree import SubElement, Comment
+
+from demo_data_generators.sinks import TreeSink
 
 
 class AdmissionsGenerator(object):
     """Generates admissions"""
-    def __init__(self, patients, offsets):
-
-        # Create root element
-        self.root = Element('openerp')
+    def __init__(self, patients, offsets, sink=None):
 
-        # Create data inside root element
-        self.data = SubElement(self.root, 'data', {'noupdate': '1'})
+        # Records go to the sink, an in-memory tree unless told otherwise
+        self.sink = sink if sink is not None else TreeSink()
+        self.root = self.sink.root
+        self.data = self.sink.data
 
-        # Read the patient XML file
-        patient_data = patients.data
-        self.demo_patients = patient_data.findall('record')
+        # Patients as produced by the patients generator
+        self.demo_patients = patients.patients
 
         # List of time periods to randomly offset admissions
         self.offsets = offsets
         self.admit_date_eval_string = '(datetime.now() + timedelta({0}))' \
                                       '.strftime(\'%Y-%m-%d %H:%M:%S\')'
 
-        # Regex to use to get the ID for a patient from id attribute on record
-        patient_id_regex_string = r'nhc_demo_patient_(\d+)'
-        ward_regex_string = r'(nhc_def_conf_location_w\w)'
-        self.patient_id_regex = re.compile(patient_id_regex_string)
-        self.ward_regex = re.compile(ward_regex_string)
-
         # Generate the patient admissions
         self.admit_patients()
 
-    def remove_bed(self, bed_string):
-        """Removes a bed"""
-
-        ward_location = re.match(self.ward_regex, bed_string)
-        return ward_location.groups()[0]
-
     def generate_admit_movement_data(self, patient_id, patient, admit_offset):
         """Generate Admit Movement Data"""
         self.data.append(
@@ -74,13 +61,12 @@ class AdmissionsGenerator(object):
         """
         i = 0
         for patient in self.demo_patients:
-            patient_id_match = re.match(self.patient_id_regex,
-                                        patient.attrib['id'])
-            patient_id = patient_id_match.groups()[0]
+            patient_id = patient.id
             self.generate_adt_admit_data(patient_id, patient, self.offsets[i])
             self.generate_admission_data(patient_id, patient, self.offsets[i])
             self.generate_admit_movement_data(patient_id, patient,
                                               self.offsets[i])
+            self.sink.flush()
             i += 1
 
     def create_activity_admit_movement_record(self, patient_id, admit_offset):
@@ -187,14 +173,12 @@ class AdmissionsGenerator(object):
         )
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
 
@@ -312,14 +296,12 @@ class AdmissionsGenerator(object):
         )
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
 
@@ -356,18 +338,14 @@ class AdmissionsGenerator(object):
         )
 
         # Create patient ID
-        patient_identifier = patient\
-            .find('field[@name=\'patient_identifier\']').text
         patient_id_field = SubElement(activity_admit_record, 'field',
                                       {'name': 'patient_identifier'})
-        patient_id_field.text = patient_identifier
+        patient_id_field.text = patient.patient_identifier
 
         # Create Other ID
-        other_identifier = patient\
-            .find('field[@name=\'other_identifier\']').text
         other_id_field = SubElement(activity_admit_record, 'field',
                                     {'name': 'other_identifier'})
-        other_id_field.text = other_identifier
+        other_id_field.text = patient.other_identifier
 
     def update_activity_admit(self, patient_id):
         """Update activity admit"""
@@ -461,14 +439,12 @@ class AdmissionsGenerator(object):
         activity_admit_model.text = 'nh.clinical.patient.admission'
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
 
@@ -516,14 +492,12 @@ class AdmissionsGenerator(object):
         )
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
 
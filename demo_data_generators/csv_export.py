@@ -0,0 +1,300 @@
+"""
+Export the generated XML data files as CSV files for Odoo's ``load()``.
+
+Installing XML data makes Odoo parse every ``<record>``, evaluate every
+``eval`` and resolve every ``ref`` one at a time. ``load()``, the method
+behind Odoo's CSV import, takes whole batches of rows of a single model
+instead, and resolves external ids given in ``<field>/id`` columns itself.
+
+Every record becomes a row, its fields become columns:
+
+- ``ref`` fields and evals made of ``ref()`` calls (many2many commands)
+  become ``<field>/id`` columns of comma separated external ids
+- other evals are evaluated while exporting, so dates are relative to the
+  time of the export rather than of the install
+- reference fields (``'model,' + str(ref(...))``, such as the
+  ``data_ref`` of activities) cannot be given by external id to
+  ``load()``. They go to ``references.csv`` instead, as the model and
+  external id of the record, the field, and the model and external id of
+  the record it refers to. ``resolve_references`` sets them once every
+  file is loaded, as ``model,database id``. A record updating nothing but
+  reference fields of an earlier one is left out of the other files
+
+A file holds rows of a single model and the same columns, as ``load()``
+needs, and is only loaded after the files holding the records it refers
+to. Records in the same file may refer to the rows above them. The files
+are numbered in load order: ``001_nh.clinical.location.csv``, ...
+
+To load them, import the numbered files one after the other in the order of
+their numbers, then resolve ``references.csv``. The setup tool does both
+with ``--csv`` (``BulkLoader.load_csv_folder``).
+"""
+import csv
+import os
+from xml.etree.ElementTree import iterparse
+
+from demo_data_generators.xml_eval import REF_REGEX, REFERENCE_REGEX, \
+    ExternalId, evaluate, get_command_ids, qualify
+
+# File holding the reference fields, set once the other files are loaded
+REFERENCES_FILE = 'references.csv'
+
+REFERENCES_COLUMNS = ('model', 'id', 'field', 'value_model', 'value_id')
+
+
+def get_reference_values(references, ids):
+    """
+    Return the values to write to reference fields once loaded.
+
+    :param references: rows of ``references.csv``, as dicts
+    :type references: list
+    :param ids: database ids, by external id
+    :type ids: dict
+    :return: model, database id, field and ``model,database id`` value of
+             every reference field
+    :rtype: list
+    :raises ValueError: if an external id was not loaded
+    """
+    values = []
+    for reference in references:
+        missing = [xml_id for xml_id in
+                   (reference['id'], reference['value_id'])
+                   if xml_id not in ids]
+        if missing:
+            raise ValueError('External IDs not found: {0}'.format(
+                ', '.join(missing)))
+        values.append((reference['model'], ids[reference['id']],
+                       reference['field'], '{0},{1}'.format(
+                           reference['value_model'],
+                           ids[reference['value_id']])))
+    return values
+
+
+def resolve_references(client, folder):
+    """
+    Set the reference fields of ``references.csv``, once every other file
+    of the folder is loaded.
+
+    The external ids are resolved with one search per module, the fields
+    written with one call per model, field and value.
+
+    :param client: ERPPeek client, or anything with the same ``execute``
+    :param folder: folder of the CSV files
+    :type folder: str
+    :return: number of fields set
+    :rtype: int
+    """
+    with open(os.path.join(folder, REFERENCES_FILE), 'rb') as csv_file:
+        references = list(csv.DictReader(csv_file))
+    names_by_module = {}
+    for reference in references:
+        for xml_id in (reference['id'], reference['value_id']):
+            module, name = xml_id.split('.', 1)
+            names_by_module.setdefault(module, set()).add(name)
+    ids = {}
+    for module, names in sorted(names_by_module.iteritems()):
+        for data in client.execute(
+                'ir.model.data', 'search_read',
+                [['module', '=', module], ['name', 'in', sorted(names)]],
+                ['module', 'name', 'res_id']):
+            ids['{0}.{1}'.format(data['module'], data['name'])] = \
+                data['res_id']
+
+    writes = {}
+    values = get_reference_values(references, ids)
+    for model, res_id, field, value in values:
+        writes.setdefault((model, field, value), []).append(res_id)
+    for (model, field, value), res_ids in sorted(writes.iteritems()):
+        client.execute(model, 'write', res_ids, {field: value})
+    return len(values)
+
+
+class CSVExporter(object):
+    """
+    Convert XML data files, in load order, to numbered CSV files.
+
+    The load order of the CSV files is worked out record by record: a
+    record goes to the first file after the files of every record it
+    refers to, or to the same file as a record of the same model and
+    columns it refers to.
+    """
+
+    def __init__(self, folder, module='nh_eobs_demo'):
+        """
+        :param folder: folder to write the CSV files to
+        :type folder: str
+        :param module: module the external ids without one belong to
+        :type module: str
+        """
+        self.folder = folder
+        self.module = module
+        # Level, model and columns of every file, by creation order
+        self.files = []
+        # Index in files, by level, model and columns
+        self.file_indexes = {}
+        # Open files and their CSV writers, by index in files
+        self.writers = {}
+        # Index in files of the file creating each record, by external id
+        self.records = {}
+        self.rows_written = 0
+        # Reference fields, written to references.csv once the files are
+        self.references = []
+
+    def qualify(self, xml_id):
+        """Prefix an external id with the module if it has none."""
+        return qualify(xml_id, self.module)
+
+    def ref(self, xml_id):
+        """Stand in for ``ref()`` in evals, returning the external id."""
+        return ExternalId(self.qualify(xml_id))
+
+    def export_files(self, paths):
+        """
+        Export XML data files.
+
+        :param paths: paths of the XML files, in load order
+        :type paths: list
+        :return: paths of the CSV files written, in load order
+        :rtype: list
+        """
+        for path in paths:
+            self.export_file(path)
+        return self.close()
+
+    def export_file(self, path):
+        """
+        Export the records of an XML data file, one record at a time.
+
+        :param path: path of the XML file
+        :type path: str
+        """
+        data = None
+        for event, element in iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == 'data':
+                    data = element
+            elif element.tag == 'record':
+                self.add_record(element)
+                # Drop the records once exported
+                data.clear()
+
+    def add_record(self, record):
+        """
+        Write a record to the CSV file it belongs to.
+
+        :param record: ``<record>`` element
+        """
+        model = record.attrib['model']
+        xml_id = self.qualify(record.attrib['id'])
+        columns = ['id']
+        row = [xml_id]
+        # A record updating an earlier one has to be loaded after it
+        refs = [xml_id]
+        for field in record:
+            name = field.attrib['name']
+            if 'ref' in field.attrib:
+                ref = self.qualify(field.attrib['ref'])
+                column, cell = '{0}/id'.format(name), ref
+                refs.append(ref)
+            elif 'eval' in field.attrib:
+                expression = field.attrib['eval']
+                reference = REFERENCE_REGEX.match(expression)
+                if reference is not None:
+                    self.references.append(
+                        (model, xml_id, name, reference.group(1),
+                         self.qualify(reference.group(2))))
+                    continue
+                column, cell = self.get_cell(name, expression)
+                refs.extend(self.qualify(ref) for ref in
+                            REF_REGEX.findall(expression))
+            else:
+                column, cell = name, field.text or ''
+            columns.append(column)
+            row.append(cell.encode('utf-8')
+                       if isinstance(cell, unicode) else cell)
+
+        if len(columns) == 1 and xml_id in self.records:
+            # Only its reference fields were updated
+            return
+        columns = tuple(columns)
+        level = 0
+        for ref in refs:
+            index = self.records.get(ref)
+            if index is None:
+                # Defined by another module
+                continue
+            ref_level, ref_model, ref_columns = self.files[index]
+            if (ref_model, ref_columns) != (model, columns):
+                ref_level += 1
+            level = max(level, ref_level)
+
+        index = self.get_file_index(level, model, columns)
+        self.writers[index][1].writerow(row)
+        self.records.setdefault(xml_id, index)
+        self.rows_written += 1
+
+    def get_cell(self, name, expression):
+        """
+        Evaluate a field and return its ``load()`` column and cell.
+
+        :param name: field name
+        :type name: str
+        :param expression: the field's eval attribute
+        :type expression: str
+        :return: column name and cell
+        :rtype: tuple
+        """
+        value = evaluate(expression, self.ref)
+        if isinstance(value, (list, tuple)):
+            return '{0}/id'.format(name), ','.join(get_command_ids(value))
+        if isinstance(value, ExternalId):
+            return '{0}/id'.format(name), value
+        if value is True:
+            return name, '1'
+        if value is False or value is None:
+            return name, ''
+        if isinstance(value, basestring):
+            return name, value
+        return name, str(value)
+
+    def get_file_index(self, level, model, columns):
+        """Return the index of a file, creating the file if needed."""
+        key = (level, model, columns)
+        index = self.file_indexes.get(key)
+        if index is None:
+            index = self.file_indexes[key] = len(self.files)
+            self.files.append(key)
+            csv_file = open(self.get_temporary_path(index), 'wb')
+            writer = csv.writer(csv_file)
+            writer.writerow(columns)
+            self.writers[index] = (csv_file, writer)
+        return index
+
+    def get_temporary_path(self, index):
+        """Path a file is written to, until its place in the order is known."""
+        return os.path.join(self.folder, '.{0}.csv.tmp'.format(index))
+
+    def close(self):
+        """
+        Close the files and number them in load order, and write the
+        reference fields.
+
+        :return: paths of the CSV files, in load order, without the
+                 reference fields
+        :rtype: list
+        """
+        order = sorted(xrange(len(self.files)),
+                       key=lambda index: (self.files[index][0], index))
+        paths = []
+        for number, index in enumerate(order, 1):
+            self.writers.pop(index)[0].close()
+            path = os.path.join(self.folder, '{0:03d}_{1}.csv'.format(
+                number, self.files[index][1]))
+            os.rename(self.get_temporary_path(index), path)
+            paths.append(path)
+        with open(os.path.join(self.folder, REFERENCES_FILE),
+                  'wb') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(REFERENCES_COLUMNS)
+            writer.writerows(self.references)
+        return paths
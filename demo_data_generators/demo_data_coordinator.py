@@ -1,183 +1,857 @@
 # pylint: disable=R0903
 # pylint: disable=R0914
 """Coordinates demo data"""
-import re
+import hashlib
+import json
 import os
 import random
+import time
+from contextlib import contextmanager
+from datetime import date
+from multiprocessing import Pool
 
-from xml.etree.ElementTree import ElementTree
 from demo_data_generators.admissions import AdmissionsGenerator
+from demo_data_generators.csv_export import CSVExporter
+from demo_data_generators.demographics import get_pool
+from demo_data_generators.index import INDEX_FILE, get_patients, get_users, \
+    write_index
 from demo_data_generators.locations import LocationsGenerator
+from demo_data_generators.metrics import METRICS_FILE, add_counts, \
+    count_models, get_generator, get_rate, write_metrics
 from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.pg_copy import CopyExporter, FIRST_ID
 from demo_data_generators.placements import PlacementsGenerator
 from demo_data_generators.pos import POSGenerator
+from demo_data_generators.profiling import StageProfiler, no_stage
+from demo_data_generators.progress import ProgressReporter
+from demo_data_generators.random_streams import get_random
+from demo_data_generators.sinks import COPY_FOLDER, CSV_FOLDER, \
+    MANIFEST_FILE, WARD_FILES, ShardedXMLSink, StreamingXMLSink, \
+    get_data_files, get_shard_paths, write_xml
 from demo_data_generators.spells import SpellsGenerator
 from demo_data_generators.users import UsersGenerator
-from demo_data_generators.ward_strategy import patients_factory, WardStrategy,\
+from demo_data_generators.ward_strategy import WardStrategy, \
     get_hca_nurse_users
 from demo_data_generators.news import NewsGenerator
 
+# Bump whenever a change to the generators changes the data they write,
+# so wards cached by an older version are generated again
+OUTPUT_VERSION = 4
+
+# File next to a ward's data holding the hash of the inputs it came from
+WARD_CACHE_FILE = '.ward_cache.json'
+
+# File next to a ward's data holding the metrics of its generation
+WARD_METRICS_FILE = '.ward_metrics.json'
+
+# File next to a ward's data holding the rows of its patients in the index
+WARD_INDEX_FILE = '.ward_index.json'
+
+# Formats the data can be written in, XML data files are always written
+OUTPUT_FORMATS = ('xml', 'csv', 'copy')
+
+
+def generate_ward_job(job):
+    """
+    Generate a single ward in a worker process.
+
+    Process pools can only hand module level functions to their workers,
+    so this unpacks the job and calls back into the coordinator.
+
+    :param job: coordinator followed by the ``generate_ward`` arguments
+    :type job: tuple
+    :return: the NEWS, assessment and medical team notifications the ward
+             has, and the observations and records generated (None when
+             the ward was taken from the cache)
+    :rtype: tuple
+    """
+    coordinator = job[0]
+    return coordinator.generate_ward(*job[1:])
+
+
+class DemoDataConfig(object):
+    """
+    Options of a generation run, checked once given.
+
+    Building one has no side effects: nothing is read or written until the
+    coordinator given it runs.
+    """
 
-class DemoDataCoordinator(object):
-    """Coordinate demo data generation."""
     def __init__(self, wards, beds_per_ward, bed_patient_per_ward,
-                 non_bed_patient_per_ward, users_schema, data_folder):
-
-        total_patients_per_ward = \
-            bed_patient_per_ward + non_bed_patient_per_ward
-        patient_id_offset = 1
-        # wards = ['a', 'b', 'c', 'd', 'e']
-        # bed_patients_per_ward = 28
-        # non_bed_patients_per_ward = 12
-
-        # List of time periods to randomly offset admissions
-        self.admit_offset_list = ['-1', '-2']
-        self.admit_date_eval_string = '(datetime.now() + timedelta({0}))' \
-                                      '.strftime(\'%Y-%m-%d %H:%M:%S\')'
-
-        # Regex to use to get the ID for a patient from id attribute on record
-        patient_id_regex_string = r'nhc_demo_patient_(\d+)'
-        self.patient_id_regex = re.compile(patient_id_regex_string)
-
-        point_of_service = POSGenerator()
-        self.indent(point_of_service.root)
-        users_tree = ElementTree(point_of_service.root)
-        users_tree.write(os.path.join(data_folder, 'pos.xml'))
-
-        users_generator = UsersGenerator(users_schema)
-        users_generator.generate_adt_user()
-        users_generator.generate_multi_wards_users(wards)
-        users_generator.generate_users_not_assigned()
-        self.indent(users_generator.class_root)
-        users_tree = ElementTree(users_generator.class_root)
-        users_tree.write(os.path.join(data_folder, 'users.xml'))
+                 non_bed_patient_per_ward, users_schema, data_folder, jobs=1,
+                 compact=False, history_days=2, seed=None, cache=True,
+                 demographics_file=None, output_format='xml',
+                 copy_first_id=FIRST_ID, shard_size=None,
+                 profile_folder=None, metrics=False, prometheus_path=None,
+                 progress=False, index=False):
+        """
+        :param wards: ward names
+        :type wards: list
+        :param beds_per_ward: beds on every ward
+        :type beds_per_ward: int
+        :param bed_patient_per_ward: patients in a bed on every ward
+        :type bed_patient_per_ward: int
+        :param non_bed_patient_per_ward: patients not in a bed on every ward
+        :type non_bed_patient_per_ward: int
+        :param users_schema: users of every role, see UsersGenerator
+        :type users_schema: dict
+        :param data_folder: folder the data is generated in
+        :type data_folder: str
+        :param jobs: number of processes generating wards in parallel
+        :type jobs: int
+        :param compact: write the XML files without indentation
+        :type compact: bool
+        :param history_days: days of admissions and observations
+        :type history_days: int
+        :param seed: seed of the per patient random streams
+        :type seed: int
+        :param cache: skip the wards whose inputs have not changed
+        :type cache: bool
+        :param demographics_file: file the names and dates of birth are
+                                  persisted to, if any
+        :type demographics_file: str
+        :param output_format: 'xml', 'csv' or 'copy', see OUTPUT_FORMATS
+        :type output_format: str
+        :param copy_first_id: first database id of the COPY files
+        :type copy_first_id: int
+        :param shard_size: maximum number of records per data file, no
+                           limit if None
+        :type shard_size: int
+        :param profile_folder: folder to profile every stage to, if any
+        :type profile_folder: str
+        :param metrics: write metrics.json once done
+        :type metrics: bool
+        :param prometheus_path: file to write the metrics to in the
+                                Prometheus text format, if any
+        :type prometheus_path: str
+        :param progress: report the progress of the wards
+        :type progress: bool
+        :param index: write index.sqlite once done
+        :type index: bool
+        """
+        if history_days < 1:
+            raise ValueError('history_days must be at least 1')
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError('Unknown output format: {0}'.format(
+                output_format))
+        if profile_folder and jobs > 1:
+            # Stages run in the workers would be profiled out of sight
+            raise ValueError('Profiling needs the wards generated in a '
+                             'single process')
+        self.wards = wards
+        self.beds_per_ward = beds_per_ward
+        self.bed_patient_per_ward = bed_patient_per_ward
+        self.non_bed_patient_per_ward = non_bed_patient_per_ward
+        self.users_schema = users_schema
+        self.data_folder = data_folder
+        self.jobs = jobs
+        self.compact = compact
+        self.history_days = history_days
+        self.seed = seed
+        self.cache = cache
+        self.demographics_file = demographics_file
+        self.output_format = output_format
+        self.copy_first_id = copy_first_id
+        self.shard_size = shard_size
+        self.profile_folder = profile_folder
+        self.metrics = metrics or bool(prometheus_path)
+        self.prometheus_path = prometheus_path
+        self.progress = progress
+        self.index = index
 
-        # Generate demo data for each ward,
-        # with files named after different type of data,
-        # grouped in one folder for each ward
+
+class DemoDataCoordinator(object):
+    """
+    Coordinate demo data generation.
+
+    The coordinator is built from a ``DemoDataConfig`` without touching
+    anything, ``run`` generates the data.
+    """
+    def __init__(self, config):
+        """
+        :param config: options of the run
+        :type config: DemoDataConfig
+        """
+        self.config = config
+        self.beds_per_ward = config.beds_per_ward
+        self.bed_patient_per_ward = config.bed_patient_per_ward
+        self.non_bed_patient_per_ward = config.non_bed_patient_per_ward
+        self.data_folder = config.data_folder
+        self.compact = config.compact
+        # Maximum number of records per data file, no limit if None
+        self.shard_size = config.shard_size
+        # Seed of the per patient random streams, see random_streams
+        self.seed = config.seed
+        # Skip wards whose inputs have not changed since they were generated
+        self.cache = config.cache
+        # Names and dates of birth, optionally persisted between runs, read
+        # when run
+        self.demographics = None
+        self.demographics_hash = None
+        self.total_patients_per_ward = \
+            config.bed_patient_per_ward + config.non_bed_patient_per_ward
+        self.patient_id_offset = 1
+        # Profiles every stage of the run, None when not profiling
+        self.profiler = None
+        # Write metrics.json once done, see metrics
+        self.metrics = config.metrics
+        # Seconds taken by every stage run in this process, by name
+        self.stage_seconds = {}
+        # Records of the files written outside the wards, by model, by path
+        self.file_models = {}
+        # Reports the progress of the wards, None when quiet
+        self.progress = None
+        # Write index.sqlite once done, see index
+        self.index = config.index
+        # Users to index, with their wards
+        self.index_users = []
+        # List of time periods (days before now) to randomly offset
+        # admissions, which is also how far back NEWS observations go
+        self.admit_offset_list = [
+            -day for day in xrange(1, config.history_days + 1)]
+        # NEWS and notifications generated on all the wards
         self.ews_seq = 0
         self.assess_seq = 0
         self.medical_seq = 0
 
-        for index, ward in enumerate(wards):
-            # Locations demo data
-            locations = LocationsGenerator(ward, beds_per_ward)
-            # Users demo data
-            users_per_ward_root = users_generator.generate_users_per_ward(
-                ward, beds_per_ward)
-            # Patients demo data
+    def run(self):
+        """Generate the demo data, as configured."""
+        config = self.config
+        wards = config.wards
+        data_folder = config.data_folder
+        start = time.time()
+        self.demographics = get_pool(config.demographics_file)
+        self.demographics_hash = self.demographics.get_hash()
+        if config.profile_folder:
+            self.profiler = StageProfiler(config.profile_folder)
+
+        with self.stage('pos'):
+            point_of_service = POSGenerator()
+            self.write_tree(point_of_service.root,
+                            os.path.join(data_folder, 'pos.xml'))
+
+        with self.stage('users'):
+            users_generator = UsersGenerator(config.users_schema,
+                                             seed=self.seed,
+                                             demographics=self.demographics)
+            users_generator.generate_adt_user()
+            users_generator.generate_multi_wards_users(wards)
+            users_generator.generate_users_not_assigned()
+            self.write_tree(users_generator.class_root,
+                            os.path.join(data_folder, 'users.xml'))
+            if self.index:
+                self.index_users.extend(get_users(
+                    users_generator.class_root.find('data'), wards))
+
+            # Users are generated for every ward up front, as the name
+            # generators are shared between wards and cannot be split
+            # across processes
+            hca_nurse_ids = []
+            for ward in wards:
+                ward_folder = self.get_ward_folder(ward)
+                users_per_ward_root = users_generator.generate_users_per_ward(
+                    ward, self.beds_per_ward)
+                hca_nurse_ids.append(get_hca_nurse_users(users_per_ward_root))
+                self.write_tree(users_per_ward_root,
+                                os.path.join(ward_folder, 'demo_users.xml'))
+                if self.index:
+                    self.index_users.extend(get_users(
+                        users_per_ward_root.find('data'), wards))
+
+        # Generate demo data for each ward,
+        # with files named after different type of data,
+        # grouped in one folder for each ward.
+        if config.progress:
+            self.progress = ProgressReporter(
+                len(wards), len(wards) * self.bed_patient_per_ward)
+        if config.jobs > 1:
+            self.generate_wards_in_parallel(wards, hca_nurse_ids,
+                                            config.jobs)
+        else:
+            for index, ward in enumerate(wards):
+                counts, _ = self.generate_ward(index, ward,
+                                               hca_nurse_ids[index])
+                self.add_ward_counts(counts)
+        if self.progress is not None:
+            self.progress.finish()
+
+        if self.shard_size:
+            self.write_manifest(wards)
+        if self.index:
+            with self.stage('index'):
+                self.write_index(wards)
+        if config.output_format != 'xml':
+            with self.stage('export'):
+                if config.output_format == 'csv':
+                    self.export_csv(wards)
+                else:
+                    self.export_copy(wards, config.copy_first_id)
+        if self.profiler is not None:
+            self.profiler.write_summary()
+        if self.metrics:
+            write_metrics(self.get_metrics(wards, time.time() - start),
+                          os.path.join(data_folder, METRICS_FILE),
+                          config.prometheus_path)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a stage of the run, profiling it if profiling.
+
+        :param name: name of the stage
+        :type name: str
+        """
+        profile = no_stage() if self.profiler is None else \
+            self.profiler.stage(name)
+        with profile:
+            start = time.time()
+            yield
+            self.stage_seconds[name] = time.time() - start
+
+    def get_ward_folder(self, ward):
+        """Return the ward's data folder, creating it if needed."""
+        ward_folder = os.path.join(self.data_folder, 'ward_{0}'.format(ward))
+        if not os.path.isdir(ward_folder):
+            os.mkdir(ward_folder)
+        return ward_folder
+
+    def add_ward_counts(self, counts):
+        """
+        Add a ward's NEWS and notifications to the run's.
+
+        :param counts: NEWS, assessment and medical team notifications
+        :type counts: tuple
+        """
+        self.ews_seq += counts[0]
+        self.assess_seq += counts[1]
+        self.medical_seq += counts[2]
+
+    def generate_wards_in_parallel(self, wards, hca_nurse_ids, jobs):
+        """
+        Generate the wards in a pool of worker processes.
+
+        Wards do not depend on each other, NEWS and notifications are
+        numbered per patient.
+
+        :param wards: ward names
+        :type wards: list
+        :param hca_nurse_ids: HCA and nurse user ids for each ward
+        :type hca_nurse_ids: list
+        :param jobs: number of worker processes
+        :type jobs: int
+        """
+        ward_jobs = [(self, index, ward, hca_nurse_ids[index])
+                     for index, ward in enumerate(wards)]
+        # Progress is reported here as the wards come back, the reporter
+        # stays out of the workers
+        progress = self.progress
+        self.progress = None
+        # Reseed every worker, otherwise they all inherit the same state
+        # (only used without a seed, seeded wards draw from their own streams)
+        pool = Pool(jobs, random.seed)
+        try:
+            for counts, generated in pool.imap(generate_ward_job,
+                                               ward_jobs):
+                self.add_ward_counts(counts)
+                if progress is None:
+                    continue
+                if generated is None:
+                    progress.skip_ward(self.bed_patient_per_ward)
+                else:
+                    observations, records = generated
+                    progress.ward_done(self.bed_patient_per_ward, records,
+                                       observations)
+        finally:
+            pool.close()
+            pool.join()
+            self.progress = progress
+
+    def get_ward_profile(self, index):
+        """
+        Return the risk profile of the ward at a position in the wards list.
+
+        :param index: position of the ward in the wards list
+        :type index: int
+        :return: risk distribution, overdue ratio and overdue distribution
+        :rtype: tuple
+        """
+        risk_distribution = {
+            'high': 0, 'medium': 2, 'low': 11, 'none': 15
+        }
+        # 50% observations are overdue by default
+        overdue_ratio = 0.5
+        # all overdue observations are within 30 mins overdue
+        overdue_distribution = [30]
+        if index == 0:
+            # ICU
+            risk_distribution = {
+                'high': 3, 'medium': 4, 'low': 20, 'none': 1
+            }
+        elif index == 1:
+            # 75% observations are overdue, 1/3 overdue by 60 mins, the
+            # rest overdue by, at most, 30 mins
+            overdue_ratio = 0.75
+            overdue_distribution = [30, 30, 60]
+            risk_distribution = {
+                'high': 0, 'medium': 0, 'low': 20, 'none': 8
+            }
+        elif index == 4:
+            # all observations are on-time
+            overdue_ratio = 0
+            risk_distribution = {
+                'high': 0, 'medium': 0, 'low': 0, 'none': 28
+            }
+        return risk_distribution, overdue_ratio, overdue_distribution
+
+    def get_ward_hash(self, index, ward, hca_nurse_ids):
+        """
+        Return the hash of everything a ward's data files depend on.
+
+        Unseeded data is different every time, so it has no hash. Dates
+        of birth are drawn up to today, so the hash changes every day.
+
+        :return: hex digest, or None without a seed
+        :rtype: str
+        """
+        if self.seed is None:
+            return None
+        inputs = {
+            'version': OUTPUT_VERSION,
+            'seed': self.seed,
+            'ward': ward,
+            'index': index,
+            'beds': self.beds_per_ward,
+            'bed_patients': self.bed_patient_per_ward,
+            'non_bed_patients': self.non_bed_patient_per_ward,
+            'users': hca_nurse_ids,
+            'profile': self.get_ward_profile(index),
+            'admit_offsets': self.admit_offset_list,
+            'demographics': self.demographics_hash,
+            'date': date.today().isoformat(),
+            'compact': self.compact,
+            'shard_size': self.shard_size
+        }
+        return hashlib.sha1(json.dumps(inputs, sort_keys=True)).hexdigest()
+
+    def read_ward_cache(self, ward_folder, ward_hash):
+        """
+        Return a ward's NEWS and notifications if its files are up to date.
+
+        :param ward_folder: the ward's data folder
+        :type ward_folder: str
+        :param ward_hash: hash of the ward's current inputs
+        :type ward_hash: str
+        :return: the counts stored with the files, or None if the ward has
+                 to be generated
+        :rtype: tuple
+        """
+        cache_path = os.path.join(ward_folder, WARD_CACHE_FILE)
+        if not self.cache or ward_hash is None or \
+                not os.path.isfile(cache_path):
+            return None
+        with open(cache_path) as cache_file:
+            try:
+                cache = json.load(cache_file)
+            except ValueError:
+                return None
+        if cache.get('hash') != ward_hash:
+            return None
+        for name, needed in ((WARD_METRICS_FILE, self.metrics),
+                             (WARD_INDEX_FILE, self.index)):
+            if needed and not os.path.isfile(
+                    os.path.join(ward_folder, name)):
+                return None
+        for name in WARD_FILES:
+            if not self.get_output_paths(os.path.join(
+                    ward_folder, 'demo_{0}.xml'.format(name))):
+                return None
+        return tuple(cache['counts'])
+
+    def write_ward_cache(self, ward_folder, ward_hash, counts):
+        """
+        Store the hash of a ward's inputs once all its files are written.
+
+        The file is moved into place, so an interrupted run never leaves a
+        hash next to partly written data.
+        """
+        cache_path = os.path.join(ward_folder, WARD_CACHE_FILE)
+        with open(cache_path + '.tmp', 'w') as cache_file:
+            json.dump({'hash': ward_hash, 'counts': list(counts)},
+                      cache_file)
+        os.rename(cache_path + '.tmp', cache_path)
+
+    def generate_ward(self, index, ward, hca_nurse_ids):
+        """
+        Generate a single ward, unless its files are already up to date.
+
+        Arguments are the same as ``write_ward``.
+
+        :return: the counts returned by ``write_ward``, and the observations
+                 and records generated, None when the ward was taken from
+                 the cache
+        :rtype: tuple
+        """
+        ward_folder = self.get_ward_folder(ward)
+        ward_hash = self.get_ward_hash(index, ward, hca_nurse_ids)
+        counts = self.read_ward_cache(ward_folder, ward_hash)
+        if counts is not None:
+            if self.progress is not None:
+                self.progress.skip_ward(self.bed_patient_per_ward)
+            return counts, None
+
+        # Forget the old hash, metrics and index rows before touching the
+        # files
+        for name in (WARD_CACHE_FILE, WARD_METRICS_FILE, WARD_INDEX_FILE):
+            path = os.path.join(ward_folder, name)
+            if os.path.isfile(path):
+                os.remove(path)
+        counts, generated = self.write_ward(index, ward, hca_nurse_ids)
+        if ward_hash is not None:
+            self.write_ward_cache(ward_folder, ward_hash, counts)
+        return counts, generated
+
+    def write_ward(self, index, ward, hca_nurse_ids):
+        """
+        Generate and write the demo data files for a single ward.
+
+        :param index: position of the ward in the wards list
+        :type index: int
+        :param ward: name of the ward
+        :type ward: str
+        :param hca_nurse_ids: ids of the HCA and nurse users on the ward
+        :type hca_nurse_ids: list
+        :return: the NEWS (completed and partial), assessment and medical
+                 team notifications generated, then the NEWS observations
+                 emitted and the records written
+        :rtype: tuple
+        """
+        ward_folder = self.get_ward_folder(ward)
+
+        # Records are streamed straight to their files, later generators
+        # read the patients generator's in-memory patients instead
+        sinks = dict(
+            (name, self.get_sink(
+                os.path.join(ward_folder, 'demo_{0}.xml'.format(name))))
+            for name in WARD_FILES
+        )
+        if self.progress is not None:
+            self.progress.start_ward(sinks.values())
+
+        stage = 'ward_{0}.{{0}}'.format(ward)
+        # Locations demo data
+        with self.stage(stage.format('locations')):
+            LocationsGenerator(ward, self.beds_per_ward,
+                               sink=sinks['locations'])
+        # Patients demo data
+        with self.stage(stage.format('patients')):
             patients = PatientsGenerator(
-                (index * total_patients_per_ward) + patient_id_offset,
-                bed_patient_per_ward,
-                non_bed_patient_per_ward,
-                ward
+                (index * self.total_patients_per_ward) +
+                self.patient_id_offset,
+                self.bed_patient_per_ward,
+                self.non_bed_patient_per_ward,
+                ward,
+                sink=sinks['patients'],
+                seed=self.seed,
+                demographics=self.demographics
             )
-            offsets = [random.choice(
-                self.admit_offset_list) for _ in range(
-                len(patients.data.findall('record')))]
-            # Spells demo data
-            spells = SpellsGenerator(patients, offsets)
-            # Admissions demo data
-            admissions = AdmissionsGenerator(patients, offsets)
-            # Placements demo data
-            placements = PlacementsGenerator(patients, offsets)
+            for patient in patients.patients:
+                patient.admit_offset = get_random(
+                    self.seed, ward, patient.id, 'admission').choice(
+                        self.admit_offset_list)
+        offsets = [patient.admit_offset for patient in patients.patients]
+        # Spells demo data
+        with self.stage(stage.format('spells')):
+            SpellsGenerator(patients, offsets, sink=sinks['spells'])
+        # Admissions demo data
+        with self.stage(stage.format('admissions')):
+            AdmissionsGenerator(patients, offsets, sink=sinks['admissions'])
+        # Placements demo data
+        with self.stage(stage.format('placements')):
+            PlacementsGenerator(patients, offsets, sink=sinks['placements'])
 
+        with self.stage(stage.format('news')):
             # Strategy
-            risk_distribution = {
-                'high': 0, 'medium': 2, 'low': 11, 'none': 15
-            }
-            # 50% observations are overdue by default
-            overdue_ratio = 0.5
-            # all overdue observations are within 30 mins overdue
-            overdue_distribution = [30]
-            if index == 0:
-                # ICU
-                risk_distribution = {
-                    'high': 3, 'medium': 4, 'low': 20, 'none': 1
-                }
-            elif index == 1:
-                # 75% observations are overdue, 1/3 overdue by 60 mins, the
-                # rest overdue by, at most, 30 mins
-                overdue_ratio = 0.75
-                overdue_distribution = [30, 30, 60]
-                risk_distribution = {
-                    'high': 0, 'medium': 0, 'low': 20, 'none': 8
-                }
-            elif index == 4:
-                # all observations are on-time
-                overdue_ratio = 0
-                risk_distribution = {
-                    'high': 0, 'medium': 0, 'low': 0, 'none': 28
-                }
-
-            news_patients = patients_factory(placements.root)
-            hca_nurse_ids = get_hca_nurse_users(users_per_ward_root)
-            partial_news_per_patient = 1
+            risk_distribution, overdue_ratio, overdue_distribution = \
+                self.get_ward_profile(index)
+
+            # Only patients placed in a bed get observations
+            news_patients = [
+                patient for patient in patients.patients if patient.in_bed]
             # create ward strategy here
             ward_strategy = WardStrategy(
                 news_patients, hca_nurse_ids, risk_distribution,
-                partial_news_per_patient, overdue_ratio, overdue_distribution
-
+                overdue_ratio, overdue_distribution,
+                seed=self.seed, ward=ward
             )
 
             # NEWS demo data
-            news = NewsGenerator(ward_strategy, self.ews_seq, self.assess_seq,
-                                 self.medical_seq)
-
-            self.ews_seq = news.ews_seq
-            self.assess_seq = news.assess_seq
-            self.medical_seq = news.medical_seq
-
-            # Pretty format the XML trees
-            self.indent(locations.root)
-            self.indent(users_per_ward_root)
-            self.indent(patients.root)
-            self.indent(spells.root)
-            self.indent(admissions.root)
-            self.indent(placements.root)
-            self.indent(news.root)
-
-            # Actually write the XML files (creating them if needed)
-            ward_folder = os.path.join(data_folder, 'ward_{0}'.format(ward))
-            if not os.path.isdir(ward_folder):
-                os.mkdir(ward_folder)
-
-            locations_tree = ElementTree(locations.root)
-            locations_tree.write(os.path.join(ward_folder,
-                                              'demo_locations.xml'))
-
-            users_per_ward_tree = ElementTree(users_per_ward_root)
-            users_per_ward_tree.write(os.path.join(ward_folder,
-                                                   'demo_users.xml'))
-
-            patients_tree = ElementTree(patients.root)
-            patients_tree.write(os.path.join(ward_folder, 'demo_patients.xml'))
-
-            spells_tree = ElementTree(spells.root)
-            spells_tree.write(os.path.join(ward_folder, 'demo_spells.xml'))
-
-            admissions_tree = ElementTree(admissions.root)
-            admissions_tree.write(os.path.join(ward_folder,
-                                               'demo_admissions.xml'))
-
-            placements_tree = ElementTree(placements.root)
-            placements_tree.write(os.path.join(ward_folder,
-                                               'demo_placements.xml'))
-            news_tree = ElementTree(news.root)
-            news_tree.write(os.path.join(ward_folder, 'demo_news.xml'))
-
-    def indent(self, elem, level=0):
-        """Indent data stored in an XML tree."""
-        i = "\n" + level*"  "
-        if len(elem):
-            if not elem.text or not elem.text.strip():
-                elem.text = i + "  "
-            if not elem.tail or not elem.tail.strip():
-                elem.tail = i
-            for elem in elem:
-                self.indent(elem, level+1)
-            if not elem.tail or not elem.tail.strip():
-                elem.tail = i
+            news = NewsGenerator(ward_strategy, 0, 0, 0, sink=sinks['news'],
+                                 progress=self.progress)
+
+        # Finish the streamed files, indenting and writing what is left
+        with self.stage(stage.format('write')):
+            for sink in sinks.values():
+                sink.close()
+        if self.progress is not None:
+            self.progress.ward_done()
+
+        if self.metrics:
+            self.write_ward_metrics(ward, ward_folder, sinks,
+                                    news.risk_counts)
+        if self.index:
+            with open(os.path.join(ward_folder, WARD_INDEX_FILE),
+                      'w') as index_file:
+                json.dump(get_patients(patients.patients, ward), index_file)
+
+        records = sum(sum(sink.models.values()) for sink in sinks.values())
+        return ((news.ews_seq, news.assess_seq, news.medical_seq),
+                (news.observations, records))
+
+    def write_ward_metrics(self, ward, ward_folder, sinks, risk_counts):
+        """
+        Keep the metrics of a ward next to its files.
+
+        Wards may be generated in other processes, or in an earlier run
+        when taken from the cache, so their metrics are read back from
+        there once the run is over.
+
+        :param ward: name of the ward
+        :type ward: str
+        :param ward_folder: the ward's data folder
+        :type ward_folder: str
+        :param sinks: the sinks the ward's files were written with, by name
+        :type sinks: dict
+        :param risk_counts: NEWS observations planned, by risk
+        :type risk_counts: dict
+        """
+        prefix = 'ward_{0}.'.format(ward)
+        ward_metrics = {
+            'seconds': dict(
+                (name[len(prefix):], seconds)
+                for name, seconds in self.stage_seconds.iteritems()
+                if name.startswith(prefix)),
+            'files': dict(
+                (os.path.relpath(sink.path, self.data_folder), sink.models)
+                for sink in sinks.values()),
+            'risk_bands': risk_counts
+        }
+        with open(os.path.join(ward_folder, WARD_METRICS_FILE),
+                  'w') as metrics_file:
+            json.dump(ward_metrics, metrics_file, sort_keys=True)
+
+    def get_metrics(self, wards, seconds):
+        """
+        Gather the metrics of the run, see metrics.
+
+        :param wards: ward names
+        :type wards: list
+        :param seconds: seconds the run took
+        :type seconds: float
+        :return: the metrics
+        :rtype: dict
+        """
+        files = {}
+        models = {}
+        risk_bands = {}
+        generators = {}
+        ward_totals = {}
+
+        def add_generator(name, records=0, generator_seconds=0):
+            """Add records or time to a generator's totals."""
+            totals = generators.setdefault(name,
+                                           {'records': 0, 'seconds': 0})
+            totals['records'] += records
+            totals['seconds'] += generator_seconds
+
+        def add_file(path, file_models):
+            """Add a data file, by path in the data folder."""
+            size = sum(
+                os.path.getsize(output_path) for output_path in
+                self.get_output_paths(os.path.join(self.data_folder, path)))
+            records = sum(file_models.values())
+            files[path] = {'bytes': size, 'records': records,
+                           'models': file_models}
+            add_counts(models, file_models)
+            add_generator(get_generator(path), records)
+            folder = os.path.dirname(path)
+            if folder.startswith('ward_'):
+                add_counts(ward_totals.setdefault(folder[len('ward_'):], {}),
+                           {'bytes': size, 'records': records})
+
+        for path, file_models in self.file_models.iteritems():
+            add_file(path, file_models)
+        for name in ('pos', 'users', 'index', 'export'):
+            if name in self.stage_seconds:
+                add_generator(name, generator_seconds=self.stage_seconds[name])
+        for ward in wards:
+            metrics_path = os.path.join(self.get_ward_folder(ward),
+                                        WARD_METRICS_FILE)
+            with open(metrics_path) as metrics_file:
+                ward_metrics = json.load(metrics_file)
+            for path, file_models in ward_metrics['files'].iteritems():
+                add_file(path, file_models)
+            for name, generator_seconds in \
+                    ward_metrics['seconds'].iteritems():
+                add_generator(name, generator_seconds=generator_seconds)
+            add_counts(risk_bands, ward_metrics['risk_bands'])
+
+        for totals in generators.values():
+            totals['seconds'] = round(totals['seconds'], 4)
+            totals['records_per_second'] = get_rate(totals['records'],
+                                                    totals['seconds'])
+        records = sum(models.values())
+        return {
+            'seconds': round(seconds, 4),
+            'records': records,
+            'bytes': sum(item['bytes'] for item in files.values()),
+            'records_per_second': get_rate(records, seconds),
+            'models': models,
+            'risk_bands': risk_bands,
+            'sequences': {'ews': self.ews_seq, 'assessment': self.assess_seq,
+                          'medical': self.medical_seq},
+            'files': files,
+            'wards': ward_totals,
+            'generators': generators
+        }
+
+    def get_data_files(self, wards):
+        """
+        Return the paths of the XML data files, in an order they can load.
+
+        Sharded files are replaced by their shards.
+
+        :param wards: ward names
+        :type wards: list
+        :return: paths of the data files
+        :rtype: list
+        """
+        paths = get_data_files(self.data_folder, wards)
+        if self.shard_size:
+            paths = [shard_path for path in paths
+                     for shard_path in get_shard_paths(path)]
+        return paths
+
+    def get_output_paths(self, path):
+        """
+        Return the files a data file was written to, if it was.
+
+        :param path: path of the data file, as written without shards
+        :type path: str
+        :return: the file itself or its shards, empty if not written
+        :rtype: list
+        """
+        if self.shard_size:
+            return get_shard_paths(path)
+        return [path] if os.path.isfile(path) else []
+
+    def write_index(self, wards):
+        """
+        Write the index of the users, patients and spells, see index.
+
+        The patients of wards generated in other processes, or in an
+        earlier run when taken from the cache, are read back from the rows
+        kept next to their files.
+
+        :param wards: ward names
+        :type wards: list
+        """
+        patients = []
+        for ward in wards:
+            with open(os.path.join(self.get_ward_folder(ward),
+                                   WARD_INDEX_FILE)) as index_file:
+                patients.extend(json.load(index_file))
+        write_index(os.path.join(self.data_folder, INDEX_FILE),
+                    self.index_users, patients)
+
+    def write_manifest(self, wards):
+        """
+        List the shards in load order, with the number of records in each.
+
+        :param wards: ward names
+        :type wards: list
+        """
+        shards = []
+        for path in self.get_data_files(wards):
+            with open(path) as shard_file:
+                records = shard_file.read().count('<record ')
+            shards.append({
+                'path': os.path.relpath(path, self.data_folder),
+                'records': records
+            })
+        manifest_path = os.path.join(self.data_folder, MANIFEST_FILE)
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump({'shard_size': self.shard_size, 'files': shards},
+                      manifest_file, indent=2, sort_keys=True,
+                      separators=(',', ': '))
+
+    def export_csv(self, wards):
+        """
+        Export the XML data files to CSV files for Odoo's ``load()``.
+
+        :param wards: ward names
+        :type wards: list
+        :return: paths of the CSV files, in load order
+        :rtype: list
+        """
+        csv_folder = os.path.join(self.data_folder, CSV_FOLDER)
+        if os.path.isdir(csv_folder):
+            # Files from a previous run would not be in the same order
+            for name in os.listdir(csv_folder):
+                if name.endswith('.csv'):
+                    os.remove(os.path.join(csv_folder, name))
         else:
-            if level and (not elem.tail or not elem.tail.strip()):
-                elem.tail = i
+            os.mkdir(csv_folder)
+        return CSVExporter(csv_folder).export_files(
+            self.get_data_files(wards))
+
+    def export_copy(self, wards, first_id=FIRST_ID):
+        """
+        Export the patients, activities and NEWS observations to
+        PostgreSQL COPY files, and the rest of the data to data files
+        leaving them out.
+
+        :param wards: ward names
+        :type wards: list
+        :param first_id: first database id given to the rows of each table
+        :type first_id: int
+        """
+        copy_folder = os.path.join(self.data_folder, COPY_FOLDER)
+        if os.path.isdir(copy_folder):
+            # Data files from a previous run would not be in the same order
+            for name in os.listdir(copy_folder):
+                if name.endswith('.xml'):
+                    os.remove(os.path.join(copy_folder, name))
+        else:
+            os.mkdir(copy_folder)
+        CopyExporter(copy_folder, first_id=first_id).export_files(
+            self.get_data_files(wards))
+
+    def get_sink(self, path, noupdate=True):
+        """
+        Return a sink streaming records to a data file, or to its shards.
+
+        :param path: path of the data file
+        :type path: str
+        :param noupdate: set the noupdate flag on the data element
+        :type noupdate: bool
+        """
+        if self.shard_size:
+            return ShardedXMLSink(path, self.shard_size, noupdate=noupdate,
+                                  compact=self.compact)
+        return StreamingXMLSink(path, noupdate=noupdate, compact=self.compact)
+
+    def write_tree(self, root, path):
+        """
+        Write an XML tree to a file, pretty printed unless compact, or to
+        its shards.
+        """
+        data = root.find('data')
+        if self.metrics:
+            self.file_models[os.path.relpath(path, self.data_folder)] = \
+                count_models(data)
+        if not self.shard_size:
+            write_xml(root, path, compact=self.compact)
+            return
+        sink = self.get_sink(path, noupdate=data.get('noupdate') == '1')
+        sink.data.extend(list(data))
+        sink.close()
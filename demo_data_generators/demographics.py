@@ -0,0 +1,126 @@
+# coding=utf-8
+"""
+Pools of demographic data the patients and users are drawn from.
+
+The names come from Faker's English person provider, read once per process
+(or from a pool file saved by an earlier run, which avoids importing Faker
+at all). Drawing a name or a date of birth is then an index into a list,
+taken from the entity's own random stream.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, date, time, timedelta
+
+# Pools already built in this process, by file path (None if not persisted)
+POOLS = {}
+
+
+class DemographicsPool(object):
+    """
+    Names to draw patients and users from, and the dates of birth range.
+    """
+
+    def __init__(self, first_names_male, first_names_female, last_names):
+        """
+        :param first_names_male: first names for male patients
+        :type first_names_male: list
+        :param first_names_female: first names for female patients
+        :type first_names_female: list
+        :param last_names: last names for everyone
+        :type last_names: list
+        """
+        self.first_names = {
+            'M': first_names_male,
+            'F': first_names_female
+        }
+        # In the same order as Faker's own list of all first names
+        self.all_first_names = first_names_male + first_names_female
+        self.last_names = last_names
+
+        # Dates of birth are drawn up to today at midnight rather than
+        # now, so seeded patients come out the same all day
+        today = datetime.combine(date.today(), time())
+        self.dob_start = today - timedelta(days=int(365.25 * 90))
+        self.dob_seconds = \
+            (today - timedelta(days=int(365.25 * 18)) - self.dob_start)\
+            .days * 24 * 60 * 60
+
+    @classmethod
+    def from_faker(cls):
+        """Build the pool from Faker's English person provider."""
+        from faker.providers.person.en import Provider
+        return cls(list(Provider.first_names_male),
+                   list(Provider.first_names_female),
+                   list(Provider.last_names))
+
+    @classmethod
+    def load(cls, path):
+        """Build the pool from a file written by ``save``."""
+        with open(path) as pool_file:
+            pool = json.load(pool_file)
+        return cls(pool['first_names_male'], pool['first_names_female'],
+                   pool['last_names'])
+
+    def get_hash(self):
+        """
+        Return a hash of the names, the same for the same pool whether
+        built from Faker or loaded from a file.
+
+        :return: hex digest
+        :rtype: str
+        """
+        return hashlib.sha1(json.dumps([
+            self.first_names['M'], self.first_names['F'], self.last_names
+        ])).hexdigest()
+
+    def save(self, path):
+        """Write the names to a file, to be loaded by later runs."""
+        with open(path, 'w') as pool_file:
+            json.dump({
+                'first_names_male': self.first_names['M'],
+                'first_names_female': self.first_names['F'],
+                'last_names': self.last_names
+            }, pool_file)
+
+    def first_name(self, rng, gender):
+        """
+        Draw a first name.
+
+        :param rng: random stream to draw from
+        :param gender: 'M' or 'F'
+        :type gender: str
+        :return: first name
+        :rtype: str
+        """
+        names = self.first_names[gender]
+        return names[int(rng.random() * len(names))]
+
+    def last_name(self, rng):
+        """Draw a last name from a random stream."""
+        return self.last_names[int(rng.random() * len(self.last_names))]
+
+    def dob(self, rng):
+        """Draw a date of birth, 18 to 90 years ago, from a random stream."""
+        return self.dob_start + timedelta(
+            seconds=int(rng.random() * self.dob_seconds))
+
+
+def get_pool(path=None):
+    """
+    Return the demographics pool, building it once per process.
+
+    :param path: file the pool is persisted to, loaded from it if it exists
+                 and written to it otherwise
+    :type path: str
+    :return: the pool
+    :rtype: DemographicsPool
+    """
+    if path not in POOLS:
+        if path and os.path.isfile(path):
+            POOLS[path] = DemographicsPool.load(path)
+        else:
+            POOLS[path] = DemographicsPool.from_faker()
+            if path:
+                POOLS[path].save(path)
+    return POOLS[path]
@@ -1,69 +1,82 @@
 """
-Simple script to scan a directory structure, searching into XML files
-for open-eObs demo data, and print out a user's name for each specific role.
+Look up the users, patients and spells of open-eObs demo data in the index
+written alongside it (``generate_openeobs_demo_data DIR --index``).
+
+With no option, print a user's name for each role on every ward, then for
+the users not assigned to any ward. Otherwise print one tab separated line
+per result:
+
+- ``--role``, ``--ward``, ``--unassigned``: login, name, role and external
+  id of the users, in the order they were generated
+- ``--bed``: external id, hospital number and spell of the patient in the
+  bed
+- ``--patient``: spell of the patient
 """
+import argparse
 import os
+import sys
 from pprint import pprint
-from xml.etree.ElementTree import ElementTree
 
+from demo_data_generators.index import DemoDataIndex
+
+PARSER = argparse.ArgumentParser('Look up users, patients and spells of '
+                                 'generated demo data')
+PARSER.add_argument('data_folder', type=str,
+                    help='Folder the data was generated in, with --index')
+PARSER.add_argument('--role', type=str,
+                    help='List the users with this role (nurse, hca...)')
+PARSER.add_argument('--ward', type=str,
+                    help='List the users assigned to this ward')
+PARSER.add_argument('--unassigned', action='store_true',
+                    help='List the users assigned to no ward')
+PARSER.add_argument('--bed', type=str,
+                    help='Show the patient in this bed, by code (A3) or '
+                         'external id')
+PARSER.add_argument('--patient', type=str,
+                    help='Show the spell of this patient, by external id '
+                         'or hospital number')
 
-def get_first_user_per_role(users_per_role, element):
-    """
-    Update a dictionary (passed as argument) with a user's complete name
-    for each role list as that dictionary's key.
 
-    :param users_per_role: dictionary listing the desired roles
-    :type users_per_role: dict
-    :param element: an XML element to search into
-    """
-    for role in users_per_role:
-        for user in element.findall('record'):
-            if role in user.attrib['id']:
-                for field in user.findall('field'):
-                    if field.get('name') == 'name':
-                        users_per_role[role] = field.text
-                break
-    return users_per_role
+def get_names(users):
+    """Return the names of users, by role."""
+    return dict((role, user['name']) for role, user in users.iteritems())
 
 
 def main():
-    # Some hardcoded variables needed to find and properly parse the XML files
-    wards_list = ['a', 'b', 'c', 'd', 'e']
-    data_folder = os.path.join(os.path.dirname(__file__), 'DATA')
-    role_assigned_to_ward = {
-        'nurse': None,
-        'hca': None,
-        'ward_manager': None,
-        'doctor': None
-    }
+    args = PARSER.parse_args()
+    data_folder = os.path.abspath(os.path.expanduser(args.data_folder))
+    try:
+        index = DemoDataIndex(data_folder)
+    except IOError as error:
+        PARSER.error(str(error))
 
-    # Search into an XML file (and print the result) for each ward's folder
-    for ward in wards_list:
-        ward_folder = os.path.join(data_folder, 'ward_{0}'.format(ward))
-        xml_file = os.path.join(ward_folder, 'demo_users.xml')
-        tree = ElementTree(file=xml_file)
-        data = tree.getroot().find('data')
-        roles_dict = dict(role_assigned_to_ward)
-        per_ward_output = get_first_user_per_role(roles_dict, data)
-        print('WARD {0}:'.format(ward.upper()))
-        pprint(per_ward_output)
+    try:
+        if args.bed is not None:
+            patient = index.get_patient_in_bed(args.bed)
+            if patient is None:
+                return 'No patient in bed {0}'.format(args.bed)
+            print('\t'.join((patient['xml_id'], patient['other_identifier'],
+                             patient['spell'])))
+        elif args.patient is not None:
+            spell = index.get_spell(args.patient)
+            if spell is None:
+                return 'No patient {0}'.format(args.patient)
+            print(spell)
+        elif args.role or args.ward or args.unassigned:
+            for user in index.get_users(args.role, args.ward,
+                                        args.unassigned):
+                print('\t'.join((user['login'], user['name'], user['role'],
+                                 user['xml_id'])))
+        else:
+            for ward in index.get_wards():
+                print('WARD {0}:'.format(ward.upper()))
+                pprint(get_names(index.get_first_user_per_role(ward)))
+            print('USERS NOT ASSIGNED TO ANY WARD:')
+            pprint(get_names(index.get_first_user_per_role(unassigned=True)))
+    finally:
+        index.close()
+    return 0
 
-    # Search into the generic XML file for users not assigned to any ward
-    role_unassigned = {
-        'admin': None,
-        'nurse': None,
-        'hca': None,
-        'senior_manager': None,
-        'ward_manager': None,
-        'doctor': None
-    }
-    xml_file = os.path.join(data_folder, 'users.xml')
-    tree = ElementTree(file=xml_file)
-    data = tree.getroot().find('data')
-    unassigned_roles_dict = dict(role_unassigned)
-    unassigned_output = get_first_user_per_role(unassigned_roles_dict, data)
-    print('USERS NOT ASSIGNED TO ANY WARD:')
-    pprint(unassigned_output)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
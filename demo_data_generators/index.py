@@ -0,0 +1,283 @@
+"""
+Index of the users, patients and spells of a generated dataset.
+
+Load tests need the logins of a role on a ward, the patient in a bed and
+the spell of a patient. Finding them in the data files means parsing every
+``demo_users.xml`` in full, and the patients and spells files grow with the
+wards. When asked to, the coordinator also writes them to ``index.sqlite``
+in the data folder, where they are looked up through SQL indexes:
+
+- ``users``: external id, login, name and role of every user, in the order
+  they were generated
+- ``user_wards``: the wards of the users assigned to some, directly or
+  through their beds. Users assigned to no ward have no rows
+- ``patients``: external id, hospital and NHS numbers, ward, current
+  location, bed code (``A3``, none when not in a bed) and spell activity of
+  every patient
+
+``get_users_by_role`` looks them up from the command line.
+"""
+import os
+import re
+import sqlite3
+
+from demo_data_generators.xml_eval import REF_REGEX
+
+INDEX_FILE = 'index.sqlite'
+
+# Role of a user, from its category
+ROLE_REGEX = re.compile(r'role_nhc_(\w+)')
+
+# Bed part of a bed location's external id
+BED_REGEX = re.compile(r'_b(\d+)$')
+
+SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    xml_id TEXT NOT NULL UNIQUE,
+    login TEXT NOT NULL,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE INDEX users_role ON users (role);
+CREATE TABLE user_wards (
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    ward TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE INDEX user_wards_ward_role ON user_wards (ward, role);
+CREATE INDEX user_wards_user ON user_wards (user_id);
+CREATE TABLE patients (
+    xml_id TEXT PRIMARY KEY,
+    other_identifier TEXT NOT NULL UNIQUE,
+    patient_identifier TEXT NOT NULL,
+    ward TEXT NOT NULL,
+    location TEXT NOT NULL,
+    bed TEXT,
+    spell TEXT NOT NULL
+);
+CREATE INDEX patients_ward ON patients (ward);
+CREATE INDEX patients_location ON patients (location);
+CREATE INDEX patients_bed ON patients (bed);
+"""
+
+USER_COLUMNS = 'users.xml_id, users.login, users.name, users.role'
+
+PATIENT_COLUMNS = 'xml_id, other_identifier, patient_identifier, ward, ' \
+                  'location, bed, spell'
+
+
+def get_users(data, wards):
+    """
+    Return the users of a ``<data>`` element, with the wards they are
+    assigned to.
+
+    :param data: ``<data>`` element of a users file
+    :param wards: ward names
+    :type wards: list
+    :return: external id, login, name, role and list of wards of every
+             user, in the order of the file
+    :rtype: list
+    """
+    ward_locations = dict(
+        ('nhc_def_conf_location_w{0}'.format(ward), ward) for ward in wards)
+    users = []
+    for record in data.iter('record'):
+        if record.get('model') != 'res.users':
+            continue
+        fields = dict((field.get('name'), field) for field in record)
+        role = ROLE_REGEX.search(fields['category_id'].get('eval')).group(1)
+        user_wards = []
+        locations = fields.get('location_ids')
+        if locations is not None:
+            for ref in REF_REGEX.findall(locations.get('eval')):
+                ward = ward_locations.get(BED_REGEX.sub('', ref))
+                if ward is not None and ward not in user_wards:
+                    user_wards.append(ward)
+        users.append([record.get('id'), fields['login'].text,
+                      fields['name'].text, role, user_wards])
+    return users
+
+
+def get_patients(patients, ward):
+    """
+    Return the rows of a ward's patients in the patients table.
+
+    :param patients: the ward's patients
+    :type patients: list
+    :param ward: name of the ward
+    :type ward: str
+    :rtype: list
+    """
+    rows = []
+    for patient in patients:
+        bed = None
+        if patient.in_bed:
+            bed = '{0}{1}'.format(
+                ward.upper(), BED_REGEX.search(patient.location_id).group(1))
+        rows.append([patient.patient_id, patient.other_identifier,
+                     patient.patient_identifier, ward, patient.location_id,
+                     bed, patient.spell_activity_id])
+    return rows
+
+
+def write_index(path, users, patients):
+    """
+    Write the index, moving it into place once complete.
+
+    :param path: path of the index
+    :type path: str
+    :param users: users, as returned by ``get_users``
+    :type users: list
+    :param patients: rows of the patients table
+    :type patients: list
+    """
+    tmp_path = path + '.tmp'
+    if os.path.isfile(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript(SCHEMA)
+        for user_id, (xml_id, login, name, role, user_wards) in \
+                enumerate(users, 1):
+            connection.execute('INSERT INTO users VALUES (?, ?, ?, ?, ?)',
+                               (user_id, xml_id, login, name, role))
+            connection.executemany(
+                'INSERT INTO user_wards VALUES (?, ?, ?)',
+                [(user_id, ward, role) for ward in user_wards])
+        connection.executemany(
+            'INSERT INTO patients VALUES (?, ?, ?, ?, ?, ?, ?)', patients)
+        connection.commit()
+    finally:
+        connection.close()
+    os.rename(tmp_path, path)
+
+
+class DemoDataIndex(object):
+    """
+    Look up the users, patients and spells of a dataset in its index.
+
+    Users and patients are returned as dicts of their columns, users in the
+    order they were generated.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the index, or of the data folder it is in
+        :type path: str
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, INDEX_FILE)
+        if not os.path.isfile(path):
+            # Connecting would create an empty database
+            raise IOError('No index at {0}, generate the data with '
+                          '--index'.format(path))
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.text_factory = str
+
+    def close(self):
+        self.connection.close()
+
+    def query(self, sql, parameters=()):
+        """Return the rows of a query, as dicts."""
+        return [dict(row) for row in
+                self.connection.execute(sql, parameters)]
+
+    def get_wards(self):
+        """Return the ward names, in the order they were generated."""
+        return [row['ward'] for row in self.query(
+            'SELECT ward FROM patients GROUP BY ward ORDER BY MIN(rowid)')]
+
+    def get_users(self, role=None, ward=None, unassigned=False):
+        """
+        Return the users with a role, on a ward, or both.
+
+        :param role: role of the users, any if None
+        :type role: str
+        :param ward: ward the users are assigned to, any if None
+        :type ward: str
+        :param unassigned: only return the users assigned to no ward
+        :type unassigned: bool
+        :rtype: list
+        """
+        conditions = []
+        parameters = []
+        if ward is not None:
+            sql = 'SELECT {0} FROM user_wards JOIN users ' \
+                  'ON users.id = user_wards.user_id'.format(USER_COLUMNS)
+            conditions.append('user_wards.ward = ?')
+            parameters.append(ward)
+            if role is not None:
+                conditions.append('user_wards.role = ?')
+                parameters.append(role)
+        else:
+            sql = 'SELECT {0} FROM users'.format(USER_COLUMNS)
+            if role is not None:
+                conditions.append('users.role = ?')
+                parameters.append(role)
+        if unassigned:
+            conditions.append('NOT EXISTS (SELECT 1 FROM user_wards '
+                              'WHERE user_wards.user_id = users.id)')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return self.query(sql + ' ORDER BY users.id', parameters)
+
+    def get_first_user_per_role(self, ward=None, unassigned=False):
+        """
+        Return the first user generated for each role, on a ward or
+        assigned to none.
+
+        :param ward: ward the users are assigned to, any if None
+        :type ward: str
+        :param unassigned: only look at the users assigned to no ward
+        :type unassigned: bool
+        :return: users, by role
+        :rtype: dict
+        """
+        first_users = {}
+        for user in self.get_users(ward=ward, unassigned=unassigned):
+            first_users.setdefault(user['role'], user)
+        return first_users
+
+    def get_patients(self, ward=None):
+        """
+        Return the patients, of a ward or all of them.
+
+        :param ward: name of the ward, any if None
+        :type ward: str
+        :rtype: list
+        """
+        sql = 'SELECT {0} FROM patients'.format(PATIENT_COLUMNS)
+        if ward is None:
+            return self.query(sql + ' ORDER BY rowid')
+        return self.query(sql + ' WHERE ward = ? ORDER BY rowid', (ward,))
+
+    def get_patient_in_bed(self, bed):
+        """
+        Return the patient in a bed.
+
+        :param bed: code (``A3``) or external id of the bed
+        :type bed: str
+        :return: the patient, None if the bed is free or unknown
+        :rtype: dict
+        """
+        rows = self.query(
+            'SELECT {0} FROM patients WHERE bed = ? OR location = ?'.format(
+                PATIENT_COLUMNS), (bed, bed))
+        return rows[0] if rows else None
+
+    def get_spell(self, patient):
+        """
+        Return the spell activity of a patient.
+
+        :param patient: external id or hospital number of the patient
+        :type patient: str
+        :return: external id of the spell activity, None if the patient is
+                 unknown
+        :rtype: str
+        """
+        rows = self.query(
+            'SELECT spell FROM patients WHERE xml_id = ? OR '
+            'other_identifier = ?', (patient, patient))
+        return rows[0]['spell'] if rows else None
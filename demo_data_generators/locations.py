@@ -3,7 +3,9 @@
 """
 Generate Ward and defined number of beds
 """
-from xml.etree.ElementTree import Element, SubElement
+from xml.etree.ElementTree import SubElement
+
+from demo_data_generators.sinks import TreeSink
 
 
 class LocationsGenerator(object):
@@ -11,13 +13,12 @@ class LocationsGenerator(object):
     Generate Locations
     """
 
-    def __init__(self, ward_name, beds_per_ward):
-
-        # Create root element
-        self.root = Element('openerp')
+    def __init__(self, ward_name, beds_per_ward, sink=None):
 
-        # Create data inside root element
-        self.data = SubElement(self.root, 'data', {'noupdate': '1'})
+        # Records go to the sink, an in-memory tree unless told otherwise
+        self.sink = sink if sink is not None else TreeSink()
+        self.root = self.sink.root
+        self.data = self.sink.data
 
         self.generate_location(ward_name, 'Ward {0}'.format(ward_name.upper()),
                                'ward', 'guh', ward_name, 0)
@@ -84,3 +85,4 @@ class LocationsGenerator(object):
             'name': 'context_ids',
             'eval': "[[6, False, [ref('{0}')]]]".format(context)
             })
+        self.sink.flush()
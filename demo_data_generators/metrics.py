@@ -0,0 +1,149 @@
+"""
+Metrics of a generation run, for build dashboards.
+
+``metrics.json`` holds, for the whole run:
+
+- ``models``: records written, by model
+- ``risk_bands``: NEWS observations planned (completed, partial and
+  scheduled), by the risk of the patient at the time
+- ``sequences``: the NEWS (completed and partial), assessment and medical
+  team notifications generated on every ward
+- ``files``: bytes (of all its shards when sharded) and records of every
+  data file, by path in the data folder
+- ``wards``: bytes and records of every ward's files
+- ``generators``: seconds spent in every generator, records written and
+  records per second. Wards taken from the cache count with the time
+  they took when they were generated. ``write`` is the time spent
+  finishing the ward files once their generators are done, ``index`` the
+  time spent writing the index, ``export`` the time spent writing the CSV
+  or COPY files.
+
+The same can be written in the Prometheus text format, for a node
+exporter's textfile collector or a push gateway.
+"""
+import json
+import os
+
+METRICS_FILE = 'metrics.json'
+
+# Prefix of the Prometheus metric names
+PROMETHEUS_PREFIX = 'openeobs_demo_data'
+
+
+def count_models(data):
+    """
+    Count the records of a ``<data>`` element, by model.
+
+    :param data: ``<data>`` element
+    :return: number of records, by model
+    :rtype: dict
+    """
+    models = {}
+    for record in data.iter('record'):
+        model = record.get('model')
+        models[model] = models.get(model, 0) + 1
+    return models
+
+
+def add_counts(total, counts):
+    """Add counts, by key, to a running total."""
+    for key, count in counts.iteritems():
+        total[key] = total.get(key, 0) + count
+
+
+def get_generator(path):
+    """
+    Return the generator that writes a data file.
+
+    :param path: path of the data file
+    :type path: str
+    :return: 'pos', 'users', 'locations', 'patients', ...
+    :rtype: str
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name in ('users', 'demo_users'):
+        return 'users'
+    if name.startswith('demo_'):
+        return name[len('demo_'):]
+    return name
+
+
+def get_rate(records, seconds):
+    """Return records per second, None if no time was measured."""
+    if not seconds:
+        return None
+    return round(records / seconds, 1)
+
+
+def escape_label(value):
+    """Escape a Prometheus label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"')\
+        .replace('\n', '\\n')
+
+
+def format_prometheus(metrics):
+    """
+    Return the metrics in the Prometheus text format.
+
+    :param metrics: metrics, as written to metrics.json
+    :type metrics: dict
+    :rtype: str
+    """
+    families = [
+        ('run_seconds', 'Seconds the run took', None,
+         [(None, metrics['seconds'])]),
+        ('records', 'Records written, by model', 'model',
+         sorted(metrics['models'].iteritems())),
+        ('observations', 'NEWS observations planned, by risk band', 'risk',
+         sorted(metrics['risk_bands'].iteritems())),
+        ('sequence', 'NEWS and notifications generated', 'sequence',
+         sorted(metrics['sequences'].iteritems())),
+        ('file_bytes', 'Bytes written, by data file', 'file',
+         sorted((path, item['bytes'])
+                for path, item in metrics['files'].iteritems())),
+        ('ward_bytes', 'Bytes written, by ward', 'ward',
+         sorted((ward, item['bytes'])
+                for ward, item in metrics['wards'].iteritems())),
+        ('ward_records', 'Records written, by ward', 'ward',
+         sorted((ward, item['records'])
+                for ward, item in metrics['wards'].iteritems())),
+        ('generator_seconds', 'Seconds spent, by generator', 'generator',
+         sorted((name, item['seconds'])
+                for name, item in metrics['generators'].iteritems())),
+        ('generator_records_per_second', 'Records written per second, by '
+         'generator', 'generator',
+         sorted((name, item['records_per_second'])
+                for name, item in metrics['generators'].iteritems()
+                if item['records_per_second'] is not None)),
+    ]
+    lines = []
+    for name, description, label, samples in families:
+        name = '{0}_{1}'.format(PROMETHEUS_PREFIX, name)
+        lines.append('# HELP {0} {1}'.format(name, description))
+        lines.append('# TYPE {0} gauge'.format(name))
+        for key, value in samples:
+            if label is None:
+                lines.append('{0} {1}'.format(name, value))
+            else:
+                lines.append('{0}{{{1}="{2}"}} {3}'.format(
+                    name, label, escape_label(key), value))
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(metrics, path, prometheus_path=None):
+    """
+    Write the metrics as JSON, and in the Prometheus text format if asked.
+
+    :param metrics: metrics of the run
+    :type metrics: dict
+    :param path: path of the JSON file
+    :type path: str
+    :param prometheus_path: path of the Prometheus text file, if any
+    :type prometheus_path: str
+    """
+    with open(path, 'w') as metrics_file:
+        json.dump(metrics, metrics_file, indent=2, sort_keys=True,
+                  separators=(',', ': '))
+    if prometheus_path:
+        with open(prometheus_path, 'w') as prometheus_file:
+            prometheus_file.write(format_prometheus(metrics))
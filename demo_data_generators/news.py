@@ -1,19 +1,80 @@
 # pylint: disable=C0103
 """Generates NEWS Observations"""
-from xml.etree.ElementTree import Element, SubElement, Comment
-import random
+from xml.etree.ElementTree import Comment
+
+from demo_data_generators.index import BED_REGEX
+from demo_data_generators.sinks import TreeSink
+from demo_data_generators.templates import RecordTemplate
+
+NEWS_MODEL = 'nh.clinical.patient.observation.ews'
+
+# Notification models and the name their XML ids are built with
+NOTIFICATION_IDS = {
+    'nh.clinical.notification.assessment': 'assess',
+    'nh.clinical.notification.medical_team': 'medical'
+}
+
+
+class NewsTimeline(object):
+    """
+    Planned NEWS observations for one patient.
+
+    Every completed or partial observation is a step, described by the
+    entries at the same index of each list. The scheduled observation that
+    ends the timeline is kept apart.
+    """
+
+    __slots__ = (
+        'offset', 'schedule_minutes', 'complete_minutes', 'risks', 'partial',
+        'overdue', 'user_ids', 'notification_states', 'scheduled_minutes',
+        'scheduled_risk'
+    )
+
+    def __init__(self, offset):
+        # Days of history, observations are timed in minutes from then
+        self.offset = offset
+        self.schedule_minutes = []
+        self.complete_minutes = []
+        self.risks = []
+        self.partial = []
+        self.overdue = []
+        self.user_ids = []
+        # State of the notification raised by each completed observation
+        self.notification_states = []
+        self.scheduled_minutes = None
+        self.scheduled_risk = None
 
 
 class NewsGenerator(object):
-    """Generates NEWS Observations"""
-    def __init__(self, ward_strategy, ews_seq, assess_seq, medical_seq):
-
-        # Create root element
-        self.root = Element('openerp')
-
-        # Create data inside root element
-        self.data = SubElement(self.root, 'data', {'noupdate': '1'})
+    """
+    Generates NEWS Observations
+
+    A patient's observations only depend on the patient, their bed and the
+    ward's strategy, not on the other patients on the ward: external ids
+    and activity sequences are numbered per patient (patient ids keep them
+    unique), so a patient's records are the same whether they are generated
+    alone or with the whole ward. ``ews_seq`` counts the observations
+    generated, ``assess_seq`` and ``medical_seq`` the notification records
+    emitted of each model, carrying on from the counts given.
+    """
+    # Class the record templates are compiled with
+    template_class = RecordTemplate
+
+    def __init__(self, ward_strategy, ews_seq, assess_seq, medical_seq,
+                 sink=None, progress=None):
+
+        # Records go to the sink, an in-memory tree unless told otherwise
+        self.sink = sink if sink is not None else TreeSink()
+        self.root = self.sink.root
+        self.data = self.sink.data
+        # Told about every patient done, see progress
+        self.progress = progress
+        # Numbers of the current patient's activities, observations and
+        # notifications, see emit_news
         self.act_seq = 1
+        self.news_number = 0
+        self.assess_number = 0
+        self.medical_number = 0
 
         self.increasing_risk = ['none', 'low', 'medium', 'high']
         self.decreasing_risk = ['high', 'medium', 'low', 'none']
@@ -68,6 +129,11 @@ class NewsGenerator(object):
         self.ews_seq = ews_seq
         self.assess_seq = assess_seq
         self.medical_seq = medical_seq
+        # Observations planned (completed, partial and scheduled), by risk
+        self.risk_counts = {}
+        # Observations emitted, as reported to progress
+        self.observations = 0
+        self.compile_templates()
         # Generate the patient observations
         self.generate_news(ward_strategy)
 
@@ -77,96 +143,169 @@ class NewsGenerator(object):
         them until the schedule date reaches 'now' or later
         :return:
         """
+        timelines = self.plan_news(ward_strategy)
+        risk_counts = self.risk_counts
+        progress = self.progress
+        for patient, timeline in zip(ward_strategy.patients, timelines):
+            for risk in timeline.risks + [timeline.scheduled_risk]:
+                risk_counts[risk] = risk_counts.get(risk, 0) + 1
+            self.emit_news(patient, timeline)
+            observations = len(timeline.risks) + 1
+            self.observations += observations
+            if progress is not None:
+                progress.patient_done(observations)
+
+    def plan_news(self, ward_strategy):
+        """
+        Plan the observation timeline of every patient on the ward.
+
+        All the decisions (risk, partial or overdue observations, the user
+        completing them) are taken here, drawing from each patient's own
+        random stream, so that emitting is just formatting.
+
+        :param ward_strategy: strategy for the ward
+        :type ward_strategy: WardStrategy
+        :return: a timeline per patient
+        :rtype: list
+        """
+        # Built once, rather than for every overdue draw
+        ratio = ward_strategy.overdue_ratio
+        overdue_choices = \
+            [True]*int(ratio*100) + [False]*int(100 - ratio*100)
+        timelines = []
         for patient in ward_strategy.patients:
-            final_risk = self.get_risk(ward_strategy)
+            final_risk = self.get_risk(ward_strategy, patient)
+            # Days of history, the patient was admitted this long ago
+            offset = -patient.admit_offset
+            rng = ward_strategy.get_random(patient, 'news')
+            timeline = NewsTimeline(offset)
             risk = self.starting_risk[final_risk]
-            offset_position = patient.date_terminated.find('timedelta(-') + 11
-            offset = int(patient.date_terminated[offset_position])
-            creator = patient.placement_id
-            minutes = 15
-            date_template = '(datetime.now() + timedelta(-{0}) + ' \
-                            'timedelta(minutes={1}))' \
-                            '.strftime(\'%Y-%m-%d %H:%M:%S\')'
-            schedule_date_eval = date_template.format(offset, minutes)
-            complete_date_eval = date_template.format(offset, minutes)
-
-            # Generate observation data
+            increasing = final_risk in ['medium', 'high']
+            minutes = schedule = complete = 15
             while self.to_be_completed(offset, minutes):
-                user_id = ward_strategy.pick_user_id()
-
-                # determine whether obs will be partial
-                if self.ews_seq % 10 == 0:
-                    self.generate_partial_news_observation(
-                        patient, creator, user_id, schedule_date_eval, risk
-                    )
+                timeline.user_ids.append(ward_strategy.pick_user_id(rng))
+                timeline.schedule_minutes.append(schedule)
+                timeline.complete_minutes.append(complete)
+                timeline.overdue.append(complete > schedule)
+                timeline.risks.append(risk)
+
+                # determine whether obs will be partial, one in ten steps
+                # counting from the patient's id
+                partial = (int(patient.id) + len(timeline.partial)) % 10 == 0
+                timeline.partial.append(partial)
+                if partial:
+                    timeline.notification_states.append(None)
                 else:
-                    self.generate_completed_news_data(
-                        patient, creator, user_id, schedule_date_eval,
-                        complete_date_eval, risk
-                    )
-
                     minutes += self.minutes[risk]
-                    patient.date_terminated = schedule_date_eval
-                    creator = 'nhc_activity_demo_news_{0}_{1}'.format(
-                        patient.id, self.ews_seq)
-
                     if self.to_be_completed(offset, minutes):
-                        self.generate_notification(
-                            patient, creator, schedule_date_eval, risk,
-                            'completed'
-                        )
+                        timeline.notification_states.append('completed')
                     else:
-                        self.generate_notification(
-                            patient, creator, schedule_date_eval, risk,
-                            'scheduled'
-                        )
-                    if final_risk in ['medium', 'high']:
+                        timeline.notification_states.append('scheduled')
+                    if increasing:
                         risk = self.pick_next_risk_increasing(
                             offset, minutes, risk, final_risk)
                     else:
                         risk = self.pick_next_risk_decreasing(
                             offset, minutes, risk, final_risk)
 
-                    schedule_date_eval = date_template.format(offset, minutes)
-
-                    if self.is_overdue(ward_strategy.overdue_ratio):
-                        minutes += random.choice(
+                    schedule = minutes
+                    if rng.choice(overdue_choices):
+                        minutes += rng.choice(
                             ward_strategy.overdue_distribution)
-                    complete_date_eval = date_template.format(offset, minutes)
+                    complete = minutes
 
-                self.ews_seq += 1
+            timeline.scheduled_minutes = schedule
+            timeline.scheduled_risk = risk
+            timelines.append(timeline)
+        return timelines
 
-            self.generate_scheduled_news_data(
-                patient, creator, schedule_date_eval, risk)
+    def emit_news(self, patient, timeline):
+        """
+        Generate the NEWS and notification records planned for a patient.
+
+        :param patient: the patient the observations are for
+        :type patient: Patient
+        :param timeline: the patient's planned observations
+        :type timeline: NewsTimeline
+        """
+        date_template = '(datetime.now() + timedelta(-{0}) + ' \
+                        'timedelta(minutes={1}))' \
+                        '.strftime(\'%Y-%m-%d %H:%M:%S\')'
+        offset = timeline.offset
+        creator = patient.placement_id
+        self.act_seq = 1
+        self.news_number = 0
+        self.assess_number = 0
+        self.medical_number = 0
+        for step in xrange(len(timeline.risks)):
+            risk = timeline.risks[step]
+            user_id = timeline.user_ids[step]
+            schedule_date_eval = date_template.format(
+                offset, timeline.schedule_minutes[step])
+            if timeline.partial[step]:
+                self.generate_partial_news_observation(
+                    patient, creator, user_id, schedule_date_eval, risk
+                )
+            else:
+                complete_date_eval = date_template.format(
+                    offset, timeline.complete_minutes[step])
+                self.generate_completed_news_data(
+                    patient, creator, user_id, schedule_date_eval,
+                    complete_date_eval, risk
+                )
+                creator = 'nhc_activity_demo_news_{0}_{1}'.format(
+                    patient.id, self.news_number)
+                self.generate_notification(
+                    patient, creator, schedule_date_eval, risk,
+                    timeline.notification_states[step]
+                )
+
+            self.news_number += 1
+            self.ews_seq += 1
+            self.sink.flush()
+
+        self.generate_scheduled_news_data(
+            patient, creator,
+            date_template.format(offset, timeline.scheduled_minutes),
+            timeline.scheduled_risk)
+        self.sink.flush()
 
     def to_be_completed(self, offset, minutes):
         return float(minutes)/(24*60) < offset
 
-    def get_risk(self, ward_strategy):
-        for key in ward_strategy.risk_distribution.keys():
-            if ward_strategy.risk_distribution[key]:
-                ward_strategy.risk_distribution[
-                    key] = ward_strategy.risk_distribution[key] - 1
-                return key
-        return False
+    def get_risk(self, ward_strategy, patient):
+        """
+        Return the risk a patient's observations end on.
+
+        Beds take the risks of the ward's distribution in turn, highest
+        first, so the risk only depends on the patient's bed and a ward
+        with as many beds as the distribution counts gets those counts.
 
-    def is_overdue(self, ratio):
-        choices = [True]*int(ratio*100) + [False]*int(100 - ratio*100)
-        return random.choice(choices)
+        :param ward_strategy: strategy for the ward
+        :type ward_strategy: WardStrategy
+        :param patient: a patient in a bed
+        :type patient: Patient
+        :rtype: str
+        """
+        distribution = ward_strategy.risk_distribution
+        total = sum(distribution.values())
+        if not total:
+            raise ValueError('The risk distribution has no patients')
+        bed = int(BED_REGEX.search(patient.location_id).group(1))
+        slot = (bed - 1) % total
+        for risk in self.decreasing_risk:
+            count = distribution.get(risk, 0)
+            if slot < count:
+                return risk
+            slot -= count
 
     def pick_next_risk_increasing(
             self, offset, minutes, current_risk, final_risk):
-        if self.to_be_completed(offset, minutes+self.minutes[current_risk]):
-            return current_risk
-        else:
-            if current_risk == final_risk:
-                return current_risk
-            else:
-                return self.pick_next_risk_increasing(
-                    offset, minutes,
-                    self.increasing_risk[
-                        self.increasing_risk.index(current_risk)+1],
-                    final_risk)
+        while current_risk != final_risk and not self.to_be_completed(
+                offset, minutes+self.minutes[current_risk]):
+            current_risk = self.increasing_risk[
+                self.increasing_risk.index(current_risk)+1]
+        return current_risk
 
     def pick_next_risk_decreasing(
             self, offset, minutes, current_risk, final_risk):
@@ -250,7 +389,7 @@ class NewsGenerator(object):
             self.update_activity_not(
                 patient, 'nh.clinical.notification.assessment')
 
-            self.assess_seq += 1
+            self.assess_number += 1
 
         elif risk == 'medium':
             self.create_activity_not_record(
@@ -262,7 +401,7 @@ class NewsGenerator(object):
             self.update_activity_not(
                 patient, 'nh.clinical.notification.medical_team')
 
-            self.medical_seq += 1
+            self.medical_number += 1
 
         else:
             self.create_activity_not_record(
@@ -274,547 +413,188 @@ class NewsGenerator(object):
             self.update_activity_not(
                 patient, 'nh.clinical.notification.medical_team')
 
-            self.assess_seq += 1
+            self.medical_number += 1
+
+    def compile_templates(self):
+        """
+        Compile the shape of every NEWS and notification record once.
+
+        The observation values only depend on the risk, so they are part of
+        the templates, one per risk. Fixed fields are only shared between
+        records when the sink does not keep them.
+        """
+        share = not self.sink.keeps_records
+
+        def template(model, fields):
+            """Return a template for the sink."""
+            return self.template_class(model, fields, share=share)
+
+        self.news_templates = {}
+        self.partial_news_templates = {}
+        for risk, values in self.values.iteritems():
+            references = [
+                ('activity_id', 'ref', None),
+                ('patient_id', 'ref', None),
+                ('frequency', 'eval', str(self.minutes[risk]))
+            ]
+            measurements = [
+                (name, 'eval', values[name]) for name in
+                ('respiration_rate', 'indirect_oxymetry_spo2',
+                 'oxygen_administration_flag', 'body_temperature',
+                 'blood_pressure_systolic', 'blood_pressure_diastolic',
+                 'pulse_rate')
+            ] + [('avpu_text', 'text', values['avpu_text'])]
+            self.news_templates[(risk, True)] = template(
+                NEWS_MODEL, references + measurements)
+            self.news_templates[(risk, False)] = template(
+                NEWS_MODEL, references)
+            # Partial observations miss the o2 saturation
+            self.partial_news_templates[risk] = template(
+                NEWS_MODEL, references + measurements[:1] + measurements[2:])
+
+        activity = [
+            ('patient_id', 'ref', None),
+            ('creator_id', 'ref', None),
+            ('parent_id', 'ref', None),
+            ('spell_activity_id', 'ref', None)
+        ]
+        terminated = [('date_terminated', 'eval', None)]
+        # Keyed by whether the activity is completed
+        self.activity_news_templates = {}
+        for completed in (True, False):
+            self.activity_news_templates[completed] = template(
+                'nh.activity', activity + [
+                    ('state', 'text', None),
+                    ('data_model', 'text', NEWS_MODEL),
+                    ('sequence', 'eval', None),
+                    ('location_id', 'ref', None),
+                    ('date_scheduled', 'eval', None)
+                ] + (terminated + [('terminate_uid', 'ref', None)]
+                     if completed else []))
+
+        self.activity_not_templates = {}
+        self.not_templates = {}
+        for model in NOTIFICATION_IDS:
+            for completed in (True, False):
+                self.activity_not_templates[(model, completed)] = \
+                    template('nh.activity', activity + [
+                        ('sequence', 'eval', None),
+                        ('state', 'text', None),
+                        ('data_model', 'text', model),
+                        ('summary', 'text', None),
+                        ('location_id', 'ref', None),
+                        ('date_scheduled', 'eval', None)
+                    ] + (terminated if completed else []))
+            self.not_templates[model] = template(model, [
+                ('activity_id', 'ref', None),
+                ('patient_id', 'ref', None)
+            ])
+
+        self.update_activity_template = template(
+            'nh.activity', [('data_ref', 'eval', None)])
 
     def update_activity_news(self, patient):
         """Update activity NEWS"""
-
-        # Create nh.clinical.patient.observation.ews record with id & data
-        update_activity_news_record = SubElement(
+        self.update_activity_template.stamp(
             self.data,
-            'record',
-            {
-                'model': 'nh.activity',
-                'id': 'nhc_activity_demo_news_{0}_{1}'.format(
-                    patient.id, self.ews_seq)
-            }
-        )
-
-        # Create activity ref
-        eval_string = '\'nh.clinical.patient.observation.ews,\' + ' \
-                      'str(ref(\'nhc_demo_news_{0}_{1}\'))'
-        SubElement(
-            update_activity_news_record,
-            'field',
-            {
-                'name': 'data_ref',
-                'eval': eval_string.format(patient.id, self.ews_seq)
-            }
+            'nhc_activity_demo_news_{0}_{1}'.format(
+                patient.id, self.news_number),
+            '\'{0},\' + str(ref(\'nhc_demo_news_{1}_{2}\'))'.format(
+                NEWS_MODEL, patient.id, self.news_number)
         )
 
     def create_partial_news_record(self, patient, risk):
         """Create partial NEWS record"""
-
-        # Create nh.activity NEWS record with id
-        news_record = SubElement(
+        self.partial_news_templates[risk].stamp(
             self.data,
-            'record',
-            {
-                'model': 'nh.clinical.patient.observation.ews',
-                'id': 'nhc_demo_news_{0}_{1}'.format(
-                    patient.id, self.ews_seq)
-            }
-        )
-
-        # Create activity_id reference
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'activity_id',
-                'ref': 'nhc_activity_demo_news_{0}_{1}'.format(
-                    patient.id, self.ews_seq)
-            }
-        )
-
-        # Create patient_id reference
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'patient_id',
-                'ref': patient.patient_id
-            }
-        )
-
-        # Create partial observation data (missing o2 rate)
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'frequency',
-                'eval': str(self.minutes[risk])
-            }
-        )
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'respiration_rate',
-                'eval': self.values[risk]['respiration_rate']
-            }
-        )
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'oxygen_administration_flag',
-                'eval': self.values[risk]['oxygen_administration_flag']
-            }
-        )
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'body_temperature',
-                'eval': self.values[risk]['body_temperature']
-            }
-        )
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'blood_pressure_systolic',
-                'eval': self.values[risk]['blood_pressure_systolic']
-            }
-        )
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'blood_pressure_diastolic',
-                'eval': self.values[risk]['blood_pressure_diastolic']
-            }
+            'nhc_demo_news_{0}_{1}'.format(patient.id, self.news_number),
+            'nhc_activity_demo_news_{0}_{1}'.format(
+                patient.id, self.news_number),
+            patient.patient_id
         )
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'pulse_rate',
-                'eval': self.values[risk]['pulse_rate']
-            }
-        )
-        avpu = SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'avpu_text',
-            }
-        )
-        avpu.text = self.values[risk]['avpu_text']
 
     def create_news_record(self, patient, risk, complete):
         """Create NEWS record"""
-
-        # Create nh.activity NEWS record with id
-        news_record = SubElement(
+        self.news_templates[(risk, bool(complete))].stamp(
             self.data,
-            'record',
-            {
-                'model': 'nh.clinical.patient.observation.ews',
-                'id': 'nhc_demo_news_{0}_{1}'.format(
-                    patient.id, self.ews_seq)
-            }
-        )
-
-        # Create activity_id reference
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'activity_id',
-                'ref': 'nhc_activity_demo_news_{0}_{1}'.format(
-                    patient.id, self.ews_seq)
-            }
-        )
-
-        # Create patient_id reference
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'patient_id',
-                'ref': patient.patient_id
-            }
+            'nhc_demo_news_{0}_{1}'.format(patient.id, self.news_number),
+            'nhc_activity_demo_news_{0}_{1}'.format(
+                patient.id, self.news_number),
+            patient.patient_id
         )
 
-        # Create observation data
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'frequency',
-                'eval': str(self.minutes[risk])
-            }
-        )
-        if complete:
-            SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'respiration_rate',
-                    'eval': self.values[risk]['respiration_rate']
-                }
-            )
-            SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'indirect_oxymetry_spo2',
-                    'eval': self.values[risk]['indirect_oxymetry_spo2']
-                }
-            )
-            SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'oxygen_administration_flag',
-                    'eval': self.values[risk]['oxygen_administration_flag']
-                }
-            )
-            SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'body_temperature',
-                    'eval': self.values[risk]['body_temperature']
-                }
-            )
-            SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'blood_pressure_systolic',
-                    'eval': self.values[risk]['blood_pressure_systolic']
-                }
-            )
-            SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'blood_pressure_diastolic',
-                    'eval': self.values[risk]['blood_pressure_diastolic']
-                }
-            )
-            SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'pulse_rate',
-                    'eval': self.values[risk]['pulse_rate']
-                }
-            )
-            avpu = SubElement(
-                news_record,
-                'field',
-                {
-                    'name': 'avpu_text',
-                }
-            )
-            avpu.text = self.values[risk]['avpu_text']
-
     def create_activity_news_record(
             self, patient, creator, date, complete_date, state, user_id=False):
         """Create activity NEWS record"""
-
-        # Create nh.activity NEWS record with id
-        activity_news_record = SubElement(
-            self.data,
-            'record',
-            {
-                'model': 'nh.activity',
-                'id': 'nhc_activity_demo_news_{0}_{1}'.format(
-                    patient.id, self.ews_seq)
-            }
-        )
-
-        # Create patient_id reference
-        SubElement(
-            activity_news_record,
-            'field',
-            {
-                'name': 'patient_id',
-                'ref': patient.patient_id
-            }
-        )
-
-        # Create creator_id reference
-        SubElement(
-            activity_news_record,
-            'field',
-            {
-                'name': 'creator_id',
-                'ref': creator
-            }
-        )
-
-        # Create parent_id reference
-        SubElement(
-            activity_news_record,
-            'field',
-            {
-                'name': 'parent_id',
-                'ref': patient.spell_activity_id
-            }
-        )
-
-        # Create spell_activity_id reference
-        SubElement(
-            activity_news_record,
-            'field',
-            {
-                'name': 'spell_activity_id',
-                'ref': patient.spell_activity_id
-            }
-        )
-
-        # Create activity state
-        activity_news_state = SubElement(activity_news_record,
-                                         'field',
-                                         {'name': 'state'})
-        activity_news_state.text = state
-
-        # Create activity data model
-        activity_news_model = SubElement(activity_news_record,
-                                         'field',
-                                         {'name': 'data_model'})
-        activity_news_model.text = 'nh.clinical.patient.observation.ews'
-
-        # Create activity sequence
-        SubElement(activity_news_record, 'field',
-                   {'name': 'sequence', 'eval': str(self.act_seq)})
+        values = [
+            patient.patient_id, creator, patient.spell_activity_id,
+            patient.spell_activity_id, state, str(self.act_seq),
+            patient.location_id, date
+        ]
         self.act_seq += 1
-
-        # Create location_id reference
-        SubElement(
-            activity_news_record,
-            'field',
-            {
-                'name': 'location_id',
-                'ref': patient.location_id
-            }
-        )
-
-        # Create activity date scheduled
-        SubElement(
-            activity_news_record,
-            'field',
-            {
-                'name': 'date_scheduled',
-                'eval': date
-            }
+        completed = state == 'completed'
+        if completed:
+            values.extend([complete_date, str(user_id)])
+        self.activity_news_templates[completed].stamp(
+            self.data,
+            'nhc_activity_demo_news_{0}_{1}'.format(
+                patient.id, self.news_number),
+            *values
         )
 
-        # Create activity date terminated
-        if state == 'completed':
-            SubElement(
-                activity_news_record,
-                'field',
-                {
-                    'name': 'date_terminated',
-                    'eval': complete_date
-                }
-            )
-            SubElement(
-                activity_news_record,
-                'field',
-                {
-                    'name': 'terminate_uid',
-                    'ref': str(user_id)
-                }
-            )
-
     def create_activity_not_record(
             self, patient, date, state, creator, model, title):
         """Create activity notification record"""
-
-        if model == 'nh.clinical.notification.assessment':
-            sequence = self.assess_seq
-            id_string = 'nhc_activity_demo_not_assess_{0}_{1}'
-        else:
-            sequence = self.medical_seq
-            id_string = 'nhc_activity_demo_not_medical_{0}_{1}'
-
-        # Create nh.activity notification record with id
-        activity_not_record = SubElement(
-            self.data,
-            'record',
-            {
-                'model': 'nh.activity',
-                'id': id_string.format(
-                    patient.id, sequence)
-            }
-        )
-
-        # Create patient_id reference
-        SubElement(
-            activity_not_record,
-            'field',
-            {
-                'name': 'patient_id',
-                'ref': patient.patient_id
-            }
-        )
-
-        # Create creator_id reference
-        SubElement(
-            activity_not_record,
-            'field',
-            {
-                'name': 'creator_id',
-                'ref': creator
-            }
-        )
-
-        # Create parent_id reference
-        SubElement(
-            activity_not_record,
-            'field',
-            {
-                'name': 'parent_id',
-                'ref': patient.spell_activity_id
-            }
-        )
-
-        # Create spell_activity_id reference
-        SubElement(
-            activity_not_record,
-            'field',
-            {
-                'name': 'spell_activity_id',
-                'ref': patient.spell_activity_id
-            }
-        )
-
-        # Create activity sequence
-        SubElement(activity_not_record, 'field',
-                   {'name': 'sequence', 'eval': str(self.act_seq)})
+        values = [
+            patient.patient_id, creator, patient.spell_activity_id,
+            patient.spell_activity_id, str(self.act_seq), state, title,
+            patient.location_id, date
+        ]
         self.act_seq += 1
-
-        # Create activity state
-        activity_not_state = SubElement(activity_not_record,
-                                        'field',
-                                        {'name': 'state'})
-        activity_not_state.text = state
-
-        # Create activity data model
-        activity_not_model = SubElement(activity_not_record,
-                                        'field',
-                                        {'name': 'data_model'})
-        activity_not_model.text = model
-
-        # Create activity summary
-        activity_not_model = SubElement(activity_not_record,
-                                        'field',
-                                        {'name': 'summary'})
-        activity_not_model.text = title
-
-        # Create location_id reference
-        SubElement(
-            activity_not_record,
-            'field',
-            {
-                'name': 'location_id',
-                'ref': patient.location_id
-            }
-        )
-
-        # Create activity date terminated
-        SubElement(
-            activity_not_record,
-            'field',
-            {
-                'name': 'date_scheduled',
-                'eval': date
-            }
+        completed = state == 'completed'
+        if completed:
+            values.append(date)
+        self.activity_not_templates[(model, completed)].stamp(
+            self.data,
+            'nhc_activity_demo_not_{0}_{1}_{2}'.format(
+                NOTIFICATION_IDS[model], patient.id,
+                self.get_notification_seq(model)),
+            *values
         )
 
-        # Create activity date scheduled
-        if state == 'completed':
-            SubElement(
-                activity_not_record,
-                'field',
-                {
-                    'name': 'date_terminated',
-                    'eval': date
-                }
-            )
-
     def create_not_record(self, patient, model):
         """Create NEWS record"""
-
-        if model == 'nh.clinical.notification.assessment':
-            sequence = self.assess_seq
-            id_string = 'nhc_demo_not_assess_{0}_{1}'
-            ref_string = 'nhc_activity_demo_not_assess_{0}_{1}'
-        else:
-            sequence = self.medical_seq
-            id_string = 'nhc_demo_not_medical_{0}_{1}'
-            ref_string = 'nhc_activity_demo_not_medical_{0}_{1}'
-
-        # Create nh.activity notification record with id
-        news_record = SubElement(
+        name = NOTIFICATION_IDS[model]
+        sequence = self.get_notification_seq(model)
+        self.not_templates[model].stamp(
             self.data,
-            'record',
-            {
-                'model': model,
-                'id': id_string.format(
-                    patient.id, sequence)
-            }
+            'nhc_demo_not_{0}_{1}_{2}'.format(name, patient.id, sequence),
+            'nhc_activity_demo_not_{0}_{1}_{2}'.format(
+                name, patient.id, sequence),
+            patient.patient_id
         )
-
-        # Create activity_id reference
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'activity_id',
-                'ref': ref_string.format(
-                    patient.id, sequence)
-            }
-        )
-
-        # Create patient_id reference
-        SubElement(
-            news_record,
-            'field',
-            {
-                'name': 'patient_id',
-                'ref': patient.patient_id
-            }
-        )
-
-    def update_activity_not(self, patient, model):
-        """Update activity notification"""
-
+        # Counted by the model of the record emitted
         if model == 'nh.clinical.notification.assessment':
-            sequence = self.assess_seq
-            eval_string = '\'' + model + \
-                          ',\' + str(ref(\'nhc_demo_not_assess_{0}_{1}\'))'
-            id_string = 'nhc_activity_demo_not_assess_{0}_{1}'
+            self.assess_seq += 1
         else:
-            sequence = self.medical_seq
-            eval_string = '\'' + model + \
-                          ',\' + str(ref(\'nhc_demo_not_medical_{0}_{1}\'))'
-            id_string = 'nhc_activity_demo_not_medical_{0}_{1}'
+            self.medical_seq += 1
 
-        # Create notification record with id & data
-        update_activity_news_record = SubElement(
+    def update_activity_not(self, patient, model):
+        """Update activity notification"""
+        name = NOTIFICATION_IDS[model]
+        sequence = self.get_notification_seq(model)
+        self.update_activity_template.stamp(
             self.data,
-            'record',
-            {
-                'model': 'nh.activity',
-                'id': id_string.format(
-                    patient.id, sequence)
-            }
+            'nhc_activity_demo_not_{0}_{1}_{2}'.format(
+                name, patient.id, sequence),
+            '\'{0},\' + str(ref(\'nhc_demo_not_{1}_{2}_{3}\'))'.format(
+                model, name, patient.id, sequence)
         )
 
-        # Create activity ref
-        SubElement(
-            update_activity_news_record,
-            'field',
-            {
-                'name': 'data_ref',
-                'eval': eval_string.format(patient.id, sequence)
-            }
-        )
+    def get_notification_seq(self, model):
+        """
+        Return the number of the patient's current notification of a model.
+        """
+        if model == 'nh.clinical.notification.assessment':
+            return self.assess_number
+        return self.medical_number
@@ -0,0 +1,42 @@
+# coding=utf-8
+"""Patient data shared between the generators"""
+import re
+
+
+class Patient(object):
+    """
+    A demo patient.
+
+    ``PatientsGenerator`` creates one for every patient record it writes, and
+    the generators built on top of it read these instead of searching the
+    patients XML again.
+    """
+
+    __slots__ = (
+        'id', 'patient_id', 'patient_identifier', 'other_identifier',
+        'location_id', 'ward_location_id', 'in_bed', 'admit_offset',
+        'spell_activity_id', 'placement_id', 'activity_id'
+    )
+
+    def __init__(self):
+        # Number and XML id of the patient record
+        self.id = None
+        self.patient_id = None
+        # NHS and hospital numbers
+        self.patient_identifier = None
+        self.other_identifier = None
+        # Current location (bed, or ward if not in a bed) and its ward
+        self.location_id = None
+        self.ward_location_id = None
+        self.in_bed = False
+        # Days relative to now the patient was admitted, e.g. -2
+        self.admit_offset = None
+        # XML ids of the patient's spell and placement activities
+        self.spell_activity_id = None
+        self.placement_id = None
+        self.activity_id = None
+
+    def set_id(self):
+        match = re.search(r'(\d+)$', self.patient_id)
+        if match is not None:
+            self.id = match.group()
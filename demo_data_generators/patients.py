@@ -3,9 +3,12 @@
 """
 Generate Fake Patients based on the locations created
 """
-from faker import Factory
-from xml.etree.ElementTree import Element, SubElement
-import random
+from xml.etree.ElementTree import SubElement
+
+from demo_data_generators.demographics import get_pool
+from demo_data_generators.patient import Patient
+from demo_data_generators.random_streams import get_random
+from demo_data_generators.sinks import TreeSink
 
 
 class PatientsGenerator(object):
@@ -14,14 +17,16 @@ class PatientsGenerator(object):
     """
 
     def __init__(self, patient_id_offset, patients_in_bed, patients_out_bed,
-                 ward):
-        self.data_generator = Factory.create()
-
-        # Create root element
-        self.root = Element('openerp')
+                 ward, sink=None, seed=None, demographics=None):
+        # Names and dates of birth to draw from
+        self.demographics = \
+            demographics if demographics is not None else get_pool()
+        self.seed = seed
 
-        # Create data inside root element
-        self.data = SubElement(self.root, 'data', {'noupdate': '1'})
+        # Records go to the sink, an in-memory tree unless told otherwise
+        self.sink = sink if sink is not None else TreeSink()
+        self.root = self.sink.root
+        self.data = self.sink.data
 
         # Gender / Sex list
         self.gender_sex_list = ['M', 'F']
@@ -30,6 +35,9 @@ class PatientsGenerator(object):
         self.ethnicity_list = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'J',
                                'K', 'L', 'M', 'N', 'P', 'R', 'S', 'Z']
 
+        # Patients for the generators built on top of this one
+        self.patients = []
+
         # Generate patients in bed
         self.generate_patients(patient_id_offset=patient_id_offset,
                                total_patients=patients_in_bed, ward=ward)
@@ -53,24 +61,32 @@ class PatientsGenerator(object):
         for item in xrange(0, total_patients):
             item_delta = item + 1
             patient_id = patient_id_offset + item
+            patient = Patient()
+            patient.id = str(patient_id)
+            patient.patient_id = 'nhc_demo_patient_{0}'.format(patient_id)
+            patient.spell_activity_id = \
+                'nhc_activity_demo_spell_{0}'.format(patient_id)
+            patient.placement_id = 'nhc_demo_placement_{0}'.format(patient_id)
+            patient.activity_id = \
+                'nhc_activity_demo_placement_{0}'.format(patient_id)
+            # Demographics come from the patient's own random stream
+            rng = get_random(self.seed, ward, patient.id, 'demographics')
             # Create record with id and patient model
             record = SubElement(
                 self.data,
                 'record',
                 {
                     'model': 'nh.clinical.patient',
-                    'id': 'nhc_demo_patient_{0}'.format(patient_id)
+                    'id': patient.patient_id
                 }
             )
 
             # create DOB field with fake data
             dob_field = SubElement(record, 'field', {'name': 'dob'})
-            dob_field.text = '{0}'.format(
-                self.data_generator.date_time_between(
-                    start_date="-90y", end_date="-18y"))
+            dob_field.text = '{0}'.format(self.demographics.dob(rng))
 
             # Create Gender / Sex fields with fake data
-            gender_sex = random.choice(self.gender_sex_list)
+            gender_sex = rng.choice(self.gender_sex_list)
             gender_field = SubElement(record, 'field', {'name': 'gender'})
             gender_field.text = gender_sex
             sex_field = SubElement(record, 'field', {'name': 'sex'})
@@ -79,37 +95,33 @@ class PatientsGenerator(object):
             # Create Ethnicity
             ethnicity_field = SubElement(record, 'field',
                                          {'name': 'ethnicity'})
-            ethnicity_field.text = random.choice(self.ethnicity_list)
+            ethnicity_field.text = rng.choice(self.ethnicity_list)
 
             # Create identifiers
             patient_id = str(patient_id).zfill(4)
             patient_id_field = SubElement(record, 'field',
                                           {'name': 'patient_identifier'})
-            patient_id_field.text = 'NHSNUM{0}'.format(patient_id)
+            patient.patient_identifier = 'NHSNUM{0}'.format(patient_id)
+            patient_id_field.text = patient.patient_identifier
             other_id_field = SubElement(record, 'field',
                                         {'name': 'other_identifier'})
-            other_id_field.text = 'HOSNUM{0}'.format(patient_id)
+            patient.other_identifier = 'HOSNUM{0}'.format(patient_id)
+            other_id_field.text = patient.other_identifier
 
             # Create First Name
-            if gender_sex == 'M':
-                first_name = self.data_generator.first_name_male()
-            else:
-                first_name = self.data_generator.first_name_female()
+            first_name = self.demographics.first_name(rng, gender_sex)
             first_name_field = SubElement(record, 'field',
                                           {'name': 'given_name'})
             first_name_field.text = first_name
 
             # Create Middle Name
-            if gender_sex == 'M':
-                middle_name = self.data_generator.first_name_male()
-            else:
-                middle_name = self.data_generator.first_name_female()
+            middle_name = self.demographics.first_name(rng, gender_sex)
             middle_name_field = SubElement(record, 'field',
                                            {'name': 'middle_names'})
             middle_name_field.text = middle_name
 
             # Create last name
-            last_name = self.data_generator.last_name()
+            last_name = self.demographics.last_name(rng)
             last_name_field = SubElement(record, 'field',
                                          {'name': 'family_name'})
             last_name_field.text = last_name
@@ -118,12 +130,17 @@ class PatientsGenerator(object):
             bed_string = ''
             if in_bed:
                 bed_string = '_b{0}'.format(item_delta)
+            patient.in_bed = in_bed
+            patient.ward_location_id = \
+                'nhc_def_conf_location_w{0}'.format(ward)
+            patient.location_id = patient.ward_location_id + bed_string
             SubElement(
                 record,
                 'field',
                 {
                     'name': 'current_location_id',
-                    'ref': 'nhc_def_conf_location_w{0}{1}'.format(ward,
-                                                                  bed_string)
+                    'ref': patient.location_id
                 }
             )
+            self.patients.append(patient)
+            self.sink.flush()
@@ -0,0 +1,382 @@
+"""
+Export the bulk of the generated data as PostgreSQL ``COPY`` files.
+
+Even batched ``load()`` calls go through the ORM one record at a time.
+For the tables holding most of the data (patients, activities and NEWS
+observations) this writes the rows themselves, in ``COPY ... FROM STDIN``
+text format, to load straight into the database:
+
+- ``<table>.copy``: the rows, database ids assigned from ``first_id`` on
+- ``ir_model_data.copy``: their external ids, so ``ref()`` and later data
+  files still find them
+- ``updates.copy``: fields referring to records of other tables
+  (locations, users, spells, ...) by external id, and fields set by records
+  updating an earlier one (such as the ``data_ref`` of activities)
+- ``001_pos.xml``, ``002_demo_locations.xml``, ...: the data files,
+  numbered in load order, without the records of the copied tables. Files
+  left with no record are not written
+- ``data_files.txt``: the names of these data files, in load order
+- ``load.sql``: copies the rows, to run before the data files are loaded
+- ``resolve.sql``: applies the updates, the last one of each field winning,
+  to run once the data files are loaded. It fails, leaving the database as
+  it was, if an external id it needs is not in ``ir_model_data``
+
+So the data is loaded with ``psql -f load.sql``, then the data files listed
+in ``data_files.txt`` in the demo module, then ``psql -f resolve.sql``. Both
+scripts are run from the folder holding the files.
+
+Rows bypass the ORM, so fields Odoo computes and stores on create (such as
+the NEWS score) are left empty. Evals are evaluated while exporting, so
+dates are relative to the time of the export.
+"""
+import os
+from datetime import datetime
+from xml.etree.ElementTree import iterparse
+
+from demo_data_generators.xml_eval import REF_REGEX, ExternalId, evaluate, \
+    qualify
+from demo_data_generators.sinks import StreamingXMLSink
+
+# Tables written as COPY data, and their columns, by model (in load order)
+COPY_TABLES = (
+    ('nh.clinical.patient', 'nh_clinical_patient', (
+        'dob', 'gender', 'sex', 'ethnicity', 'patient_identifier',
+        'other_identifier', 'given_name', 'middle_names', 'family_name',
+        'current_location_id')),
+    ('nh.activity', 'nh_activity', (
+        'patient_id', 'creator_id', 'parent_id', 'spell_activity_id',
+        'state', 'data_model', 'sequence', 'summary', 'location_id',
+        'date_started', 'date_scheduled', 'date_terminated', 'terminate_uid',
+        'data_ref')),
+    ('nh.clinical.patient.observation.ews',
+     'nh_clinical_patient_observation_ews', (
+         'activity_id', 'patient_id', 'frequency', 'respiration_rate',
+         'indirect_oxymetry_spo2', 'oxygen_administration_flag',
+         'body_temperature', 'blood_pressure_systolic',
+         'blood_pressure_diastolic', 'pulse_rate', 'avpu_text')),
+)
+
+# Columns Odoo sets on every row
+LOG_COLUMNS = ('create_uid', 'create_date', 'write_uid', 'write_date')
+
+# First database id given to the exported rows, leaving room for the rows
+# created by other means
+FIRST_ID = 1000000
+
+IR_MODEL_DATA_COLUMNS = ('module', 'name', 'model', 'res_id', 'noupdate',
+                         'date_init', 'date_update')
+UPDATES_COLUMNS = ('sequence', 'table_name', 'res_id', 'column_name',
+                   'value', 'model', 'module', 'name')
+
+NULL = '\\N'
+
+# Names of the data files left to load, in load order
+DATA_FILES_FILE = 'data_files.txt'
+
+# Applies the updates, casting the values to the type of their column. An
+# external id missing from ir_model_data would leave a broken foreign key,
+# so it rolls everything back instead
+RESOLVE_SQL = """\\set ON_ERROR_STOP on
+BEGIN;
+CREATE TEMPORARY TABLE demo_updates (sequence integer, table_name varchar,
+    res_id integer, column_name varchar, value varchar, model varchar,
+    module varchar, name varchar);
+\\copy demo_updates ({0}) from 'updates.copy'
+CREATE TEMPORARY TABLE demo_values AS
+    SELECT DISTINCT ON (u.table_name, u.res_id, u.column_name)
+        u.table_name, u.res_id, u.column_name,
+        CASE WHEN u.name IS NULL THEN u.value
+             WHEN u.model IS NULL THEN d.res_id::varchar
+             ELSE u.model || ',' || d.res_id END AS value
+    FROM demo_updates u
+    LEFT JOIN ir_model_data d ON d.module = u.module AND d.name = u.name
+    ORDER BY u.table_name, u.res_id, u.column_name, u.sequence DESC;
+DO $$
+DECLARE
+    missing record;
+    total integer;
+BEGIN
+    SELECT count(*) INTO total FROM demo_updates u
+    LEFT JOIN ir_model_data d ON d.module = u.module AND d.name = u.name
+    WHERE u.name IS NOT NULL AND d.id IS NULL;
+    IF total > 0 THEN
+        SELECT u.module, u.name, u.table_name, u.column_name INTO missing
+        FROM demo_updates u
+        LEFT JOIN ir_model_data d ON d.module = u.module AND d.name = u.name
+        WHERE u.name IS NOT NULL AND d.id IS NULL
+        ORDER BY u.sequence LIMIT 1;
+        RAISE EXCEPTION '% unresolved external ids, first %.% for %.%',
+            total, missing.module, missing.name, missing.table_name,
+            missing.column_name;
+    END IF;
+END $$;
+DO $$
+DECLARE target record;
+BEGIN
+    FOR target IN SELECT DISTINCT table_name, column_name FROM demo_values
+    LOOP
+        EXECUTE format(
+            'UPDATE %I SET %I = v.value::%s FROM demo_values v '
+            'WHERE v.table_name = %L AND v.column_name = %L '
+            'AND %I.id = v.res_id',
+            target.table_name, target.column_name,
+            (SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+             WHERE attrelid = target.table_name::regclass
+             AND attname = target.column_name),
+            target.table_name, target.column_name, target.table_name);
+    END LOOP;
+END $$;
+COMMIT;
+""".format(', '.join(UPDATES_COLUMNS))
+
+
+def copy_escape(value):
+    """
+    Format a value for ``COPY`` text format.
+
+    :param value: value of a column, None for NULL
+    :return: the escaped text
+    :rtype: str
+    """
+    if value is None:
+        return NULL
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    elif not isinstance(value, str):
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t')\
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+class CopyExporter(object):
+    """
+    Convert the records of the copied tables to COPY files.
+
+    Records of other models are written to data files of their own, loaded
+    as usual.
+    """
+
+    def __init__(self, folder, module='nh_eobs_demo', first_id=FIRST_ID,
+                 tables=COPY_TABLES):
+        """
+        :param folder: folder to write the files to
+        :type folder: str
+        :param module: module the external ids without one belong to
+        :type module: str
+        :param first_id: first database id given to the rows of each table
+        :type first_id: int
+        :param tables: model, table and columns of the copied tables
+        :type tables: tuple
+        """
+        self.folder = folder
+        self.module = module
+        self.tables = dict((model, (table, columns))
+                           for model, table, columns in tables)
+        self.table_order = [table for _, table, _ in tables]
+        self.columns = dict((table, columns) for _, table, columns in tables)
+        self.next_ids = dict((table, first_id) for table in self.table_order)
+        # Table and database id of the exported records, by external id
+        self.ids = {}
+        # Order of the updates, the last one of a field wins
+        self.sequence = 0
+        self.timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.files = dict(
+            (name, open(os.path.join(folder, '{0}.copy'.format(name)), 'w'))
+            for name in self.table_order + ['ir_model_data', 'updates'])
+        self.rows_written = dict((table, 0) for table in self.table_order)
+        # Names of the data files written, in load order
+        self.data_files = []
+
+    def qualify(self, xml_id):
+        """Prefix an external id with the module if it has none."""
+        return qualify(xml_id, self.module)
+
+    def write_row(self, name, values):
+        """Write a row to one of the files."""
+        self.files[name].write('\t'.join(
+            copy_escape(value) for value in values) + '\n')
+
+    def export_files(self, paths):
+        """
+        Export XML data files.
+
+        :param paths: paths of the XML files, in load order
+        :type paths: list
+        """
+        for path in paths:
+            self.export_file(path)
+        self.close()
+
+    def export_file(self, path):
+        """
+        Export the records of an XML data file, one record at a time.
+
+        Records of the copied tables become rows, the others go to a data
+        file numbered after the files exported before.
+
+        :param path: path of the XML file
+        :type path: str
+        """
+        data = None
+        noupdate = False
+        sink = None
+        name = '{0:03d}_{1}'.format(len(self.data_files) + 1,
+                                    os.path.basename(path))
+        for event, element in iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == 'data':
+                    data = element
+                    noupdate = element.get('noupdate', '0') in ('1', 'True')
+            elif element.tag == 'record':
+                if element.attrib['model'] in self.tables:
+                    self.add_record(element, noupdate)
+                else:
+                    if sink is None:
+                        sink = StreamingXMLSink(
+                            os.path.join(self.folder, name),
+                            noupdate=noupdate)
+                    sink.data.append(element)
+                    sink.flush()
+                data.clear()
+        if sink is not None:
+            sink.close()
+            self.data_files.append(name)
+
+    def add_record(self, record, noupdate):
+        """
+        Write a record as a row, or as updates to an earlier row.
+
+        :param record: ``<record>`` element
+        :param noupdate: whether the record belongs to a noupdate block
+        :type noupdate: bool
+        """
+        model = record.attrib['model']
+        table, columns = self.tables[model]
+        xml_id = self.qualify(record.attrib['id'])
+        update = xml_id in self.ids
+        if update:
+            res_id = self.ids[xml_id][1]
+        else:
+            res_id = self.next_ids[table]
+            self.next_ids[table] += 1
+
+        values = {}
+        for field in record:
+            column = field.attrib['name']
+            if column not in columns:
+                raise ValueError('No column {0} in {1}'.format(column, table))
+            value, reference = self.get_value(field)
+            if reference is not None:
+                model_name, ref = reference
+                module, name = ref.split('.', 1)
+                self.write_update(table, res_id, column, None, model_name,
+                                  module, name)
+            elif update:
+                self.write_update(table, res_id, column, value)
+            else:
+                values[column] = value
+
+        if update:
+            return
+        self.ids[xml_id] = (table, res_id)
+        self.write_row(table, [res_id] + [
+            values.get(key) for key in columns
+        ] + [1, self.timestamp, 1, self.timestamp])
+        module, name = xml_id.split('.', 1)
+        self.write_row('ir_model_data', (
+            module, name, model, res_id, noupdate, self.timestamp,
+            self.timestamp))
+        self.rows_written[table] += 1
+
+    def write_update(self, table, res_id, column, value, model=None,
+                     module=None, name=None):
+        """
+        Write an update to a field, to a value or to an external id.
+
+        :param model: model prefixing the id, for a reference field
+        :type model: str
+        """
+        self.sequence += 1
+        self.write_row('updates', (self.sequence, table, res_id, column,
+                                   value, model, module, name))
+
+    def get_value(self, field):
+        """
+        Return the value of a field, or what it refers to in another table.
+
+        :param field: ``<field>`` element
+        :return: the value, and None or the model (None for a many2one)
+                 and external id the field refers to
+        :rtype: tuple
+        """
+        if 'ref' in field.attrib:
+            ref = self.qualify(field.attrib['ref'])
+            if ref in self.ids:
+                return self.ids[ref][1], None
+            return None, (None, ref)
+        if 'eval' not in field.attrib:
+            return field.text or '', None
+
+        expression = field.attrib['eval']
+        refs = [self.qualify(xml_id)
+                for xml_id in REF_REGEX.findall(expression)]
+        value = evaluate(expression, self.ref)
+        if isinstance(value, (list, tuple)):
+            raise ValueError('Relational commands cannot be copied: {0}'
+                             .format(expression))
+        if isinstance(value, ExternalId):
+            return None, (None, str(value))
+        if any(ref not in self.ids for ref in refs):
+            # A reference field, 'model,external id'
+            model_name, ref = value.split(',', 1)
+            return None, (model_name, ref)
+        return value, None
+
+    def ref(self, xml_id):
+        """
+        Stand in for ``ref()`` in evals: the database id of an exported
+        record, the external id of any other.
+        """
+        xml_id = self.qualify(xml_id)
+        if xml_id in self.ids:
+            return self.ids[xml_id][1]
+        return ExternalId(xml_id)
+
+    def close(self):
+        """Close the COPY files and write the scripts loading them."""
+        for copy_file in self.files.values():
+            copy_file.close()
+        with open(os.path.join(self.folder, 'load.sql'), 'w') as sql_file:
+            sql_file.write(self.get_load_sql())
+        with open(os.path.join(self.folder, 'resolve.sql'), 'w') as sql_file:
+            sql_file.write(RESOLVE_SQL)
+        with open(os.path.join(self.folder, DATA_FILES_FILE),
+                  'w') as list_file:
+            list_file.write(''.join(
+                '{0}\n'.format(name) for name in self.data_files))
+
+    def get_load_sql(self):
+        """
+        Return the ``psql`` script copying the rows.
+
+        :rtype: str
+        """
+        lines = [
+            '\\set ON_ERROR_STOP on',
+            'BEGIN;',
+            "\\copy ir_model_data ({0}) from 'ir_model_data.copy'".format(
+                ', '.join(IR_MODEL_DATA_COLUMNS))
+        ]
+        for table in self.table_order:
+            lines.append("\\copy {0} ({1}) from '{0}.copy'".format(
+                table, ', '.join(('id',) + self.columns[table] +
+                                 LOG_COLUMNS)))
+            lines.append(
+                "SELECT setval('{0}_id_seq', "
+                "(SELECT max(id) FROM {0}));".format(table))
+        lines.append('COMMIT;')
+        return '\n'.join(lines) + '\n'
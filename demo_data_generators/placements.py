@@ -1,48 +1,33 @@
 # pylint: disable=C0103
 """Generates placements"""
-from xml.etree.ElementTree import Element, SubElement, Comment
-import re
+from xml.etree.ElementTree import SubElement, Comment
+
+from demo_data_generators.sinks import TreeSink
 
 
 class PlacementsGenerator(object):
     """Generates placements"""
-    def __init__(self, patients, offsets):
-
-        # Create root element
-        self.root = Element('openerp')
+    def __init__(self, patients, offsets, sink=None):
 
-        # Create data inside root element
-        self.data = SubElement(self.root, 'data', {'noupdate': '1'})
+        # Records go to the sink, an in-memory tree unless told otherwise
+        self.sink = sink if sink is not None else TreeSink()
+        self.root = self.sink.root
+        self.data = self.sink.data
 
-        # Read the patient XML file
-        patient_data = patients.data
-        self.demo_patients = patient_data.findall('record')
+        # Patients as produced by the patients generator
+        self.demo_patients = patients.patients
 
         # List of time periods to randomly offset admissions
         self.offsets = offsets
         self.admit_date_eval_string = '(datetime.now() + timedelta({0}))' \
                                       '.strftime(\'%Y-%m-%d %H:%M:%S\')'
-
-        # Regex to use to get the ID for a patient from id attribute on record
-        patient_id_regex_string = r'nhc_demo_patient_(\d+)'
-        ward_regex_string = r'(nhc_def_conf_location_w\w)'
-        bed_regex_string = r'(nhc_def_conf_location_w\w_b(\d+))'
-        self.patient_id_regex = re.compile(patient_id_regex_string)
-        self.ward_regex = re.compile(ward_regex_string)
-        self.bed_regex = re.compile(bed_regex_string)
+        # Days relative to now the patients in a bed were admitted, by
+        # patient XML id
+        self.admit_offsets = {}
 
         # Generate the patient admissions
         self.admit_patients()
 
-    def remove_bed(self, bed_string):
-        """Removes a bed"""
-        ward_location = re.match(self.ward_regex, bed_string)
-        return ward_location.groups()[0]
-
-    def is_bed(self, location_string):
-        """Tells us if the location is a bed"""
-        return bool(re.search(self.bed_regex, location_string))
-
     def generate_placement_data(
             self, patient_id, patient, admit_offset, state):
         """Generate placement data"""
@@ -75,13 +60,10 @@ class PlacementsGenerator(object):
         """
         i = 0
         for patient in self.demo_patients:
-            patient_id_match = re.match(self.patient_id_regex,
-                                        patient.attrib['id'])
-            patient_id = patient_id_match.groups()[0]
+            patient_id = patient.id
             # Generate placement data
-            location_el = patient.find('field[@name=\'current_location_id\']')
-            location = location_el.attrib['ref']
-            if '_b' in location[-6:]:
+            if patient.in_bed:
+                self.admit_offsets[patient.patient_id] = self.offsets[i]
                 self.generate_placement_data(
                     patient_id, patient, self.offsets[i], 'completed')
                 self.generate_placement_movement_data(patient_id, patient,
@@ -89,6 +71,7 @@ class PlacementsGenerator(object):
             else:
                 self.generate_placement_data(
                     patient_id, patient, self.offsets[i], 'scheduled')
+            self.sink.flush()
             i += 1
 
     def create_activity_placement_record(self, patient_id, patient,
@@ -158,14 +141,12 @@ class PlacementsGenerator(object):
         activity_admit_model.text = 'nh.clinical.patient.placement'
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
 
@@ -214,16 +195,14 @@ class PlacementsGenerator(object):
         )
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
-        if self.is_bed(location):
+        if patient.in_bed:
             # Create pos / hospital reference
             SubElement(
                 activity_admit_record,
                 'field',
                 {
                     'name': 'location_id',
-                    'ref': location
+                    'ref': patient.location_id
                 }
             )
         SubElement(
@@ -231,7 +210,7 @@ class PlacementsGenerator(object):
             'field',
             {
                 'name': 'suggested_location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
 
@@ -324,14 +303,12 @@ class PlacementsGenerator(object):
         activity_admit_model.text = 'nh.clinical.patient.move'
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
 
@@ -378,14 +355,12 @@ class PlacementsGenerator(object):
         )
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'from_location_id',
-                'ref': self.remove_bed(location)
+                'ref': patient.ward_location_id
             }
         )
         SubElement(
@@ -393,7 +368,7 @@ class PlacementsGenerator(object):
             'field',
             {
                 'name': 'location_id',
-                'ref': location
+                'ref': patient.location_id
             }
         )
 
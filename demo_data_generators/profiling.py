@@ -0,0 +1,209 @@
+"""
+Profile the stages of a generation run, to find the slow or greedy one.
+
+Each stage runs under ``cProfile`` and leaves two files in the profile
+folder, numbered in the order the stages ran:
+
+- ``NN_<stage>.pstats``: the profile, to read with ``pstats`` or any
+  viewer taking its format
+- ``NN_<stage>.memory.json``: the memory taken by the stage, with the
+  objects it left behind counted by type
+
+Python 2 has no ``tracemalloc``, so memory is measured from the outside:
+the peak of the resident set size during the stage over its size when the
+stage started, what is left of it once the stage is over, and the objects
+the garbage collector tracks, counted and sized by type before and after
+the stage. The peak is reset before every stage where Linux allows it
+(``/proc/self/clear_refs``), elsewhere only a stage going higher than any
+earlier one shows a peak. ``summary.txt`` ranks the stages by time and by
+peak memory.
+"""
+import cProfile
+import gc
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+# Object types listed in a stage's memory file
+TOP_TYPES = 20
+
+SUMMARY_FILE = 'summary.txt'
+
+
+def reset_peak():
+    """
+    Reset the peak resident set size of the process, where Linux allows it.
+
+    :return: whether the peak was reset
+    :rtype: bool
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except IOError:
+        return False
+    return True
+
+
+def get_memory():
+    """
+    Return the resident set size of the process and its peak, in bytes.
+
+    :return: resident and peak resident set sizes
+    :rtype: tuple
+    """
+    sizes = {}
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, size = line.split()[:2]
+                    sizes[name] = int(size) * 1024
+    except IOError:
+        pass
+    if len(sizes) == 2:
+        return sizes['VmRSS:'], sizes['VmHWM:']
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        # Linux reports KiB, macOS bytes
+        peak *= 1024
+    return peak, peak
+
+
+def get_objects_by_type():
+    """
+    Count and size the objects tracked by the garbage collector, by type.
+
+    :return: count and bytes, by type name
+    :rtype: dict
+    """
+    objects = {}
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        count, size = objects.get(name, (0, 0))
+        objects[name] = (count + 1, size + sys.getsizeof(obj, 0))
+    return objects
+
+
+@contextmanager
+def no_stage():
+    """Stand in for ``StageProfiler.stage`` when not profiling."""
+    yield
+
+
+class StageProfiler(object):
+    """Profile stages one after the other, writing their files as they end."""
+
+    def __init__(self, folder):
+        """
+        :param folder: folder to write the profiles to, created if needed
+        :type folder: str
+        """
+        self.folder = folder
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        # Name, seconds, peak and resident growth in bytes and objects left
+        # behind, of every stage in order
+        self.stages = []
+
+    def get_path(self, name, extension):
+        """Return the path of one of a stage's files."""
+        return os.path.join(self.folder, '{0:02d}_{1}.{2}'.format(
+            len(self.stages) + 1, name, extension))
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Profile the code run in the ``with`` block as a stage.
+
+        :param name: name of the stage, used in its file names
+        :type name: str
+        """
+        profile = cProfile.Profile()
+        gc.collect()
+        objects_before = get_objects_by_type()
+        # Counting the objects takes memory of its own
+        reset_peak()
+        resident_before, peak_before = get_memory()
+        start = time.time()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            seconds = time.time() - start
+            resident_after, peak_after = get_memory()
+            gc.collect()
+            objects_after = get_objects_by_type()
+            profile.dump_stats(self.get_path(name, 'pstats'))
+
+            growth = []
+            for type_name, (count, size) in objects_after.iteritems():
+                count_before, size_before = objects_before.get(
+                    type_name, (0, 0))
+                if count != count_before or size != size_before:
+                    growth.append((size - size_before, count - count_before,
+                                   type_name))
+            growth.sort(reverse=True)
+            stage = {
+                'stage': name,
+                'seconds': round(seconds, 4),
+                'resident_bytes': resident_after - resident_before,
+                'peak_bytes': max(0, peak_after - max(peak_before,
+                                                      resident_before)),
+                'objects': sum(count for _, count, _ in growth)
+            }
+            memory = dict(stage)
+            memory.update({
+                'resident_bytes_after': resident_after,
+                'peak_bytes_after': peak_after,
+                'types': [
+                    {'type': type_name, 'objects': count, 'bytes': size}
+                    for size, count, type_name in growth[:TOP_TYPES]
+                ]
+            })
+            with open(self.get_path(name, 'memory.json'), 'w') as dump:
+                json.dump(memory, dump, indent=2, sort_keys=True,
+                          separators=(',', ': '))
+            self.stages.append(stage)
+
+    def get_summary(self):
+        """
+        Return the stages ranked by time, then by peak memory.
+
+        :return: the tables, as text
+        :rtype: str
+        """
+        total = sum(stage['seconds'] for stage in self.stages) or 1
+        header = '{0:<24} {1:>9} {2:>6} {3:>13} {4:>13} {5:>9}'.format(
+            'stage', 'seconds', '%time', 'peak B', 'resident B', 'objects')
+        lines = []
+        for title, key in (('By time', 'seconds'),
+                           ('By memory', 'peak_bytes')):
+            lines.extend([title, header])
+            for stage in sorted(self.stages, key=lambda item: item[key],
+                                reverse=True):
+                lines.append(
+                    '{0:<24} {1:>9.3f} {2:>6.1f} {3:>13} {4:>13} {5:>9}'
+                    .format(stage['stage'], stage['seconds'],
+                            100 * stage['seconds'] / total,
+                            stage['peak_bytes'], stage['resident_bytes'],
+                            stage['objects']))
+            lines.append('')
+        return '\n'.join(lines)
+
+    def write_summary(self):
+        """
+        Write the summary to the profile folder.
+
+        :return: the summary
+        :rtype: str
+        """
+        summary = self.get_summary()
+        path = os.path.join(self.folder, SUMMARY_FILE)
+        with open(path, 'w') as summary_file:
+            summary_file.write(summary)
+        return summary
@@ -0,0 +1,172 @@
+"""
+Progress and ETA of a generation run.
+
+The coordinator tells the reporter when a ward starts and ends, the NEWS
+generator when it is done with a patient. On a terminal the progress is
+redrawn in place a few times a second, otherwise it is logged every so
+often, so build logs get a line at a steady pace rather than one per
+patient.
+
+Most of the time goes into the NEWS observations, so the ETA is worked out
+from the patients whose observations are still to be generated.
+"""
+import logging
+import sys
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Seconds between two reports, on a terminal and in a log
+TTY_INTERVAL = 0.2
+LOG_INTERVAL = 10
+
+
+def format_duration(seconds):
+    """Return a duration as h:mm:ss."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{0}:{1:02d}:{2:02d}'.format(hours, minutes, seconds)
+
+
+class ProgressReporter(object):
+    """
+    Report the wards and patients done, the NEWS observations emitted, the
+    current records per second and the time left.
+    """
+
+    def __init__(self, wards, patients, stream=None, interval=None):
+        """
+        :param wards: number of wards to generate
+        :type wards: int
+        :param patients: number of patients to generate observations for
+        :type patients: int
+        :param stream: terminal or file to report to, stderr by default.
+                       Reports are logged unless it is a terminal.
+        :param interval: seconds between two reports, by default a few
+                         times a second on a terminal, every 10 seconds in
+                         a log
+        :type interval: float
+        """
+        self.stream = stream if stream is not None else sys.stderr
+        self.tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        if interval is None:
+            interval = TTY_INTERVAL if self.tty else LOG_INTERVAL
+        self.interval = interval
+        self.wards = wards
+        self.patients = patients
+        self.wards_done = 0
+        self.patients_done = 0
+        self.observations = 0
+        # Records of the wards done, and the sinks of the ward under way
+        self.records_done = 0
+        self.sinks = ()
+        self.start = self.last_time = time.time()
+        self.last_records = 0
+        self.next_report = self.start + interval
+        # Width of the last line drawn, to blank it out when redrawing
+        self.width = 0
+
+    def start_ward(self, sinks):
+        """
+        Start counting the records of a ward.
+
+        :param sinks: the sinks the ward's records are written to
+        :type sinks: list
+        """
+        self.sinks = sinks
+
+    def patient_done(self, observations):
+        """
+        Count a patient whose NEWS observations are all emitted.
+
+        :param observations: observations emitted for the patient
+        :type observations: int
+        """
+        self.patients_done += 1
+        self.observations += observations
+        if time.time() >= self.next_report:
+            self.report()
+
+    def ward_done(self, patients=0, records=None, observations=0):
+        """
+        Count a ward as done.
+
+        :param patients: patients of the ward not counted one by one, as
+                         when generated by another process
+        :type patients: int
+        :param records: records of the ward, if not written to the sinks
+                        given to ``start_ward``
+        :type records: int
+        :param observations: observations of the patients not counted one
+                             by one
+        :type observations: int
+        """
+        if records is None:
+            records = self.get_ward_records()
+        self.records_done += records
+        self.observations += observations
+        self.sinks = ()
+        self.patients_done += patients
+        self.wards_done += 1
+        self.report()
+
+    def skip_ward(self, patients):
+        """
+        Leave out a ward that does not need generating, as it is cached.
+
+        :param patients: patients the ward would have generated
+                         observations for
+        :type patients: int
+        """
+        self.wards -= 1
+        self.patients -= patients
+
+    def get_ward_records(self):
+        """Return the records written so far for the ward under way."""
+        return sum(sum(sink.models.values()) for sink in self.sinks)
+
+    def get_line(self, now):
+        """
+        Return the progress, as a line of text.
+
+        :param now: time of the report
+        :type now: float
+        :rtype: str
+        """
+        records = self.records_done + self.get_ward_records()
+        seconds = now - self.last_time
+        rate = (records - self.last_records) / seconds if seconds else 0
+        self.last_time = now
+        self.last_records = records
+        elapsed = now - self.start
+        if self.patients_done >= self.patients:
+            eta = format_duration(0)
+        elif self.patients_done:
+            eta = format_duration(elapsed * (self.patients -
+                                             self.patients_done) /
+                                  self.patients_done)
+        else:
+            eta = '?'
+        return 'wards {0}/{1}, patients {2}/{3}, {4} observations, ' \
+               '{5} records/s, elapsed {6}, ETA {7}'.format(
+                   self.wards_done, self.wards, self.patients_done,
+                   self.patients, self.observations, int(rate),
+                   format_duration(elapsed), eta)
+
+    def report(self):
+        """Draw or log the progress now."""
+        now = time.time()
+        self.next_report = now + self.interval
+        line = self.get_line(now)
+        if self.tty:
+            self.stream.write('\r{0}'.format(line.ljust(self.width)))
+            self.stream.flush()
+            self.width = len(line)
+        else:
+            _logger.info(line)
+
+    def finish(self):
+        """End the line drawn on a terminal, once every ward is done."""
+        if self.tty and self.width:
+            self.stream.write('\n')
+            self.stream.flush()
@@ -0,0 +1,40 @@
+# coding=utf-8
+"""
+Random streams derived from a seed and the entity they are drawn for.
+
+With a seed, every patient (or user) draws from its own ``random.Random``,
+seeded from the generation seed, the ward, the entity id and the name of
+the stream. An entity's records are then the same whatever order, or
+process, it is generated in, so any of them can be regenerated alone.
+Without a seed every stream is the global ``random`` module, as before.
+"""
+import hashlib
+import random
+
+
+def get_stream_seed(seed, *key):
+    """
+    Return the seed of the stream identified by a key.
+
+    :param seed: generation seed
+    :type seed: int
+    :param key: ward, entity id and stream name
+    :return: seed for ``random.Random``
+    :rtype: int
+    """
+    key = '/'.join(str(part) for part in (seed,) + key)
+    return int(hashlib.sha1(key).hexdigest()[:16], 16)
+
+
+def get_random(seed, *key):
+    """
+    Return the random stream identified by a key.
+
+    :param seed: generation seed, None for the global random module
+    :type seed: int
+    :param key: ward, entity id and stream name
+    :return: ``random.Random`` instance (or the ``random`` module)
+    """
+    if seed is None:
+        return random
+    return random.Random(get_stream_seed(seed, *key))
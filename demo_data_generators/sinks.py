@@ -0,0 +1,358 @@
+"""
+Record sinks the generators write their XML records to.
+
+A generator appends records to ``sink.data`` exactly as it would to an
+in-memory tree and calls ``sink.flush()`` once a group of records is
+complete. ``TreeSink`` keeps everything in memory (the default, used when
+the records are inspected rather than written, as in the tests), while
+``StreamingXMLSink`` serialises the flushed records straight to disk and
+drops them, so memory stays flat however many records are produced.
+
+Files are pretty printed while they are serialised, two spaces per level,
+rather than by rewriting the text and tail of every element beforehand.
+
+``ShardedXMLSink`` streams the same way, but starts a new file every so many
+records (``demo_news_001.xml``, ``demo_news_002.xml``, ...). Loading the
+shards in order loads the records in their original order, so every record
+still comes after the records it refers to.
+"""
+import os
+import re
+from xml.etree.ElementTree import Element, SubElement, Comment
+
+ENCODING = 'us-ascii'
+
+# Data files generated for each ward, demo_<name>.xml
+WARD_FILES = ('locations', 'patients', 'spells', 'admissions', 'placements',
+              'news')
+
+# File listing the shards in load order, in the data folder
+MANIFEST_FILE = 'manifest.json'
+
+# Folder the CSV files are written to, in the data folder
+CSV_FOLDER = 'csv'
+
+# Folder the PostgreSQL COPY files are written to, in the data folder
+COPY_FOLDER = 'copy'
+
+
+def get_shard_path(path, number):
+    """
+    Return the path of a shard of a data file.
+
+    :param path: path of the data file, as written without shards
+    :type path: str
+    :param number: number of the shard, from 1
+    :type number: int
+    :return: path of the shard
+    :rtype: str
+    """
+    base, extension = os.path.splitext(path)
+    return '{0}_{1:03d}{2}'.format(base, number, extension)
+
+
+def get_shard_paths(path):
+    """
+    Return the paths of the shards a data file was written to, in order.
+
+    :param path: path of the data file, as written without shards
+    :type path: str
+    :return: paths of the shards
+    :rtype: list
+    """
+    folder, name = os.path.split(path)
+    base, extension = os.path.splitext(name)
+    shard_regex = re.compile(r'{0}_(\d{{3,}}){1}$'.format(
+        re.escape(base), re.escape(extension)))
+    if not os.path.isdir(folder or '.'):
+        return []
+    shards = []
+    for shard_name in os.listdir(folder or '.'):
+        match = shard_regex.match(shard_name)
+        if match:
+            shards.append((int(match.group(1)),
+                           os.path.join(folder, shard_name)))
+    return [shard_path for _, shard_path in sorted(shards)]
+
+
+def get_data_files(data_folder, wards):
+    """
+    Return the paths of the XML data files, in an order they can load.
+
+    The ward locations come before the users file, as the multi ward users
+    refer to them.
+
+    :param data_folder: folder the data is generated in
+    :type data_folder: str
+    :param wards: ward names
+    :type wards: list
+    :return: paths of the data files, as written without shards
+    :rtype: list
+    """
+    ward_folders = [os.path.join(data_folder, 'ward_{0}'.format(ward))
+                    for ward in wards]
+    paths = [os.path.join(data_folder, 'pos.xml')]
+    paths.extend(os.path.join(ward_folder, 'demo_locations.xml')
+                 for ward_folder in ward_folders)
+    paths.append(os.path.join(data_folder, 'users.xml'))
+    for ward_folder in ward_folders:
+        paths.append(os.path.join(ward_folder, 'demo_users.xml'))
+        paths.extend(
+            os.path.join(ward_folder, 'demo_{0}.xml'.format(name))
+            for name in WARD_FILES if name != 'locations')
+    return paths
+
+
+def escape_cdata(text):
+    """Escape element text the way ElementTree does."""
+    text = text.replace('&', '&amp;').replace('<', '&lt;')\
+        .replace('>', '&gt;')
+    return text.encode(ENCODING, 'xmlcharrefreplace')
+
+
+def escape_attrib(text):
+    """Escape an attribute value the way ElementTree does."""
+    text = text.replace('&', '&amp;').replace('<', '&lt;')\
+        .replace('>', '&gt;').replace('"', '&quot;').replace('\n', '&#10;')
+    return text.encode(ENCODING, 'xmlcharrefreplace')
+
+
+def iter_xml(elem, level=0, compact=False):
+    """
+    Serialise an element and its children, yielding the output in pieces.
+
+    Indentation is added as the pieces are produced, so the tree itself is
+    never modified. Element tails are ignored, the generators never set
+    them. The tree is walked with an explicit stack, so deep trees cannot
+    hit the recursion limit.
+
+    :param elem: element to serialise
+    :param level: indentation level of the element
+    :type level: int
+    :param compact: leave out all indentation
+    :type compact: bool
+    :return: generator of strings
+    """
+    stack = [(elem, level)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+            continue
+        elem, level = item
+        if elem.tag is Comment:
+            yield '<!--{0}-->'.format(
+                elem.text.encode(ENCODING, 'xmlcharrefreplace'))
+            continue
+        attributes = ''.join(
+            ' {0}="{1}"'.format(key, escape_attrib(value))
+            for key, value in sorted(elem.items()))
+        text = elem.text
+        if not len(elem):
+            if text:
+                yield '<{0}{1}>{2}</{0}>'.format(elem.tag, attributes,
+                                                 escape_cdata(text))
+            else:
+                yield '<{0}{1} />'.format(elem.tag, attributes)
+            continue
+        yield '<{0}{1}>'.format(elem.tag, attributes)
+        if text and text.strip():
+            yield escape_cdata(text)
+        if compact:
+            inner = outer = ''
+        else:
+            inner = '\n' + '  ' * (level + 1)
+            outer = '\n' + '  ' * level
+        stack.append('{0}</{1}>'.format(outer, elem.tag))
+        for child in reversed(elem):
+            stack.append((child, level + 1))
+            stack.append(inner)
+
+
+def write_xml(root, path, compact=False):
+    """
+    Write an XML tree to a file, pretty printed unless compact.
+
+    :param root: root element of the tree
+    :param path: path of the XML file to write
+    :type path: str
+    :param compact: leave out all indentation
+    :type compact: bool
+    """
+    with open(path, 'w') as xml_file:
+        for piece in iter_xml(root, compact=compact):
+            xml_file.write(piece)
+        xml_file.write('\n')
+
+
+class TreeSink(object):
+    """
+    Collect records in an in-memory ``<openerp><data>`` tree
+    """
+
+    # Whether records stay reachable once flushed
+    keeps_records = True
+
+    def __init__(self, noupdate=True):
+        # Create root element
+        self.root = Element('openerp')
+
+        # Create data inside root element
+        attrib = {'noupdate': '1'} if noupdate else {}
+        self.data = SubElement(self.root, 'data', attrib)
+
+    def flush(self):
+        """Records stay in the tree, nothing to do."""
+        pass
+
+    def close(self):
+        """Nothing to release for an in-memory tree."""
+        pass
+
+
+class StreamingXMLSink(TreeSink):
+    """
+    Write records to an XML file incrementally as they are flushed.
+
+    The file is byte for byte the same as writing the equivalent tree with
+    ``write_xml``, but only the records added since the last flush are ever
+    held in memory.
+    """
+
+    keeps_records = False
+
+    def __init__(self, path, noupdate=True, compact=False):
+        """
+        :param path: path of the XML file to write
+        :type path: str
+        :param noupdate: set the noupdate flag on the data element
+        :type noupdate: bool
+        :param compact: leave out all indentation
+        :type compact: bool
+        """
+        super(StreamingXMLSink, self).__init__(noupdate=noupdate)
+        self.path = path
+        self.compact = compact
+        self.records_written = 0
+        # Records written, by model
+        self.models = {}
+        if compact:
+            self.record_indent = self.data_indent = self.root_indent = ''
+        else:
+            self.record_indent = '\n    '
+            self.data_indent = '\n  '
+            self.root_indent = '\n'
+        self.xml_file = open(path, 'w')
+        # Leave the data tag open so an empty file can still self-close it
+        opening_tag = ''.join(iter_xml(self.data))[:-len(' />')]
+        self.xml_file.write('<openerp>{0}{1}'.format(self.data_indent,
+                                                     opening_tag))
+
+    def flush(self):
+        """Serialise the pending records and drop them from memory."""
+        if self.xml_file is None or not len(self.data):
+            return
+        if not self.records_written:
+            self.xml_file.write('>')
+        models = self.models
+        for element in self.data:
+            self.xml_file.write(self.record_indent)
+            for piece in iter_xml(element, 2, self.compact):
+                self.xml_file.write(piece)
+            self.records_written += 1
+            if element.tag == 'record':
+                model = element.get('model')
+                models[model] = models.get(model, 0) + 1
+        del self.data[:]
+
+    def close(self):
+        """Write any pending records, close the tags and the file."""
+        if self.xml_file is None:
+            return
+        self.flush()
+        if self.records_written:
+            self.xml_file.write('{0}</data>{1}</openerp>\n'.format(
+                self.data_indent, self.root_indent))
+        else:
+            self.xml_file.write(' />{0}</openerp>\n'.format(self.root_indent))
+        self.xml_file.close()
+        self.xml_file = None
+
+
+class ShardedXMLSink(TreeSink):
+    """
+    Write records to XML files of at most so many records each.
+
+    Comments go to the same file as the record following them.
+    """
+
+    keeps_records = False
+
+    def __init__(self, path, max_records, noupdate=True, compact=False):
+        """
+        :param path: path of the XML file, as written without shards
+        :type path: str
+        :param max_records: maximum number of records per shard
+        :type max_records: int
+        :param noupdate: set the noupdate flag on the data elements
+        :type noupdate: bool
+        :param compact: leave out all indentation
+        :type compact: bool
+        """
+        super(ShardedXMLSink, self).__init__(noupdate=noupdate)
+        if max_records < 1:
+            raise ValueError('Shards must hold at least one record')
+        self.path = path
+        self.max_records = max_records
+        self.noupdate = noupdate
+        self.compact = compact
+        # Shards of an earlier run would be taken for part of this one
+        for shard_path in get_shard_paths(path):
+            os.remove(shard_path)
+        self.paths = []
+        self.shard = None
+        self.shard_records = 0
+        # Records written to all the shards, by model
+        self.models = {}
+        # Comments waiting for the record they belong with
+        self.pending = []
+        self.open_shard()
+
+    def open_shard(self):
+        """Finish the current shard, if any, and start the next one."""
+        if self.shard is not None:
+            self.shard.close()
+        self.paths.append(get_shard_path(self.path, len(self.paths) + 1))
+        self.shard = StreamingXMLSink(self.paths[-1], noupdate=self.noupdate,
+                                      compact=self.compact)
+        self.shard_records = 0
+
+    def flush(self):
+        """Serialise the pending records to the shards they fall in."""
+        if self.shard is None:
+            return
+        for element in self.data:
+            if element.tag != 'record':
+                self.pending.append(element)
+                continue
+            if self.shard_records >= self.max_records:
+                self.shard.flush()
+                self.open_shard()
+            self.shard.data.extend(self.pending)
+            self.shard.data.append(element)
+            self.pending = []
+            self.shard_records += 1
+            model = element.get('model')
+            self.models[model] = self.models.get(model, 0) + 1
+        del self.data[:]
+        self.shard.flush()
+
+    def close(self):
+        """Write any pending records and close the last shard."""
+        if self.shard is None:
+            return
+        self.flush()
+        self.shard.data.extend(self.pending)
+        self.pending = []
+        self.shard.close()
+        self.shard = None
@@ -1,31 +1,26 @@
 """Generates spells"""
-from xml.etree.ElementTree import Element, SubElement, Comment
-import re
+from xml.etree.ElementTree import SubElement, Comment
+
+from demo_data_generators.sinks import TreeSink
 
 
 class SpellsGenerator(object):
     """Generates spells"""
-    def __init__(self, patients, offsets):
-
-        # Create root element
-        self.root = Element('openerp')
+    def __init__(self, patients, offsets, sink=None):
 
-        # Create data inside root element
-        self.data = SubElement(self.root, 'data', {'noupdate': '1'})
+        # Records go to the sink, an in-memory tree unless told otherwise
+        self.sink = sink if sink is not None else TreeSink()
+        self.root = self.sink.root
+        self.data = self.sink.data
 
-        # Read the patient XML file
-        patient_data = patients.data
-        self.demo_patients = patient_data.findall('record')
+        # Patients as produced by the patients generator
+        self.demo_patients = patients.patients
 
         # List of time periods to randomly offset admissions
         self.offsets = offsets
         self.admit_date_eval_string = '(datetime.now() + timedelta({0}))' \
                                       '.strftime(\'%Y-%m-%d %H:%M:%S\')'
 
-        # Regex to use to get the ID for a patient from id attribute on record
-        patient_id_regex_string = r'nhc_demo_patient_(\d+)'
-        self.patient_id_regex = re.compile(patient_id_regex_string)
-
         # Generate the patient admissions
         self.admit_patients()
 
@@ -47,11 +42,10 @@ class SpellsGenerator(object):
         """
         i = 0
         for patient in self.demo_patients:
-            patient_id_match = re.match(self.patient_id_regex,
-                                        patient.attrib['id'])
-            patient_id = patient_id_match.groups()[0]
+            patient_id = patient.id
 
             self.generate_spell_data(patient_id, patient, self.offsets[i])
+            self.sink.flush()
             i += 1
 
     def create_activity_spell_record(self, patient_id, patient, admit_offset):
@@ -88,14 +82,12 @@ class SpellsGenerator(object):
         activity_admit_model.text = 'nh.clinical.spell'
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': location
+                'ref': patient.location_id
             }
         )
 
@@ -143,14 +135,12 @@ class SpellsGenerator(object):
         )
 
         # Create parent_id reference
-        location = patient.find('field[@name=\'current_location_id\']')\
-            .attrib['ref']
         SubElement(
             activity_admit_record,
             'field',
             {
                 'name': 'location_id',
-                'ref': location
+                'ref': patient.location_id
             }
         )
 
@@ -0,0 +1,92 @@
+"""
+Record templates, compiled once and stamped out for every record.
+
+Most records a generator produces have the same shape every time: the same
+model, the same fields in the same order, many of them with the same value.
+A ``RecordTemplate`` is given that shape once. Fields with a fixed value are
+built there and then and, unless shared, built again for every record
+stamped from the template.
+
+Records written by a streaming sink are serialised and dropped on the next
+flush, so nothing can reach their fields afterwards. Templates for those
+sinks can share the fixed fields between records instead
+(``share=True``, see ``TreeSink.keeps_records``). A shared field must then
+never be modified: the change would show in every record stamped from the
+template.
+"""
+from xml.etree.ElementTree import Element
+
+# Ways a field can hold its value
+FIELD_KINDS = ('ref', 'eval', 'text')
+
+
+class RecordTemplate(object):
+    """
+    The shape of a ``<record>``, stamped out with the values that change.
+    """
+
+    def __init__(self, model, fields, share=False):
+        """
+        :param model: model of the records
+        :type model: str
+        :param fields: ``(name, kind, value)`` for every field, in order,
+                       kind being 'ref', 'eval' or 'text'. A value of None
+                       leaves the field to be filled in when stamping.
+        :type fields: list
+        :param share: share the fixed fields between the records rather
+                      than building them for each, for records that are
+                      not kept
+        :type share: bool
+        """
+        self.model = model
+        self.share = share
+        # Fixed elements, None where a field is filled in when stamping
+        self.fields = []
+        # Position, name, kind and value of the fixed fields
+        self.fixed = []
+        # Position, name and kind of the fields filled in when stamping
+        self.slots = []
+        for position, (name, kind, value) in enumerate(fields):
+            if kind not in FIELD_KINDS:
+                raise ValueError('Unknown field kind: {0}'.format(kind))
+            if value is None:
+                self.fields.append(None)
+                self.slots.append((position, name, kind))
+            else:
+                self.fields.append(self.build_field(name, kind, value))
+                self.fixed.append((position, name, kind, value))
+
+    def build_field(self, name, kind, value):
+        """Return a ``<field>`` element holding a value."""
+        if kind == 'text':
+            field = Element('field', {'name': name})
+            field.text = value
+        else:
+            field = Element('field', {'name': name, kind: value})
+        return field
+
+    def stamp(self, parent, record_id, *values):
+        """
+        Append a record to the parent element.
+
+        :param parent: element to append the record to
+        :param record_id: XML id of the record
+        :type record_id: str
+        :param values: values of the fields left to fill in, in order
+        :return: the record
+        """
+        if len(values) != len(self.slots):
+            raise ValueError(
+                '{0} template takes {1} values, {2} given'.format(
+                    self.model, len(self.slots), len(values)))
+        record = Element('record', {'model': self.model, 'id': record_id})
+        children = self.fields[:]
+        build_field = self.build_field
+        if not self.share:
+            for position, name, kind, value in self.fixed:
+                children[position] = build_field(name, kind, value)
+        for (position, name, kind), value in zip(self.slots, values):
+            children[position] = build_field(name, kind, value)
+        record.extend(children)
+        parent.append(record)
+        return record
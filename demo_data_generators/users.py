@@ -4,14 +4,68 @@
 """
 Generate users, based on locations created and wards assignment schema.
 """
-from faker import Factory
-from faker.providers.person.en import Provider
 from xml.etree.ElementTree import Element, SubElement, Comment
 
+from demo_data_generators.demographics import get_pool
+from demo_data_generators.random_streams import get_random
+
+
+class NameAllocator(object):
+    """
+    Hand out unique first names for a role, one at a time.
+
+    Names come from the role's generator first, skipping the ones already
+    given out (the pool has a few names twice, in different cases). Once
+    the generator is exhausted the names are given out again with a numeric
+    suffix, round after round (``Nadia2``, ..., then ``Nadia3``, ...), so
+    there is no limit to the number of users and every name costs the same.
+    """
+
+    def __init__(self, names):
+        """
+        :param names: names to give out first
+        :type names: iterable
+        """
+        self.names = iter(names)
+        # Names given out by the generator, reused for the suffixed rounds
+        self.pool = []
+        # Lowercase names given out, as they are used for logins and ids
+        self.used = set()
+        self.suffixed = 0
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """
+        Return the next unique name.
+
+        :return: name, unique (case insensitively) among the ones returned
+        :rtype: str
+        """
+        for name in self.names:
+            if name.lower() not in self.used:
+                self.pool.append(name)
+                return self.take(name)
+        if not self.pool:
+            raise StopIteration
+        while True:
+            name = '{0}{1}'.format(
+                self.pool[self.suffixed % len(self.pool)],
+                self.suffixed // len(self.pool) + 2)
+            self.suffixed += 1
+            if name.lower() not in self.used:
+                return self.take(name)
+
+    def take(self, name):
+        """Mark a name as given out and return it."""
+        self.used.add(name.lower())
+        return name
+
 
 class UsersGenerator(object):
 
-    def __init__(self, users_schema):
+    def __init__(self, users_schema, seed=None, demographics=None):
         """
         Initialise the users generator, declaring variables and generators.
 
@@ -43,8 +97,13 @@ class UsersGenerator(object):
 
         :param users_schema: complete schema of users' assignment to wards
         :type users_schema: dict (see the docstring for further details)
+        :param seed: seed for the users' last names, random if None
+        :type seed: int
+        :param demographics: pool of last names, the default one if None
+        :type demographics: DemographicsPool
         """
         self.users_schema = users_schema
+        self.seed = seed
 
         # Create root element
         self.class_root = Element('openerp')
@@ -52,7 +111,8 @@ class UsersGenerator(object):
         self.class_data = SubElement(self.class_root, 'data',
                                      {'noupdate': '1'})
 
-        self.data_generator = Factory.create()
+        self.demographics = \
+            demographics if demographics is not None else get_pool()
 
         # Initialise additional user related data
         #
@@ -90,28 +150,45 @@ class UsersGenerator(object):
         # First name generators, once per role.
         # Each of them returns only names starting by the initial letter
         # of the role denomination.
+        first_names = self.demographics.all_first_names
         self.names_generators = {
-            'hca': (n for n in Provider.first_names
+            'hca': (n for n in first_names
                     if n.lower().startswith('h')),
-            'nurse': (n for n in Provider.first_names
+            'nurse': (n for n in first_names
                       if n.lower().startswith('n')),
-            'ward_manager': (n for n in Provider.first_names
+            'ward_manager': (n for n in first_names
                              if n.lower().startswith('w')),
-            'senior_manager': (n for n in Provider.first_names
+            'senior_manager': (n for n in first_names
                                if n.lower().startswith('s')),
-            'doctor': (n for n in Provider.first_names
+            'doctor': (n for n in first_names
                        if n.lower().startswith('d')),
-            'kiosk': (n for n in Provider.first_names
+            'kiosk': (n for n in first_names
                       if n.lower().startswith('k')),
-            'admin': (n for n in Provider.first_names
+            'admin': (n for n in first_names
                       if n.lower().startswith('o'))
         }
+        # Unique names handed out to each role, from its generator above
+        self.name_allocators = {}
 
     def get_beds_number_generator(self, beds_number):
         """Simple number generator."""
         for i in xrange(1, beds_number+1):
             yield i
 
+    def get_name_allocator(self, role):
+        """
+        Return the allocator of unique first names for a role.
+
+        :param role: role of the user in the POS (e.g. 'hca', 'nurse', etc.)
+        :type role: str
+        :return: allocator, shared by all the users of the role
+        :rtype: NameAllocator
+        """
+        if role not in self.name_allocators:
+            self.name_allocators[role] = NameAllocator(
+                self.names_generators[role])
+        return self.name_allocators[role]
+
     def build_user_data(self, xml_parent, role, first_name_generator, groups,
                         category, locations):
         """
@@ -122,8 +199,8 @@ class UsersGenerator(object):
         :param xml_parent: XML element to append the user data tree to
         :param role: role of the user in the POS (e.g. 'hca', 'nurse', etc.)
         :type role: str
-        :param first_name_generator: generator of name for a specific role
-        :type first_name_generator: Python generator
+        :param first_name_generator: unique names for a specific role
+        :type first_name_generator: NameAllocator
         :param groups: group(s) the user belongs to
         :type groups: str
         :param category: role(s) the user belongs to
@@ -132,11 +209,11 @@ class UsersGenerator(object):
         :type locations: str
         """
         first_name = next(first_name_generator)
-        last_name = self.data_generator.last_name()
+        user_id = 'nhc_def_conf_{0}_{1}_user'.format(role, first_name.lower())
+        last_name = self.demographics.last_name(
+            get_random(self.seed, 'users', user_id, 'names'))
         record = SubElement(xml_parent, 'record',
-                            {'model': 'res.users',
-                             'id': 'nhc_def_conf_{0}_{1}_user'.format(
-                                 role, first_name.lower())})
+                            {'model': 'res.users', 'id': user_id})
         # Create user name field
         name_field = SubElement(record, 'field', {'name': 'name'})
         name_field.text = '{0} {1}'.format(first_name, last_name)
@@ -203,7 +280,7 @@ class UsersGenerator(object):
                 category_id = "[(4, ref('nh_clinical.{0}'))]".format(
                     self.categories[role])
 
-                first_name_generator = self.names_generators.get(role)
+                first_name_generator = self.get_name_allocator(role)
 
                 beds_per_user = beds_per_ward / users_per_ward
 
@@ -253,7 +330,7 @@ class UsersGenerator(object):
                     self.groups[role])
                 category_id = "[(4, ref('nh_clinical.{0}'))]".format(
                     self.categories[role])
-                first_name_generator = self.names_generators.get(role)
+                first_name_generator = self.get_name_allocator(role)
                 location_ids = "[[6, False, []]]"
 
                 # Add a comment to divide XML in sections by role
@@ -280,7 +357,7 @@ class UsersGenerator(object):
                 category_id = "[(4, ref('nh_clinical.{0}'))]".format(
                     self.categories[role])
 
-                first_name_generator = self.names_generators.get(role)
+                first_name_generator = self.get_name_allocator(role)
 
                 # Add a comment to divide XML in sections by role
                 users_role_comment = Comment(' {0} '.format(role))
@@ -0,0 +1,374 @@
+"""
+Check the references of a generated dataset before it goes near a server.
+
+A broken reference otherwise only shows once the database is created and
+the demo module is half installed. This streams every data file, in load
+order, and checks that every record referred to is declared by then:
+
+- ``ref`` attributes of fields
+- ``ref(...)`` calls inside ``eval`` attributes
+- the model of ``data_ref`` fields (``'model,' + str(ref(...))``), which
+  has to be the model of the record referred to
+
+Only the id and model of the records are kept, never the records
+themselves, so memory stays flat however large the files. References to
+other modules (``nh_clinical.group_nhc_nurse``, ``base.main_company``...)
+cannot be checked from the dataset alone and are only counted.
+
+The load order is the one in ``manifest.json`` when the files are sharded,
+otherwise the order the coordinator writes them in. Only the data files the
+coordinator wrote are checked, unless given ``--other-files``: any other XML
+file in the folder then comes last, leaving out the ``csv`` and ``copy``
+export folders.
+
+Run with ``validate_openeobs_demo_data DIR``, the exit status is 1 if a
+reference is broken.
+"""
+import argparse
+import json
+import os
+import sys
+from multiprocessing import Pool
+from xml.parsers import expat
+
+from demo_data_generators.sinks import COPY_FOLDER, CSV_FOLDER, \
+    MANIFEST_FILE, get_data_files, get_shard_paths
+from demo_data_generators.xml_eval import REF_REGEX, REFERENCE_REGEX
+
+MODULE = 'nh_eobs_demo'
+
+# Ways a reference can be broken
+MISSING = 'missing'
+FORWARD = 'declared after use'
+WRONG_MODEL = 'wrong model'
+
+PARSER = argparse.ArgumentParser('Check the references of generated demo '
+                                 'data')
+PARSER.add_argument('data_folder', type=str,
+                    help='Folder the data was generated in')
+PARSER.add_argument('--module', type=str,
+                    help='Module the data is installed with, external ids '
+                         'without a module belong to it',
+                    default=MODULE)
+PARSER.add_argument('--jobs', type=int,
+                    help='Number of processes reading files at once',
+                    default=1)
+PARSER.add_argument('--max-errors', type=int,
+                    help='Broken references to list, all are counted',
+                    default=50)
+PARSER.add_argument('--other-files', action='store_true',
+                    help='Also check any other XML file in the folder, '
+                         'after the data files (the csv and copy export '
+                         'folders are left out)')
+
+# Folders of the data folder holding exports rather than data files
+EXPORT_FOLDERS = (CSV_FOLDER, COPY_FOLDER)
+
+
+def get_data_file_paths(data_folder):
+    """
+    Return the data files the coordinator wrote, in load order.
+
+    :param data_folder: folder the data was generated in
+    :type data_folder: str
+    :return: paths of the data files, or of their shards
+    :rtype: list
+    """
+    manifest_path = os.path.join(data_folder, MANIFEST_FILE)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        paths = [os.path.join(data_folder, shard['path'])
+                 for shard in manifest['files']]
+    else:
+        wards = sorted(
+            name[len('ward_'):] for name in os.listdir(data_folder)
+            if name.startswith('ward_') and
+            os.path.isdir(os.path.join(data_folder, name)))
+        paths = []
+        for path in get_data_files(data_folder, wards):
+            if os.path.isfile(path):
+                paths.append(path)
+            else:
+                paths.extend(get_shard_paths(path))
+    return paths
+
+
+def get_load_order(data_folder, other_files=False):
+    """
+    Return the XML files of a dataset, in load order.
+
+    :param data_folder: folder the data was generated in
+    :type data_folder: str
+    :param other_files: add any other XML file in the folder, outside of
+                        the export folders, after the data files
+    :type other_files: bool
+    :return: paths of the XML files
+    :rtype: list
+    """
+    paths = get_data_file_paths(data_folder)
+    if not other_files:
+        return paths
+    known = set(paths)
+    others = []
+    for folder, folders, names in os.walk(data_folder):
+        if folder == data_folder:
+            folders[:] = [name for name in folders
+                          if name not in EXPORT_FOLDERS]
+        others.extend(os.path.join(folder, name) for name in names
+                      if name.endswith('.xml') and
+                      os.path.join(folder, name) not in known)
+    return paths + sorted(others)
+
+
+class FileScan(object):
+    """
+    The records a data file declares, and the references it leaves open.
+
+    References to records declared earlier in the same file are checked
+    while scanning. The others are kept once per record and model referred
+    to, with the number of times they are made, to be checked against the
+    files loaded before.
+    """
+
+    def __init__(self, path, module=MODULE):
+        """
+        :param path: path of the XML file
+        :type path: str
+        :param module: module the external ids without one belong to
+        :type module: str
+        """
+        self.path = path
+        self.prefix = module + '.'
+        # Model of every record, by external id, and the ids in order
+        self.declared = {}
+        self.order = []
+        # Record and field of the first use and number of uses, by record
+        # referred to and model expected (for a data_ref)
+        self.unresolved = {}
+        # References broken within the file: record, field, reference,
+        # problem
+        self.errors = []
+        self.records = 0
+        self.references = 0
+        self.external = 0
+        # Record whose fields are being read, declared once they all are
+        self.record = None
+
+    def scan(self):
+        """
+        Read the file, keeping nothing but ids and models.
+
+        The references are all in attributes, so only the start of the
+        elements is looked at, and no element is ever built.
+
+        :return: the scan itself
+        :rtype: FileScan
+        """
+        parser = expat.ParserCreate()
+        parser.returns_unicode = False
+        parser.StartElementHandler = self.start
+        with open(self.path, 'rb') as xml_file:
+            parser.ParseFile(xml_file)
+        self.declare()
+        return self
+
+    def qualify(self, xml_id):
+        """Return an external id without its module, if it is ours."""
+        if xml_id.startswith(self.prefix):
+            return xml_id[len(self.prefix):]
+        return xml_id
+
+    def declare(self):
+        """Declare the record whose fields were just read, if any."""
+        if self.record is not None:
+            record_id, model = self.record
+            if record_id not in self.declared:
+                # A record may update one declared earlier, its model stays
+                self.declared[record_id] = model
+                self.order.append(record_id)
+            self.record = None
+
+    def start(self, tag, attributes):
+        """Look at an element as it starts."""
+        if tag == 'field':
+            ref = attributes.get('ref')
+            if ref is not None:
+                self.check(attributes.get('name'), ref)
+            expression = attributes.get('eval')
+            if expression is None or 'ref(' not in expression:
+                return
+            model = None
+            name = attributes.get('name')
+            if name == 'data_ref':
+                match = REFERENCE_REGEX.match(expression)
+                if match:
+                    model = match.group(1)
+            for ref in REF_REGEX.findall(expression):
+                self.check(name, ref, model)
+        elif tag == 'record':
+            self.declare()
+            self.records += 1
+            self.record = (self.qualify(attributes.get('id')),
+                           attributes.get('model'))
+
+    def check(self, field, ref, model=None):
+        """
+        Check a reference from a field of the current record.
+
+        :param model: model the record referred to must be of, if any
+        :type model: str
+        """
+        self.references += 1
+        ref = self.qualify(ref)
+        if '.' in ref:
+            # Declared by another module
+            self.external += 1
+            return
+        declared_model = self.declared.get(ref)
+        if declared_model is None:
+            key = (ref, model)
+            use = self.unresolved.get(key)
+            if use is None:
+                self.unresolved[key] = [self.record[0], field, 1]
+            else:
+                use[2] += 1
+        elif model is not None and model != declared_model:
+            self.errors.append((self.record[0], field, ref, WRONG_MODEL))
+
+
+def scan_file(job):
+    """
+    Scan a data file, in a worker process or not.
+
+    :param job: path of the file and module of the data
+    :type job: tuple
+    :rtype: FileScan
+    """
+    return FileScan(*job).scan()
+
+
+class ReferenceValidator(object):
+    """
+    Check the references of data files, in load order.
+
+    Broken references are kept as ``(path, record id, field, reference,
+    problem, uses)``, a reference being made as many times as ``uses``
+    from the same file.
+    """
+
+    def __init__(self, module=MODULE):
+        """
+        :param module: module the external ids without one belong to
+        :type module: str
+        """
+        self.module = module
+        # Model of every record declared so far, by external id
+        self.declared = {}
+        # References to records not declared (yet), by external id: path,
+        # record, field and number of uses of each
+        self.pending = {}
+        self.errors = []
+        self.records = 0
+        self.references = 0
+        self.external = 0
+        self.files = 0
+
+    def validate_files(self, paths, jobs=1):
+        """
+        Check data files, in load order.
+
+        :param paths: paths of the XML files
+        :type paths: list
+        :param jobs: number of processes scanning files at once
+        :type jobs: int
+        :return: the broken references
+        :rtype: list
+        """
+        scan_jobs = [(path, self.module) for path in paths]
+        if jobs > 1:
+            pool = Pool(jobs)
+            try:
+                # Scans come back in load order, as soon as they are done
+                for scan in pool.imap(scan_file, scan_jobs):
+                    self.add_scan(scan)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for job in scan_jobs:
+                self.add_scan(scan_file(job))
+        return self.finish()
+
+    def add_scan(self, scan):
+        """
+        Check what a file leaves open against the files loaded before it,
+        and declare its records.
+
+        :param scan: scan of the file
+        :type scan: FileScan
+        """
+        self.files += 1
+        self.records += scan.records
+        self.references += scan.references
+        self.external += scan.external
+        path = scan.path
+        self.errors.extend(
+            (path, record_id, field, ref, problem, 1)
+            for record_id, field, ref, problem in scan.errors)
+        declared = self.declared
+        for (ref, model), (record_id, field, uses) in \
+                scan.unresolved.iteritems():
+            declared_model = declared.get(ref)
+            if declared_model is None:
+                self.pending.setdefault(ref, []).append(
+                    (path, record_id, field, uses))
+            elif model is not None and model != declared_model:
+                self.errors.append(
+                    (path, record_id, field, ref, WRONG_MODEL, uses))
+        for record_id in scan.order:
+            declared.setdefault(record_id, scan.declared[record_id])
+
+    def finish(self):
+        """
+        Sort out the references to records never declared from those to
+        records declared after them.
+
+        :return: the broken references
+        :rtype: list
+        """
+        for ref, uses in sorted(self.pending.iteritems()):
+            problem = FORWARD if ref in self.declared else MISSING
+            for path, record_id, field, count in uses:
+                self.errors.append(
+                    (path, record_id, field, ref, problem, count))
+        self.pending = {}
+        return self.errors
+
+
+def main():
+    args = PARSER.parse_args()
+    data_folder = os.path.abspath(os.path.expanduser(args.data_folder))
+    if not os.path.isdir(data_folder):
+        PARSER.error('No such folder: {0}'.format(data_folder))
+
+    validator = ReferenceValidator(args.module)
+    errors = validator.validate_files(
+        get_load_order(data_folder, args.other_files), args.jobs)
+    for path, record_id, field, ref, problem, uses in \
+            errors[:args.max_errors]:
+        print('{0}: record {1}, field {2}: {3} {4}{5}'.format(
+            os.path.relpath(path, data_folder), record_id, field, ref,
+            problem, ' ({0} uses in the file)'.format(uses)
+            if uses > 1 else ''))
+    if len(errors) > args.max_errors:
+        print('... and {0} more'.format(len(errors) - args.max_errors))
+    print('{0} files, {1} records, {2} references ({3} to other modules), '
+          '{4} broken'.format(validator.files, validator.records,
+                              validator.references, validator.external,
+                              sum(error[5] for error in errors)))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,44 +1,43 @@
 # coding=utf-8
 import random
-import re
 
-
-class Patient(object):
-
-    def __init__(self):
-        self.id = None
-        self.patient_id = None
-        self.placement_id = None
-        self.activity_id = None
-        self.spell_activity_id = None
-        self.date_terminated = None
-
-    def set_id(self):
-        match = re.search('(\d+)$', self.patient_id)
-        if match is not None:
-            self.id = match.group()
+from demo_data_generators.patient import Patient
+from demo_data_generators.random_streams import get_random
 
 
 class WardStrategy(object):
     """Determines the NEWS for a ward."""
 
-    def __init__(self, patients, user_ids, risk_distribution,
-                 partial_news_per_patient, overdue_ratio,
-                 overdue_distribution):
+    def __init__(self, patients, user_ids, risk_distribution, overdue_ratio,
+                 overdue_distribution, seed=None, ward=None):
         self.patients = patients
         self.user_ids = user_ids
         self.risk_distribution = risk_distribution
-        self.partial_news_per_patient = partial_news_per_patient
         self.overdue_ratio = overdue_ratio
         self.overdue_distribution = overdue_distribution
+        self.seed = seed
+        self.ward = ward
 
-    def pick_user_id(self):
-        return random.choice(self.user_ids)
+    def get_random(self, patient, stream):
+        """Return a patient's random stream for the given use."""
+        return get_random(self.seed, self.ward, patient.id, stream)
 
+    def pick_user_id(self, rng=random):
+        return rng.choice(self.user_ids)
 
-def patients_factory(root):
-    """Returns a list of patients."""
 
+def patients_factory(root, admit_offsets):
+    """
+    Returns a list of patients.
+
+    :param root: placements tree
+    :param admit_offsets: days relative to now each patient was admitted,
+                          by patient XML id, as ``PlacementsGenerator``
+                          records them
+    :type admit_offsets: dict
+    """
+
+    records = index_records(root)
     placements = root.findall(
         ".//record/[@model='nh.clinical.patient.placement']")
     patients = []
@@ -46,13 +45,30 @@ def patients_factory(root):
     for placement in placements:
         if not placement.findall(".//field[@name='location_id']"):
             continue
-        patient = patient_factory(placement, root)
+        patient = patient_factory(placement, records)
+        patient.admit_offset = admit_offsets.get(patient.patient_id)
         patients.append(patient)
 
     return patients
 
 
-def patient_factory(placement, root):
+def index_records(root):
+    """
+    Index the records of a tree by id in a single pass.
+
+    Each id maps to the field maps (field name -> field) of every record
+    with that id, in document order, as activities are declared by one
+    record and updated by another.
+    """
+
+    records = {}
+    for record in root.iter('record'):
+        fields = dict((field.attrib['name'], field) for field in record)
+        records.setdefault(record.attrib['id'], []).append(fields)
+    return records
+
+
+def patient_factory(placement, records):
     """Creates a patient."""
 
     patient = Patient()
@@ -63,19 +79,12 @@ def patient_factory(placement, root):
         if field.attrib['name'] == "activity_id":
             patient.activity_id = field.attrib['ref']
 
-            # search corresponding activity
-            search_string = ".//record/[@id='%s']" % field.attrib['ref']
-            activity_records = root.findall(search_string)
-            for activity_record in activity_records:
-
-                for field in activity_record:
-                    # get spell_activity_id
-                    if field.attrib['name'] == 'spell_activity_id':
-                        patient.spell_activity_id = field.attrib['ref']
-
-                    # get date_terminated
-                    if field.attrib['name'] == 'date_terminated':
-                        patient.date_terminated = field.attrib['eval']
+            # look up corresponding activity
+            for activity_fields in records.get(field.attrib['ref'], []):
+                # get spell_activity_id
+                if 'spell_activity_id' in activity_fields:
+                    patient.spell_activity_id = \
+                        activity_fields['spell_activity_id'].attrib['ref']
 
         # append patient_id
         if field.attrib['name'] == 'patient_id':
@@ -0,0 +1,80 @@
+"""
+Read the fields of XML data records the way Odoo does when installing them.
+
+Shared by everything that takes the generated data files apart rather than
+installing them: the CSV and COPY exporters, the reference validator, the
+index and the bulk loader. Evals are run with the same names available as
+in module XML (``datetime``, ``timedelta``, ``time`` and ``ref``), ``ref``
+being supplied by the caller.
+"""
+import re
+import time
+from datetime import datetime, timedelta
+
+# Builtins available to eval attributes
+EVAL_BUILTINS = {'True': True, 'False': False, 'None': None, 'str': str,
+                 'int': int, 'float': float}
+
+REF_REGEX = re.compile(r'''ref\(['"]([^'"]+)['"]\)''')
+
+# Reference field eval, 'model,' + str(ref(...)): the model and the record
+# referred to
+REFERENCE_REGEX = re.compile(
+    r'''^\s*['"]([^'"]+),['"]\s*\+\s*str\(ref\(['"]([^'"]+)['"]\)\)\s*$''')
+
+
+class ExternalId(str):
+    """An external id returned by ``ref()`` while evaluating a field."""
+    pass
+
+
+def qualify(xml_id, module):
+    """
+    Prefix an external id with a module if it has none.
+
+    :param xml_id: external id, with or without its module
+    :type xml_id: str
+    :param module: module the external ids without one belong to
+    :type module: str
+    :rtype: str
+    """
+    if '.' in xml_id:
+        return xml_id
+    return '{0}.{1}'.format(module, xml_id)
+
+
+def evaluate(expression, ref):
+    """
+    Evaluate the eval attribute of a field.
+
+    :param expression: the eval attribute
+    :type expression: str
+    :param ref: stand in for ``ref()``, given an external id
+    :return: the value of the field
+    """
+    return eval(expression, {
+        '__builtins__': EVAL_BUILTINS, 'datetime': datetime,
+        'timedelta': timedelta, 'time': time, 'ref': ref
+    })
+
+
+def get_command_ids(commands):
+    """
+    Return the ids set by a list of many2many commands.
+
+    :param commands: ``[(4, id)]`` or ``[(6, 0, ids)]`` style commands, or
+                     plain ids
+    :type commands: list
+    :return: the ids
+    :rtype: list
+    """
+    ids = []
+    for command in commands:
+        if isinstance(command, (list, tuple)):
+            if command[0] == 4:
+                ids.append(command[1])
+            elif command[0] == 6:
+                ids.extend(command[2])
+        else:
+            ids.append(command)
+    return ids
@@ -1,6 +1,5 @@
 import argparse
 import sys
-from demo_refresh_tools.refresh_demo import RefreshDemo
 
 
 PARSER = argparse.ArgumentParser('Refresh an existing Open eObs demo instance')
@@ -19,10 +18,16 @@ PARSER.add_argument('--adminpassword', type=str,
                     help='New password for admin', default='admin')
 PARSER.add_argument('--dbadmin', type=str,
                     help='Database Admin Password', default='admin')
+PARSER.add_argument('--data-folder', type=str,
+                    help='Load the demo data generated in this folder in '
+                         'batches, in place of installing the demo module '
+                         'and its data files')
 
 
 def main():
     args = PARSER.parse_args()
+    # Imported once the arguments are parsed, so --help stays quick
+    from demo_refresh_tools.refresh_demo import RefreshDemo
     server = args.server
     database = args.database
     user = args.user
@@ -30,7 +35,8 @@ def main():
     admin_password = args.adminpassword
     db_admin = args.dbadmin
     RefreshDemo(server, database=database, user=user, password=password,
-                admin_password=admin_password, db_admin=db_admin)
+                admin_password=admin_password, db_admin=db_admin,
+                data_folder=args.data_folder)
 
 
 if __name__ == '__main__':
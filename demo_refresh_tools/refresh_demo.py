@@ -1,11 +1,5 @@
 from erppeek import Client
 from datetime import datetime
-from demo_setup_tools.assign_users_to_spells import (ReallocateUsersToBeds,
-                                                     ReallocateUsersToWards)
-from demo_setup_tools.discharge_transfer import DischargeTransferCoordinator
-from smoketest.smoke_test import SmokeTest
-import unittest
-from security.change_admin_password import ChangeAdminPassword
 
 
 def get_erppeek_client(server='http://localhost:8069', db='openerp',
@@ -30,13 +24,16 @@ class RefreshDemo(object):
     """
 
     def __init__(self, server, database, user, password, admin_password,
-                 db_admin):
+                 db_admin, data_folder=None):
         self.server = server
         self.database = database
         self.user = user
         self.password = password
         self.admin_password = admin_password
         self.db_admin = db_admin
+        # Generated demo data to load in place of the demo module's own
+        # data files, if any
+        self.data_folder = data_folder
         self.temp_db_name = datetime.now().strftime('nhclinical_%Y%m%d')
         self.client = get_erppeek_client(server, db=database, user=user,
                                          password=password)
@@ -52,6 +49,8 @@ class RefreshDemo(object):
                                          password=self.admin_password)
         if not self.install_eobs():
             raise RuntimeError('Error installing Open eObs')
+        if self.data_folder:
+            self.load_demo_data()
         # Run post setup scripts against open eObs
         self.post_install_setup()
         # Run smoke tests against open eObs
@@ -97,23 +96,57 @@ class RefreshDemo(object):
     def install_eobs(self):
         """
         Install the Open eObs application
+
+        With a data folder, the demo module itself is not installed, as
+        installing it would load its data files one record at a time: only
+        the modules it depends on are, and the generated data is then
+        loaded by ``load_demo_data`` under the demo module's external ids.
         :return: True if successful
         """
         self.client.install('nh_eobs_mobile')
         mob_installed = self.client.modules('nh_eobs_mobile')
         if 'nh_eobs_mobile' not in mob_installed['installed']:
             return False
-        self.client.install('nh_eobs_demo')
-        demo_installed = self.client.modules('nh_eobs_demo')
-        if 'nh_eobs_demo' not in demo_installed['installed']:
+        if self.data_folder:
+            modules = self.get_demo_dependencies()
+        else:
+            modules = ['nh_eobs_demo']
+        if not modules:
             return False
-        return True
+        self.client.install(*modules)
+        installed = self.client.modules(installed=True).get('installed', [])
+        return all(module in installed for module in modules)
+
+    def get_demo_dependencies(self):
+        """
+        Return the modules the demo module depends on
+        :return: module names
+        """
+        dependencies = self.client.execute(
+            'ir.module.module.dependency', 'search_read',
+            [('module_id.name', '=', 'nh_eobs_demo')], ['name'])
+        return sorted(dependency['name'] for dependency in dependencies)
+
+    def load_demo_data(self):
+        """
+        Load the generated demo data with batched load calls, in place of
+        the demo module's data files
+        """
+        from demo_setup_tools.bulk_load import BulkLoader
+        loader = BulkLoader(self.server, self.temp_db_name, self.user,
+                            self.admin_password)
+        loader.load_folder(self.data_folder)
 
     def post_install_setup(self):
         """
         Reallocate users to beds and wards and discharge / transfer some
         patients
         """
+        # Each step's tools are imported when the step runs, not on startup
+        from demo_setup_tools.assign_users_to_spells import (
+            ReallocateUsersToBeds, ReallocateUsersToWards)
+        from demo_setup_tools.discharge_transfer import \
+            DischargeTransferCoordinator
         beds_reallocator = ReallocateUsersToBeds(self.server,
                                                  self.temp_db_name,
                                                  'oakley', 'oakley')
@@ -129,6 +162,8 @@ class RefreshDemo(object):
         """
         Run some post deployment smoke tests
         """
+        import unittest
+        from smoketest.smoke_test import SmokeTest
         SmokeTest.SERVER = self.server
         SmokeTest.DATABASE = self.temp_db_name
         SmokeTest.USER = 'adt'
@@ -160,5 +195,6 @@ class RefreshDemo(object):
         """
         Change the admin password for the new instance
         """
+        from security.change_admin_password import ChangeAdminPassword
         ChangeAdminPassword(self.server, self.temp_db_name,
                             self.admin_password)
@@ -1,10 +1,7 @@
 import argparse
+import logging
 import sys
 
-from assign_users_to_spells import (ReallocateUsersToWards,
-                                    ReallocateUsersToBeds)
-from discharge_transfer import DischargeTransferCoordinator
-
 
 PARSER = argparse.ArgumentParser('Post Open-eObs Demo installation operations')
 PARSER.add_argument('database', type=str,
@@ -20,19 +17,54 @@ PARSER.add_argument('--password', type=str,
                     help='Password for user', default='admin')
 PARSER.add_argument('--days', type=int, help='Number of days for observation',
                     default=2)
+PARSER.add_argument('--jobs', type=int,
+                    help='Number of connections reallocating ward users at '
+                         'once, 4 by default. Each user still takes its own '
+                         'calls, they only overlap')
+PARSER.add_argument('--data-folder', type=str,
+                    help='Load the demo data generated in this folder first, '
+                         'in batches, rather than installing it with the '
+                         'demo module')
+PARSER.add_argument('--csv', type=str, metavar='CSV_FOLDER',
+                    help='Load the CSV files exported to this folder with '
+                         '--format csv first: the numbered files in order, '
+                         'then the reference fields of references.csv')
+PARSER.add_argument('--batch-size', type=int,
+                    help='Records per batch when loading --data-folder or '
+                         '--csv',
+                    default=500)
 
 
 def main():
     args = PARSER.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # Imported once the arguments are parsed, so --help stays quick
+    from demo_setup_tools.assign_users_to_spells import (
+        DEFAULT_JOBS, ReallocateUsersToWards, ReallocateUsersToBeds)
+    from demo_setup_tools.discharge_transfer import \
+        DischargeTransferCoordinator
     server = args.server
     database = args.database
+    if args.data_folder or args.csv:
+        from demo_setup_tools.bulk_load import BulkLoader
+        loader = BulkLoader(server, database, args.user, args.password,
+                            batch_size=args.batch_size)
+        if args.data_folder:
+            loaded = loader.load_folder(args.data_folder)
+            logging.info('Loaded %d demo data records from %s', loaded,
+                         args.data_folder)
+        if args.csv:
+            loaded = loader.load_csv_folder(args.csv)
+            logging.info('Loaded %d demo data records from %s', loaded,
+                         args.csv)
     # Re-allocate users to their current locations,
     # to fix the problem about patients not showing up in the Acuity Board.
     beds_reallocator = ReallocateUsersToBeds(server, database, 'oakley',
                                              'oakley')
     beds_reallocator.reallocate_all_users()
-    wards_reallocator = ReallocateUsersToWards(server, database, 'oakley',
-                                               'oakley')
+    wards_reallocator = ReallocateUsersToWards(
+        server, database, 'oakley', 'oakley',
+        jobs=args.jobs or DEFAULT_JOBS)
     wards_reallocator.reallocate_all_users()
     DischargeTransferCoordinator(server, database, 'adt', 'adt')
 
@@ -1,5 +1,15 @@
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
 import erppeek
 
+_logger = logging.getLogger(__name__)
+
+# Connections reallocating ward users at once by default
+DEFAULT_JOBS = 4
+
 
 def get_erppeek_client(server='http://localhost:8069', db='openerp',
                        user='admin', password='admin'):
@@ -30,16 +40,37 @@ class ReallocateUsersToWards(object):
 
     Such groups are stored in a class attribute, to be easily referenced from
     inside the class' methods.
+
+    Every user still takes a ``create_activity`` and a ``complete`` call:
+    the users are shared out in chunks between several connections, so the
+    calls overlap rather than run one after the other.
     """
 
-    def __init__(self, server, db, user='admin', password='admin'):
+    def __init__(self, server, db, user='admin', password='admin',
+                 jobs=DEFAULT_JOBS, chunk_size=10):
+        """
+        :param jobs: number of connections allocating users concurrently
+        :type jobs: int
+        :param chunk_size: number of users handed to a connection at a time
+        :type chunk_size: int
+        """
         self.user_model = 'res.users'
         self.groups_model = 'res.groups'
         self.user_management = 'nh.clinical.user.management'
+        self.resp_model = 'nh.clinical.user.responsibility.allocation'
+        self.server = server
+        self.db = db
+        self.user = user
+        self.password = password
+        self.jobs = jobs
+        self.chunk_size = chunk_size
         self.client = get_erppeek_client(server=server, db=db, user=user,
                                          password=password)
-        resp_model = 'nh.clinical.user.responsibility.allocation'
-        self.resp = self.client.model(resp_model)
+        self.resp = self.client.model(self.resp_model)
+        # XML-RPC connections cannot be shared between threads, each worker
+        # thread opens its own
+        self.local = threading.local()
+        self.local.resp = self.resp
         self.groups_list = [
             'NH Clinical Senior Manager Group',
             'NH Clinical Ward Manager Group',
@@ -63,14 +94,54 @@ class ReallocateUsersToWards(object):
                 ['groups_id', 'in', group]
             ]
         )
-        for user in users:
-            current_data = self.client.read(self.user_management,
-                                           user, ['ward_ids'])['ward_ids']
-            resp_act = self.resp.create_activity({}, {
+        if not users:
+            return
+        # Read the wards of every user in the group at once
+        user_data = self.client.read(self.user_management, users,
+                                     ['ward_ids'])
+        allocations = [(user['id'], user['ward_ids']) for user in user_data]
+        chunks = [
+            allocations[i:i + self.chunk_size]
+            for i in xrange(0, len(allocations), self.chunk_size)
+        ]
+        if self.jobs > 1 and len(chunks) > 1:
+            pool = ThreadPool(min(self.jobs, len(chunks)))
+            try:
+                pool.map(self.allocate_users, chunks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for chunk in chunks:
+                self.allocate_users(chunk)
+
+    def get_resp(self):
+        """
+        Return the responsibility allocation model for the current thread.
+
+        :return: erppeek model on a connection owned by the thread
+        """
+        if not hasattr(self.local, 'resp'):
+            client = get_erppeek_client(server=self.server, db=self.db,
+                                        user=self.user,
+                                        password=self.password)
+            self.local.resp = client.model(self.resp_model)
+        return self.local.resp
+
+    def allocate_users(self, allocations):
+        """
+        Allocate users to their wards, one user at a time.
+
+        :param allocations: user id and ward ids of each user
+        :type allocations: list
+        """
+        resp = self.get_resp()
+        for user, ward_ids in allocations:
+            resp_act = resp.create_activity({}, {
                 'responsible_user_id': user,
-                'location_ids': [[6, False, current_data]]
+                'location_ids': [[6, False, ward_ids]]
             })
-            self.resp.complete(resp_act)
+            resp.complete(resp_act)
 
     def reallocate_all_users(self):
         for group in self.groups_list:
@@ -94,6 +165,8 @@ class ReallocateUsersToBeds(object):
             'NH Clinical Nurse Group',
             'NH Clinical HCA Group',
         ]
+        # Seconds taken to reallocate each group
+        self.timings = {}
 
     def reallocate_users_by_group(self, group_name):
         """
@@ -112,11 +185,20 @@ class ReallocateUsersToBeds(object):
                 ['groups_id', 'in', group]
             ]
         )
+        start = time.time()
         user_data = self.client.read(self.user_model, users, ['location_ids'])
+        # Users with the same locations are written back with a single call
+        location_groups = {}
         for user in user_data:
-            current_data = user['location_ids']
-            self.client.write(self.user_model, user['id'],
-                              {'location_ids': current_data})
+            location_ids = tuple(sorted(user['location_ids']))
+            location_groups.setdefault(location_ids, []).append(user['id'])
+        for location_ids, user_ids in location_groups.iteritems():
+            self.client.write(self.user_model, user_ids,
+                              {'location_ids': list(location_ids)})
+        self.timings[group_name] = time.time() - start
+        _logger.info('%s: %d users reallocated with %d writes in %.2fs',
+                     group_name, len(user_data), len(location_groups),
+                     self.timings[group_name])
 
     def reallocate_all_users(self):
         for group in self.groups_list:
@@ -0,0 +1,314 @@
+# coding=utf-8
+"""
+Load demo data records into Odoo in batches over XML-RPC.
+
+Installing the demo module makes Odoo parse and evaluate every ``<record>``
+one at a time. ``BulkLoader`` takes the same records and pushes them through
+one ``load`` call per batch of records of the same model instead, resolving
+every external id they refer to in bulk beforehand.
+
+The setup and refresh tools load a generated data folder this way when
+given ``--data-folder``. The setup tool also loads the CSV files exported
+with ``--format csv`` when given ``--csv``: see ``load_csv_folder`` for the
+order they have to be loaded in.
+"""
+import csv
+import os
+import re
+from xml.etree.ElementTree import parse
+
+from demo_data_generators.csv_export import resolve_references
+from demo_data_generators.validate import get_data_file_paths
+from demo_data_generators.xml_eval import REF_REGEX, evaluate, \
+    get_command_ids, qualify
+from demo_setup_tools.client import get_erppeek_client
+
+RELATIONAL_TYPES = ('many2one', 'many2many', 'one2many')
+
+# Numbered CSV files of a model, as exported: 001_nh.clinical.location.csv
+CSV_FILE_REGEX = re.compile(r'^\d+_(.+)\.csv$')
+
+
+class BulkLoader(object):
+    """
+    Load demo data records with batched ``load`` calls per model.
+
+    Records are loaded in document order. Consecutive records of the same
+    model and fields are sent together, a batch being cut short when a
+    record refers to another record still waiting in it. Field values are
+    passed by database id, so evals (run client side, with ``datetime``,
+    ``timedelta``, ``time`` and ``ref`` available as in module XML) and
+    refs only ever need ids loaded by previous batches.
+    """
+
+    def __init__(self, server, db, user='admin', password='admin',
+                 module='nh_eobs_demo', batch_size=500):
+        """
+        :param module: module the external ids without one belong to
+        :type module: str
+        :param batch_size: maximum number of records per ``load`` call
+        :type batch_size: int
+        """
+        self.client = get_erppeek_client(server=server, db=db, user=user,
+                                         password=password)
+        self.module = module
+        self.batch_size = batch_size
+        # Database ids of external ids, resolved in bulk or loaded
+        self.ids = {}
+        # Field types of each model, read once per model
+        self.field_types = {}
+        # Records waiting to be loaded
+        self.batch_key = None
+        self.batch_xml_ids = []
+        # The same external ids, to look references up in
+        self.batch_pending = set()
+        self.batch_rows = []
+        self.records_loaded = 0
+
+    def qualify(self, xml_id):
+        """Prefix an external id with the module if it has none."""
+        return qualify(xml_id, self.module)
+
+    def ref(self, xml_id):
+        """Return the database id of an external id."""
+        xml_id = self.qualify(xml_id)
+        if xml_id not in self.ids:
+            raise ValueError('External ID not found: {0}'.format(xml_id))
+        return self.ids[xml_id]
+
+    def get_field_types(self, model):
+        """Return the type of every field of the model, by field name."""
+        if model not in self.field_types:
+            fields = self.client.execute(model, 'fields_get')
+            self.field_types[model] = dict(
+                (name, field['type']) for name, field in fields.iteritems())
+        return self.field_types[model]
+
+    def resolve_ids(self, xml_ids):
+        """
+        Read the database ids of external ids with one search per module.
+
+        External ids that do not exist yet are left out.
+
+        :param xml_ids: qualified external ids
+        :type xml_ids: iterable
+        """
+        names_by_module = {}
+        for xml_id in xml_ids:
+            module, name = xml_id.split('.', 1)
+            names_by_module.setdefault(module, []).append(name)
+        for module, names in sorted(names_by_module.iteritems()):
+            model_data = self.client.execute(
+                'ir.model.data', 'search_read',
+                [['module', '=', module], ['name', 'in', names]],
+                ['module', 'name', 'res_id'])
+            for data in model_data:
+                xml_id = '{0}.{1}'.format(data['module'], data['name'])
+                self.ids[xml_id] = data['res_id']
+
+    def load(self, roots):
+        """
+        Load the records in the ``<data>`` elements of XML trees.
+
+        :param roots: root (or data) elements, in load order
+        :type roots: list
+        :return: number of records loaded
+        :rtype: int
+        """
+        records = []
+        xml_ids = set()
+        for root in roots:
+            for data in root.iter('data'):
+                noupdate = data.get('noupdate', '0') in ('1', 'True')
+                for record in data.iter('record'):
+                    records.append((record, noupdate))
+                    xml_ids.add(self.qualify(record.attrib['id']))
+                    for field in record:
+                        if 'ref' in field.attrib:
+                            xml_ids.add(self.qualify(field.attrib['ref']))
+                        elif 'eval' in field.attrib:
+                            xml_ids.update(
+                                self.qualify(xml_id) for xml_id in
+                                REF_REGEX.findall(field.attrib['eval']))
+        # Ids loaded or resolved by earlier calls are already known
+        self.resolve_ids(xml_ids.difference(self.ids))
+
+        loaded = self.records_loaded
+        for record, noupdate in records:
+            self.add_record(record, noupdate)
+        self.flush()
+        return self.records_loaded - loaded
+
+    def load_files(self, paths):
+        """
+        Load the records of XML data files, one file at a time.
+
+        Only one file is ever parsed in memory: its records are loaded
+        before the next file is read.
+
+        :param paths: paths of the files, in load order
+        :type paths: list
+        :return: number of records loaded
+        :rtype: int
+        """
+        loaded = 0
+        for path in paths:
+            loaded += self.load([parse(path).getroot()])
+        return loaded
+
+    def load_folder(self, data_folder):
+        """
+        Load the data files generated in a folder, in the order the
+        coordinator wrote them (or the one in its manifest, when sharded).
+
+        :param data_folder: folder the data was generated in
+        :type data_folder: str
+        :return: number of records loaded
+        :rtype: int
+        """
+        return self.load_files(get_data_file_paths(data_folder))
+
+    def load_csv_folder(self, csv_folder):
+        """
+        Load the CSV files exported from the data files to a folder.
+
+        The order matters: the numbered files are loaded one after the
+        other in the order of their numbers, as a file may refer to the
+        records of any file before it. Only then are the reference fields
+        of ``references.csv`` set, as they need the database ids of records
+        from every file.
+
+        :param csv_folder: folder the CSV files were exported to
+        :type csv_folder: str
+        :return: number of records loaded
+        :rtype: int
+        """
+        loaded = self.records_loaded
+        for name in sorted(os.listdir(csv_folder)):
+            match = CSV_FILE_REGEX.match(name)
+            if match is not None:
+                self.load_csv_file(os.path.join(csv_folder, name),
+                                   match.group(1))
+        resolve_references(self.client, csv_folder)
+        return self.records_loaded - loaded
+
+    def load_csv_file(self, path, model):
+        """
+        Load the rows of an exported CSV file, in batches.
+
+        The rows give external ids in ``<field>/id`` columns, resolved by
+        ``load`` itself.
+
+        :param path: path of the CSV file
+        :type path: str
+        :param model: model of the rows
+        :type model: str
+        """
+        with open(path, 'rb') as csv_file:
+            reader = csv.reader(csv_file)
+            columns = tuple(next(reader))
+            for row in reader:
+                if len(self.batch_rows) >= self.batch_size:
+                    self.flush()
+                self.batch_key = (model, columns, True)
+                self.batch_xml_ids.append(row[0])
+                self.batch_rows.append([cell.decode('utf-8')
+                                        for cell in row])
+        self.flush()
+
+    def add_record(self, record, noupdate):
+        """
+        Convert a record to a row and add it to the batch.
+
+        :param record: ``<record>`` element
+        :param noupdate: whether the record belongs to a noupdate block
+        :type noupdate: bool
+        """
+        model = record.attrib['model']
+        xml_id = self.qualify(record.attrib['id'])
+        field_types = self.get_field_types(model)
+        pending = self.batch_pending
+        columns = ['id']
+        row = [xml_id]
+        for field in record:
+            name = field.attrib['name']
+            if 'ref' in field.attrib:
+                refs = [self.qualify(field.attrib['ref'])]
+            elif 'eval' in field.attrib:
+                refs = [self.qualify(ref) for ref in
+                        REF_REGEX.findall(field.attrib['eval'])]
+            else:
+                refs = []
+            if xml_id in pending or pending.intersection(refs):
+                self.flush()
+
+            if 'ref' in field.attrib:
+                value = self.ref(field.attrib['ref'])
+            elif 'eval' in field.attrib:
+                value = evaluate(field.attrib['eval'], self.ref)
+            else:
+                value = field.text or ''
+            column, cell = self.get_cell(name, field_types.get(name), value)
+            columns.append(column)
+            row.append(cell)
+
+        key = (model, tuple(columns), noupdate)
+        if key != self.batch_key or len(self.batch_rows) >= self.batch_size:
+            self.flush()
+            self.batch_key = key
+        self.batch_xml_ids.append(xml_id)
+        self.batch_pending.add(xml_id)
+        self.batch_rows.append(row)
+
+    def get_cell(self, name, field_type, value):
+        """
+        Return the ``load`` column and cell for a field value.
+
+        Relational fields are given by database id, everything else as the
+        text Odoo would convert.
+
+        :param name: field name
+        :type name: str
+        :param field_type: Odoo field type
+        :type field_type: str
+        :param value: text or evaluated value
+        :return: column name and cell
+        :rtype: tuple
+        """
+        if field_type in RELATIONAL_TYPES:
+            if isinstance(value, (list, tuple)):
+                value = get_command_ids(value)
+            elif value:
+                value = [value]
+            else:
+                value = []
+            return '{0}/.id'.format(name), ','.join(str(id) for id in value)
+        if value is True:
+            return name, '1'
+        if value is False or value is None:
+            return name, ''
+        if isinstance(value, basestring):
+            return name, value
+        return name, str(value)
+
+    def flush(self):
+        """Load the records waiting in the batch with a single call."""
+        if not self.batch_rows:
+            return
+        model, columns, noupdate = self.batch_key
+        result = self.client.execute(
+            model, 'load', list(columns), self.batch_rows,
+            context={'noupdate': noupdate,
+                     '_import_current_module': self.module})
+        ids = result['ids']
+        if not ids or len(ids) != len(self.batch_rows):
+            raise RuntimeError(
+                'Error loading {0} records: {1}'.format(
+                    model, '; '.join(message['message'] for message in
+                                     result['messages'])))
+        self.ids.update(zip(self.batch_xml_ids, ids))
+        self.records_loaded += len(ids)
+        self.batch_key = None
+        self.batch_xml_ids = []
+        self.batch_pending.clear()
+        self.batch_rows = []
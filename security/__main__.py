@@ -1,6 +1,5 @@
 import sys
 import argparse
-from change_admin_password import ChangeAdminPassword
 
 PARSER = argparse.ArgumentParser('Secure Odoo once setup')
 PARSER.add_argument('database', type=str,
@@ -15,6 +14,8 @@ PARSER.add_argument('--server', type=str,
 
 def main():
     args = PARSER.parse_args()
+    # Imported once the arguments are parsed, so --help stays quick
+    from security.change_admin_password import ChangeAdminPassword
     server = args.server
     database = args.database
     new_password = args.password
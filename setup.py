@@ -19,6 +19,10 @@ setup(
     entry_points={
         "console_scripts": [
             "generate_openeobs_demo_data = demo_data_generators.__main__:main",
+            "validate_openeobs_demo_data = "
+            "demo_data_generators.validate:main",
+            "get_openeobs_demo_users = "
+            "demo_data_generators.get_users_by_role:main",
             "run_smoke_tests = smoketest.__main__:main",
             "setup_openeobs_demo = demo_setup_tools.__main__:main",
             "change_odoo_admin_password = security.__main__:main",
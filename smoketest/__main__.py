@@ -1,7 +1,5 @@
 import sys
-import unittest
 import argparse
-from smoke_test import SmokeTest
 
 PARSER = argparse.ArgumentParser('Run smoke tests for Open-eObs')
 PARSER.add_argument('database', type=str,
@@ -19,6 +17,9 @@ PARSER.add_argument('--password', type=str,
 
 def main():
     args = PARSER.parse_args()
+    # Imported once the arguments are parsed, so --help stays quick
+    import unittest
+    from smoketest.smoke_test import SmokeTest
     SmokeTest.SERVER = args.server
     SmokeTest.DATABASE = args.database
     SmokeTest.USER = 'adt'
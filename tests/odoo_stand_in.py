@@ -0,0 +1,70 @@
+# coding=utf-8
+"""A local stand-in for the Odoo XML-RPC server, for the setup tool tests"""
+import threading
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/xmlrpc/db', '/xmlrpc/common', '/xmlrpc/object')
+
+
+class StandInOdoo(object):
+    """
+    Just enough of the Odoo XML-RPC API for ERPPeek to log in.
+
+    ``object.execute`` calls are recorded and dispatched to the method of
+    the same name, called with the model and the call arguments. Models
+    looked up by name with ``client.model`` must be listed in ``models``.
+    """
+
+    models = ()
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def server_version(self):
+        return '8.0'
+
+    def list(self):
+        return ['demo']
+
+    def login(self, db, user, password):
+        return 1
+
+    def execute(self, db, uid, password, model, method, *args):
+        with self.lock:
+            self.calls.append((model, method))
+        if model == 'ir.model':
+            return self.ir_model(method, *args)
+        return getattr(self, method)(model, *args)
+
+    def ir_model(self, method, *args):
+        """Answer ERPPeek checking that a model exists."""
+        if method == 'search':
+            name = args[0][0][2]
+            return [index + 1 for index, model in enumerate(self.models)
+                    if name in model]
+        return [{'id': index, 'model': self.models[index - 1]}
+                for index in args[0]]
+
+    def get_calls(self, method):
+        return [call for call in self.calls if call[1] == method]
+
+
+class StandInServer(object):
+    """Serve a stand-in in a background thread."""
+
+    def __init__(self, odoo):
+        self.server = SimpleXMLRPCServer(('127.0.0.1', 0), RequestHandler,
+                                         logRequests=False, allow_none=True)
+        self.server.register_instance(odoo)
+        self.url = 'http://127.0.0.1:{0}'.format(
+            self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,6 +1,5 @@
 """Test that the admissions generator does indeed generate admissions"""
 import unittest
-import re
 from demo_data_generators.admissions import AdmissionsGenerator
 from demo_data_generators.patients import PatientsGenerator
 
@@ -36,29 +35,6 @@ class TestAdmissionsGenerator(unittest.TestCase):
         self.assertEqual(self.admitgen.admit_date_eval_string, eval_string,
                          'Incorrect Admit date eval string List')
 
-    def test_has_ward_regex(self):
-        """
-        Make sure that the ward regex is valid
-        """
-        ward_groups = re.match(self.admitgen.ward_regex,
-                               'nhc_def_conf_location_wa')
-        self.assertEqual(len(ward_groups.groups()), 1,
-                         'Incorrect regex groups')
-        self.assertEqual(ward_groups.groups()[0], 'nhc_def_conf_location_wa',
-                         'Incorrect Regex match')
-
-    def test_has_patient_id_regex(self):
-        """
-        Make sure that the patient_id regex is valid
-        """
-        patient_id_groups = re.match(self.admitgen.patient_id_regex,
-                                     'nhc_demo_patient_666')
-        self.assertEqual(len(patient_id_groups.groups()), 1,
-                         'Incorrect regex groups')
-        self.assertEqual(patient_id_groups.groups()[0],
-                         '666',
-                         'Incorrect Regex match')
-
     def test_number_of_records_for_spell(self):
         """
         Make sure that it generates the number of records for the spell
@@ -0,0 +1,214 @@
+# coding=utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import SubElement
+
+from demo_data_generators.csv_export import CSVExporter
+from demo_data_generators.locations import LocationsGenerator
+from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.sinks import TreeSink, write_xml
+from demo_setup_tools.bulk_load import BulkLoader, get_command_ids
+from odoo_stand_in import StandInOdoo, StandInServer
+
+
+class StandInBulkOdoo(StandInOdoo):
+    """
+    Stand-in keeping the records loaded and their external ids.
+
+    Every model has the same few fields.
+    """
+
+    def __init__(self):
+        super(StandInBulkOdoo, self).__init__()
+        self.model_data = {
+            ('nh_eobs', 'nh_eobs_context'): 7,
+            ('base', 'main_company'): 1
+        }
+        self.records = {}
+        self.next_id = 100
+        self.writes = []
+
+    def search_read(self, model, domain, fields):
+        domain = dict((term[0], term[2]) for term in domain)
+        return [
+            {'module': module, 'name': name, 'res_id': res_id}
+            for (module, name), res_id in self.model_data.iteritems()
+            if module == domain['module'] and name in domain['name']
+        ]
+
+    def fields_get(self, model):
+        return dict(
+            (name, {'type': ftype}) for name, ftype in
+            [('parent_id', 'many2one'), ('context_ids', 'many2many'),
+             ('current_location_id', 'many2one'), ('name', 'char')])
+
+    def load(self, model, fields, rows, context):
+        ids = []
+        for row in rows:
+            values = dict(zip(fields, row))
+            module, name = values.pop('id').split('.')
+            for field, value in values.items():
+                if field.endswith('/.id') and value:
+                    for res_id in value.split(','):
+                        if int(res_id) not in self.records:
+                            return {'ids': False, 'messages': [
+                                {'message': 'No record {0}'.format(res_id)}
+                            ]}
+            self.next_id += 1
+            self.records[self.next_id] = (model, values)
+            self.model_data[(module, name)] = self.next_id
+            ids.append(self.next_id)
+        return {'ids': ids, 'messages': []}
+
+    def write(self, model, ids, values):
+        self.writes.append((model, ids, values))
+        return True
+
+
+class TestBulkLoader(unittest.TestCase):
+    """
+    Test that records are loaded in batches against a stand-in server
+    """
+
+    def setUp(self):
+        self.odoo = StandInBulkOdoo()
+        # Locations refer to the context and the hospital location
+        self.odoo.records[7] = ('nh.clinical.context', {})
+        self.odoo.records[8] = ('nh.clinical.location', {})
+        self.odoo.model_data[('nh_eobs_demo', 'nhc_def_conf_location_guh')] = 8
+        self.server = StandInServer(self.odoo)
+        self.loader = BulkLoader(self.server.url, 'demo')
+        del self.odoo.calls[:]
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_records_loaded_in_batches(self):
+        """
+        Make sure beds are loaded together, after the ward they belong to
+        """
+        locations = LocationsGenerator('a', 3)
+
+        loaded = self.loader.load([locations.root])
+
+        self.assertEqual(loaded, 4)
+        self.assertEqual(len(self.odoo.get_calls('load')), 2)
+        ward_id = self.loader.ids['nh_eobs_demo.nhc_def_conf_location_wa']
+        bed = self.odoo.records[
+            self.loader.ids['nh_eobs_demo.nhc_def_conf_location_wa_b1']][1]
+        self.assertEqual(bed['parent_id/.id'], str(ward_id))
+        self.assertEqual(bed['context_ids/.id'], '7')
+
+    def test_external_ids_resolved_in_bulk(self):
+        """
+        Make sure external ids are searched once per module
+        """
+        locations = LocationsGenerator('a', 3)
+        patients = PatientsGenerator(1, 2, 1, 'a')
+
+        self.loader.load([locations.root, patients.root])
+
+        self.assertEqual(len(self.odoo.get_calls('search_read')), 2)
+        patient = self.odoo.records[
+            self.loader.ids['nh_eobs_demo.nhc_demo_patient_1']][1]
+        self.assertEqual(
+            patient['current_location_id/.id'],
+            str(self.loader.ids['nh_eobs_demo.nhc_def_conf_location_wa_b1']))
+
+    def test_load_folder(self):
+        """
+        Make sure generated files are loaded in the order they were written
+        """
+        folder = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(folder, 'ward_a'))
+            # Patients come after the locations they are in
+            write_xml(PatientsGenerator(1, 2, 0, 'a').root,
+                      os.path.join(folder, 'ward_a', 'demo_patients.xml'))
+            write_xml(LocationsGenerator('a', 2).root,
+                      os.path.join(folder, 'ward_a', 'demo_locations.xml'))
+
+            self.assertEqual(self.loader.load_folder(folder), 5)
+        finally:
+            shutil.rmtree(folder)
+        self.assertEqual(
+            [call[0] for call in self.odoo.get_calls('load')],
+            ['nh.clinical.location', 'nh.clinical.location',
+             'nh.clinical.patient'])
+
+    def test_files_loaded_one_at_a_time(self):
+        """
+        Make sure a file is loaded before the next one is read, and the ids
+        it loaded are not searched for again
+        """
+        folder = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(folder, name)
+                     for name in ('locations.xml', 'patients.xml')]
+            write_xml(LocationsGenerator('a', 2).root, paths[0])
+            with open(paths[1], 'w') as broken_file:
+                broken_file.write('<openerp><data>')
+
+            self.assertRaises(Exception, self.loader.load_files, paths)
+        finally:
+            shutil.rmtree(folder)
+        self.assertEqual(len(self.odoo.get_calls('load')), 2)
+        self.assertEqual(self.loader.load([PatientsGenerator(1, 1, 0,
+                                                             'a').root]), 1)
+        # One search, for the new patient
+        self.assertEqual(len(self.odoo.get_calls('search_read')), 3)
+
+    def test_load_csv_folder(self):
+        """
+        Make sure exported CSV files are loaded in the order of their
+        numbers, and their reference fields set once they are all loaded
+        """
+        sink = TreeSink()
+        SubElement(sink.data, 'record',
+                   {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(sink.data, 'record', {
+            'model': 'nh.clinical.patient.observation.ews', 'id': 'news_1'})
+        update = SubElement(sink.data, 'record',
+                            {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(update, 'field', {
+            'name': 'data_ref',
+            'eval': "'nh.clinical.patient.observation.ews,' + "
+                    "str(ref('news_1'))"})
+        folder = tempfile.mkdtemp()
+        try:
+            xml_path = os.path.join(folder, 'data.xml')
+            write_xml(sink.root, xml_path)
+            CSVExporter(folder).export_files([xml_path])
+
+            self.assertEqual(self.loader.load_csv_folder(folder), 2)
+        finally:
+            shutil.rmtree(folder)
+        self.assertEqual(
+            [call[0] for call in self.odoo.calls
+             if call[1] in ('load', 'write')],
+            ['nh.activity', 'nh.clinical.patient.observation.ews',
+             'nh.activity'])
+        self.assertEqual(self.odoo.writes, [
+            ('nh.activity', [self.loader.ids['nh_eobs_demo.act_1']],
+             {'data_ref': 'nh.clinical.patient.observation.ews,{0}'.format(
+                 self.loader.ids['nh_eobs_demo.news_1'])})])
+
+    def test_batch_size(self):
+        locations = LocationsGenerator('a', 5)
+        self.loader.batch_size = 2
+
+        self.loader.load([locations.root])
+
+        self.assertEqual(len(self.odoo.get_calls('load')), 4)
+
+    def test_load_error(self):
+        del self.odoo.records[7]
+        locations = LocationsGenerator('a', 1)
+
+        self.assertRaises(RuntimeError, self.loader.load, [locations.root])
+
+    def test_get_command_ids(self):
+        self.assertEqual(get_command_ids([(4, 1), (4, 2)]), [1, 2])
+        self.assertEqual(get_command_ids([[6, False, [3, 4]]]), [3, 4])
@@ -0,0 +1,194 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import SubElement
+from demo_data_generators.csv_export import CSVExporter, \
+    REFERENCES_FILE, get_reference_values, resolve_references
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.locations import LocationsGenerator
+from demo_data_generators.sinks import TreeSink, write_xml
+
+
+class StandInClient(object):
+    """Resolves external ids and records writes, as Odoo would."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.writes = []
+
+    def execute(self, model, method, *args):
+        if method == 'search_read':
+            module = args[0][0][2]
+            return [{'module': module, 'name': name,
+                     'res_id': self.ids['{0}.{1}'.format(module, name)]}
+                    for name in args[0][1][2]
+                    if '{0}.{1}'.format(module, name) in self.ids]
+        self.writes.append((model,) + args)
+        return True
+
+
+class TestCSVExporter(unittest.TestCase):
+    """
+    Test that records are exported to CSV files in an order they can load
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.xml_path = os.path.join(self.folder, 'data.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def export(self, root):
+        write_xml(root, self.xml_path)
+        return CSVExporter(self.folder).export_files([self.xml_path])
+
+    def read(self, path):
+        with open(path, 'rb') as csv_file:
+            return list(csv.reader(csv_file))
+
+    def test_locations(self):
+        """
+        Make sure beds follow the ward they belong to, in the same file
+        """
+        paths = self.export(LocationsGenerator('a', 2).root)
+
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         ['001_nh.clinical.location.csv'])
+        rows = self.read(paths[0])
+        self.assertEqual(rows[0], ['id', 'name', 'code', 'type', 'usage',
+                                   'parent_id/id', 'context_ids/id'])
+        self.assertEqual(rows[1][0], 'nh_eobs_demo.nhc_def_conf_location_wa')
+        self.assertEqual(rows[1][5], 'nh_eobs_demo.nhc_def_conf_location_guh')
+        self.assertEqual(rows[1][6], 'nh_eobs.nh_eobs_context')
+        self.assertEqual(rows[2][5], 'nh_eobs_demo.nhc_def_conf_location_wa')
+        self.assertEqual(len(rows), 4)
+
+    def test_evaluated_fields(self):
+        sink = TreeSink()
+        record = SubElement(sink.data, 'record',
+                            {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(record, 'field', {'name': 'sequence', 'eval': '3'})
+        SubElement(record, 'field', {'name': 'active', 'eval': 'True'})
+        SubElement(record, 'field', {
+            'name': 'date_scheduled',
+            'eval': "(datetime(2016, 1, 2) + timedelta(1))"
+                    ".strftime('%Y-%m-%d')"})
+
+        rows = self.read(self.export(sink.root)[0])
+
+        self.assertEqual(rows, [
+            ['id', 'sequence', 'active', 'date_scheduled'],
+            ['nh_eobs_demo.act_1', '3', '1', '2016-01-03']
+        ])
+
+    def test_files_after_the_records_they_refer_to(self):
+        """
+        Make sure records referring to another model, or updating an
+        earlier record, go to a later file
+        """
+        sink = TreeSink()
+        activity = SubElement(sink.data, 'record',
+                              {'model': 'nh.activity', 'id': 'act_1'})
+        state = SubElement(activity, 'field', {'name': 'state'})
+        state.text = 'completed'
+        news = SubElement(sink.data, 'record', {
+            'model': 'nh.clinical.patient.observation.ews', 'id': 'news_1'})
+        SubElement(news, 'field', {'name': 'activity_id', 'ref': 'act_1'})
+        update = SubElement(sink.data, 'record',
+                            {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(update, 'field', {
+            'name': 'data_ref',
+            'eval': "'nh.clinical.patient.observation.ews,' + "
+                    "str(ref('news_1'))"})
+
+        SubElement(update, 'field', {'name': 'summary'}).text = 'NEWS'
+
+        paths = self.export(sink.root)
+
+        self.assertEqual([os.path.basename(path) for path in paths], [
+            '001_nh.activity.csv',
+            '002_nh.clinical.patient.observation.ews.csv',
+            '003_nh.activity.csv'
+        ])
+        self.assertEqual(self.read(paths[2]), [
+            ['id', 'summary'], ['nh_eobs_demo.act_1', 'NEWS']])
+
+    def test_reference_fields_resolved_after_load(self):
+        """
+        Make sure reference fields are left to be set once loaded, and set
+        to model and database id
+        """
+        sink = TreeSink()
+        SubElement(sink.data, 'record',
+                   {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(sink.data, 'record', {
+            'model': 'nh.clinical.patient.observation.ews', 'id': 'news_1'})
+        update = SubElement(sink.data, 'record',
+                            {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(update, 'field', {
+            'name': 'data_ref',
+            'eval': "'nh.clinical.patient.observation.ews,' + "
+                    "str(ref('news_1'))"})
+
+        paths = self.export(sink.root)
+
+        # The update sets nothing load() can
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(
+            self.read(os.path.join(self.folder, REFERENCES_FILE)), [
+                ['model', 'id', 'field', 'value_model', 'value_id'],
+                ['nh.activity', 'nh_eobs_demo.act_1', 'data_ref',
+                 'nh.clinical.patient.observation.ews',
+                 'nh_eobs_demo.news_1']])
+
+        client = StandInClient({'nh_eobs_demo.act_1': 7,
+                                'nh_eobs_demo.news_1': 42})
+        self.assertEqual(resolve_references(client, self.folder), 1)
+        self.assertEqual(client.writes, [
+            ('nh.activity', [7],
+             {'data_ref': 'nh.clinical.patient.observation.ews,42'})])
+
+        self.assertRaises(ValueError, get_reference_values, [{
+            'model': 'nh.activity', 'id': 'nh_eobs_demo.act_1',
+            'field': 'data_ref', 'value_model': 'nh.activity',
+            'value_id': 'nh_eobs_demo.act_2'}], {'nh_eobs_demo.act_1': 7})
+
+
+class TestDemoDataCoordinatorCSV(unittest.TestCase):
+    """
+    Test that the coordinator exports the data files to CSV
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.schema = {
+            'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_every_record_exported(self):
+        coordinator = DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 2, 1, 1, self.schema, self.folder, seed=1,
+            output_format='csv'))
+        coordinator.run()
+
+        records = 0
+        for path in coordinator.get_data_files(['a', 'b']):
+            with open(path) as xml_file:
+                records += xml_file.read().count('<record ')
+        rows = 0
+        csv_folder = os.path.join(self.folder, 'csv')
+        for name in os.listdir(csv_folder):
+            with open(os.path.join(csv_folder, name), 'rb') as csv_file:
+                rows += len(list(csv.reader(csv_file))) - 1
+        self.assertEqual(rows, records)
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, DemoDataConfig, ['a'], 1, 1, 0,
+                          self.schema, self.folder, output_format='json')
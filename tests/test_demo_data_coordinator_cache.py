@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, timedelta
+from demo_data_generators import demo_data_coordinator
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator, WARD_CACHE_FILE
+from demo_data_generators.demographics import POOLS, DemographicsPool
+
+
+class CountingCoordinator(DemoDataCoordinator):
+    """
+    Coordinator remembering which wards it actually wrote
+    """
+
+    def write_ward(self, index, ward, *args):
+        self.written = getattr(self, 'written', []) + [ward]
+        return super(CountingCoordinator, self).write_ward(index, ward, *args)
+
+
+class Tomorrow(date):
+    """
+    Dates, as seen from the day after today
+    """
+
+    @classmethod
+    def today(cls):
+        return date.today() + timedelta(days=1)
+
+
+class TestDemoDataCoordinatorCache(unittest.TestCase):
+    """
+    Test that wards whose inputs have not changed are not generated again
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.schema = {
+            'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        for path in POOLS.keys():
+            if path and path.startswith(self.folder):
+                del POOLS[path]
+
+    def generate(self, wards=('a', 'b'), **kwargs):
+        options = {'seed': 3}
+        options.update(kwargs)
+        coordinator = CountingCoordinator(DemoDataConfig(
+            list(wards), 2, 2, 1, self.schema, self.folder, **options))
+        coordinator.run()
+        return getattr(coordinator, 'written', [])
+
+    def read(self, ward, name):
+        path = os.path.join(self.folder, 'ward_{0}'.format(ward), name)
+        with open(path) as xml_file:
+            return xml_file.read()
+
+    def test_unchanged_wards_skipped(self):
+        self.assertEqual(self.generate(), ['a', 'b'])
+        news = self.read('b', 'demo_news.xml')
+
+        self.assertEqual(self.generate(), [])
+        self.assertEqual(self.read('b', 'demo_news.xml'), news)
+
+    def test_changed_ward_generated(self):
+        self.generate()
+
+        self.assertEqual(self.generate(wards=('a', 'c')), ['c'])
+        self.assertEqual(self.generate(history_days=3), ['a', 'b'])
+
+    def test_demographics_changed(self):
+        """
+        Make sure wards are generated again with other names, but not with
+        the same names in another file
+        """
+        paths = [os.path.join(self.folder, name)
+                 for name in ('pool.json', 'same.json', 'other.json')]
+        # Nurses are named after their role
+        pool = DemographicsPool(['Adam', 'Ned', 'Nick'], ['Nina', 'Nora'],
+                                ['Smith'])
+        pool.save(paths[0])
+        pool.save(paths[1])
+        DemographicsPool(['Carl', 'Neil', 'Noel'], ['Nell', 'Nuala'],
+                         ['Jones']).save(paths[2])
+        self.generate(demographics_file=paths[0])
+
+        self.assertEqual(self.generate(demographics_file=paths[1]), [])
+        self.assertEqual(self.generate(demographics_file=paths[2]),
+                         ['a', 'b'])
+
+    def test_generated_again_the_next_day(self):
+        self.generate()
+        demo_data_coordinator.date = Tomorrow
+        try:
+            self.assertEqual(self.generate(), ['a', 'b'])
+        finally:
+            demo_data_coordinator.date = date
+
+    def test_interrupted_ward_generated(self):
+        """
+        Make sure a ward without its hash, as left by an interrupted run,
+        is generated again
+        """
+        self.generate()
+        os.remove(os.path.join(self.folder, 'ward_b', WARD_CACHE_FILE))
+
+        self.assertEqual(self.generate(), ['b'])
+
+    def test_unseeded_wards_always_generated(self):
+        self.generate(seed=None)
+
+        self.assertEqual(self.generate(seed=None), ['a', 'b'])
+        self.assertFalse(os.path.exists(
+            os.path.join(self.folder, 'ward_a', WARD_CACHE_FILE)))
+
+    def test_cache_disabled(self):
+        self.generate()
+
+        self.assertEqual(self.generate(cache=False), ['a', 'b'])
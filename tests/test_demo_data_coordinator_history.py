@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import ElementTree
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+
+
+class TestDemoDataCoordinatorHistory(unittest.TestCase):
+    """
+    Test that the length of history drives admissions and observations
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.schema = {
+            'nurse': {'total': 1, 'per_ward': 1, 'unassigned': 0}
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_admit_offsets(self):
+        """
+        Make sure the offsets are known before running, with nothing
+        written yet
+        """
+        coordinator = DemoDataCoordinator(DemoDataConfig(
+            ['a'], 1, 1, 0, self.schema, self.folder, history_days=14,
+            demographics_file=os.path.join(self.folder, 'pool.json')))
+
+        self.assertEqual(coordinator.admit_offset_list, range(-1, -15, -1))
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_observations_cover_history(self):
+        """
+        Make sure observations go back as far as the patient's admission
+        """
+        DemoDataCoordinator(DemoDataConfig(
+            ['a'], 1, 1, 0, self.schema, self.folder, history_days=14)).run()
+        ward_folder = os.path.join(self.folder, 'ward_a')
+        spell = ElementTree(
+            file=os.path.join(ward_folder, 'demo_spells.xml')).find(
+                ".//record[@model='nh.activity']"
+                "/field[@name='date_started']")
+        days = int(spell.attrib['eval'].split('timedelta(')[1].split(')')[0])
+        news = ElementTree(
+            file=os.path.join(ward_folder, 'demo_news.xml')).findall(
+                ".//record[@model='nh.clinical.patient.observation.ews']")
+
+        # An observation at least every 12 hours (plus 30 minutes overdue)
+        # from admission until now
+        self.assertTrue(len(news) >= -days * 24 * 60 // (720 + 30))
+
+    def test_history_days_must_be_positive(self):
+        self.assertRaises(ValueError, DemoDataConfig, ['a'], 1, 1, 0,
+                          self.schema, self.folder, history_days=0)
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import ElementTree
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+
+
+class TestDemoDataCoordinatorJobs(unittest.TestCase):
+    """
+    Test that wards generated in parallel are written apart
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.schema = {
+            'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}
+        }
+        self.wards = ['a', 'b']
+        self.coordinator = DemoDataCoordinator(DemoDataConfig(
+            self.wards, 2, 2, 1, self.schema, self.folder, jobs=2))
+        self.coordinator.run()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def get_news_ids(self, ward):
+        news_file = os.path.join(self.folder, 'ward_{0}'.format(ward),
+                                 'demo_news.xml')
+        records = ElementTree(file=news_file).getroot().findall(
+            ".//record/[@model='nh.clinical.patient.observation.ews']")
+        return [record.attrib['id'] for record in records]
+
+    def test_ward_files_are_saved(self):
+        """
+        Make sure every ward's files are written by the workers
+        """
+        for ward in self.wards:
+            ward_folder = os.path.join(self.folder, 'ward_{0}'.format(ward))
+            for name in ['demo_locations.xml', 'demo_users.xml',
+                         'demo_patients.xml', 'demo_spells.xml',
+                         'demo_admissions.xml', 'demo_placements.xml',
+                         'demo_news.xml']:
+                self.assertTrue(os.path.exists(
+                    os.path.join(ward_folder, name)), name)
+
+    def test_news_ids_unique(self):
+        """
+        Make sure wards generated apart never use the same NEWS ids
+        """
+        ids = []
+        for ward in self.wards:
+            ward_ids = self.get_news_ids(ward)
+            self.assertTrue(ward_ids, 'No NEWS generated')
+            ids.extend(ward_ids)
+        self.assertEqual(len(set(ids)), len(ids))
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import ElementTree
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+
+
+class TestDemoDataCoordinatorShards(unittest.TestCase):
+    """
+    Test that data files are split into shards listed in load order
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.schema = {
+            'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read_manifest(self):
+        with open(os.path.join(self.folder, 'manifest.json')) as manifest:
+            return json.load(manifest)
+
+    def test_manifest(self):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 4, 3, 1, self.schema, self.folder,
+            seed=1, shard_size=10)).run()
+
+        manifest = self.read_manifest()
+        self.assertEqual(manifest['shard_size'], 10)
+        paths = [shard['path'] for shard in manifest['files']]
+        self.assertEqual(paths[:4], [
+            'pos_001.xml', 'ward_a/demo_locations_001.xml',
+            'ward_b/demo_locations_001.xml', 'users_001.xml'])
+        self.assertTrue('ward_a/demo_news_002.xml' in paths)
+        self.assertTrue(paths.index('ward_a/demo_news_002.xml') <
+                        paths.index('ward_b/demo_users_001.xml'))
+        for shard in manifest['files']:
+            records = ElementTree(
+                file=os.path.join(self.folder, shard['path'])).findall(
+                    'data/record')
+            self.assertEqual(len(records), shard['records'])
+            self.assertTrue(shard['records'] <= 10)
+
+    def test_records_before_their_references(self):
+        """
+        Make sure every record refers only to records in the same or an
+        earlier shard
+        """
+        DemoDataCoordinator(DemoDataConfig(
+            ['a'], 4, 3, 1, self.schema, self.folder,
+            seed=1, shard_size=7)).run()
+
+        loaded = set()
+        for shard in self.read_manifest()['files']:
+            for record in ElementTree(
+                    file=os.path.join(self.folder, shard['path'])).iter(
+                        'record'):
+                for field in record:
+                    ref = field.get('ref')
+                    if ref and '.' not in ref:
+                        self.assertTrue(ref in loaded, ref)
+                loaded.add(record.get('id'))
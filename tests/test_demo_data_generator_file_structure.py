@@ -1,6 +1,7 @@
 from pyfakefs import fake_filesystem_unittest
 import os
-from demo_data_generators.demo_data_coordinator import DemoDataCoordinator
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
 from demo_data_generators.admissions import AdmissionsGenerator
 from demo_data_generators.locations import LocationsGenerator
 from demo_data_generators.patients import PatientsGenerator
@@ -19,6 +20,8 @@ class TestDemoDataGeneratorFileStructure(fake_filesystem_unittest.TestCase):
             self.root = fromstring('<openerp></openerp>')
             self.class_root = fromstring('<openerp></openerp>')
             self.data = fromstring('<data></data>')
+            self.patients = []
+            self.seed = None
             self.class_data = fromstring('<data></data>')
             self.users_schema = {
                 'nurse': {
@@ -65,8 +68,9 @@ class TestDemoDataGeneratorFileStructure(fake_filesystem_unittest.TestCase):
                 'kiosk': (n for n in ['KIOSK']),
                 'admin': (n for n in ['OLGA'])
             }
+            self.name_allocators = {}
             self.timezone = 'Europe/London'
-            self.data_generator = MagicMock()
+            self.demographics = MagicMock()
 
         self.original_user_init = UsersGenerator.__init__
         self.original_spells_init = SpellsGenerator.__init__
@@ -109,7 +113,8 @@ class TestDemoDataGeneratorFileStructure(fake_filesystem_unittest.TestCase):
     def test_ward_files_are_saved_correctly(self):
         self.assertFalse(os.path.isdir('/demo_data/ward_a'))
         self.assertFalse(os.path.isdir('/demo_data/ward_b'))
-        DemoDataCoordinator(['a', 'b'], 1, 1, 0, self.schema, '/demo_data')
+        DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 1, 1, 0, self.schema, '/demo_data')).run()
         self.assertTrue(os.path.isdir('/demo_data/ward_a'))
         self.assertTrue(os.path.isdir('/demo_data/ward_b'))
         self.assertTrue(os.path.exists('/demo_data/pos.xml'))
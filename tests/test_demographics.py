@@ -0,0 +1,75 @@
+# coding=utf-8
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from demo_data_generators import demographics
+from demo_data_generators.demographics import DemographicsPool, get_pool
+
+
+class TestDemographicsPool(unittest.TestCase):
+    """
+    Test that names and dates of birth are drawn from the pool
+    """
+
+    def setUp(self):
+        self.pool = DemographicsPool(['Adam', 'Bob'], ['Cleo'], ['Smith'])
+        self.rng = random.Random(1)
+
+    def test_first_name_by_gender(self):
+        for _ in xrange(10):
+            self.assertTrue(
+                self.pool.first_name(self.rng, 'M') in ['Adam', 'Bob'])
+        self.assertEqual(self.pool.first_name(self.rng, 'F'), 'Cleo')
+
+    def test_last_name(self):
+        self.assertEqual(self.pool.last_name(self.rng), 'Smith')
+
+    def test_dob_range(self):
+        now = datetime.now()
+        for _ in xrange(100):
+            dob = self.pool.dob(self.rng)
+            self.assertTrue(now - timedelta(days=365.25 * 90) < dob)
+            self.assertTrue(dob < now - timedelta(days=365.25 * 18 - 1))
+
+    def test_from_faker(self):
+        pool = DemographicsPool.from_faker()
+        self.assertTrue(len(pool.first_names['M']) > 100)
+        self.assertTrue(len(pool.last_names) > 100)
+
+
+class TestGetPool(unittest.TestCase):
+    """
+    Test that pools are built once and can be persisted between runs
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'pool.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        demographics.POOLS.pop(self.path, None)
+
+    def test_built_once(self):
+        self.assertTrue(get_pool() is get_pool())
+
+    def test_persisted(self):
+        pool = get_pool(self.path)
+        self.assertTrue(os.path.isfile(self.path))
+
+        # As in a later run
+        del demographics.POOLS[self.path]
+        loaded = get_pool(self.path)
+
+        self.assertFalse(loaded is pool)
+        self.assertEqual(loaded.last_names, pool.last_names)
+        self.assertEqual(loaded.first_names, pool.first_names)
+
+    def test_loaded_from_file(self):
+        DemographicsPool(['Adam'], ['Cleo'], ['Smith']).save(self.path)
+
+        self.assertEqual(get_pool(self.path).last_names, ['Smith'])
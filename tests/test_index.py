@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import Element
+
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator, WARD_INDEX_FILE
+from demo_data_generators.index import INDEX_FILE, DemoDataIndex, get_users
+from demo_data_generators.users import UsersGenerator
+
+USERS_SCHEMA = {
+    'nurse': {'total': 4, 'per_ward': 1, 'unassigned': 2},
+    'senior_manager': {'total': 1, 'per_ward': 0, 'unassigned': 0,
+                       'multi_wards': 'all'}
+}
+
+
+class TestGetUsers(unittest.TestCase):
+    """
+    Test that users are read with their role and wards
+    """
+
+    def test_wards_from_beds_and_wards(self):
+        users_generator = UsersGenerator(
+            {'hca': {'total': 1, 'per_ward': 1, 'unassigned': 0}}, seed=1)
+        root = users_generator.generate_users_per_ward('b', 4)
+        users = get_users(root.find('data'), ['a', 'b'])
+        self.assertEqual(len(users), 1)
+        xml_id, login, name, role, wards = users[0]
+        self.assertEqual(xml_id, 'nhc_def_conf_hca_{0}_user'.format(login))
+        self.assertEqual(role, 'hca')
+        self.assertEqual(wards, ['b'])
+        self.assertTrue(name.lower().startswith(login))
+
+    def test_other_records_left_out(self):
+        data = Element('data')
+        data.append(Element('record', {'model': 'res.partner'}))
+        self.assertEqual(get_users(data, ['a']), [])
+
+
+class TestDemoDataIndex(unittest.TestCase):
+    """
+    Test that the coordinator indexes users, patients and spells
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def generate(self, **kwargs):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 4, 3, 1, USERS_SCHEMA, self.folder,
+            seed=1, index=True, **kwargs)).run()
+        return DemoDataIndex(self.folder)
+
+    def test_users_by_role_and_ward(self):
+        index = self.generate()
+        self.assertEqual(index.get_wards(), ['a', 'b'])
+        # ADT, senior manager, two nurses on wards and two in none
+        self.assertEqual(len(index.get_users()), 6)
+        nurses = index.get_users('nurse', 'b')
+        self.assertEqual(len(nurses), 1)
+        self.assertEqual(nurses[0]['role'], 'nurse')
+        self.assertEqual(
+            [user['role'] for user in index.get_users(ward='a')],
+            ['senior_manager', 'nurse'])
+        self.assertEqual(len(index.get_users('nurse', unassigned=True)), 2)
+        first_users = index.get_first_user_per_role('a')
+        self.assertEqual(sorted(first_users), ['nurse', 'senior_manager'])
+        index.close()
+
+    def test_patients_and_spells(self):
+        index = self.generate()
+        self.assertEqual(len(index.get_patients()), 8)
+        patients = index.get_patients('b')
+        self.assertEqual([patient['bed'] for patient in patients],
+                         ['B1', 'B2', 'B3', None])
+        patient = index.get_patient_in_bed('B2')
+        self.assertEqual(patient['location'], 'nhc_def_conf_location_wb_b2')
+        self.assertEqual(
+            index.get_patient_in_bed('nhc_def_conf_location_wb_b2'), patient)
+        self.assertEqual(index.get_spell(patient['xml_id']),
+                         patient['spell'])
+        self.assertEqual(index.get_spell(patient['other_identifier']),
+                         patient['spell'])
+        self.assertIsNone(index.get_patient_in_bed('B4'))
+        self.assertIsNone(index.get_spell('nhc_demo_patient_0'))
+        index.close()
+
+    def test_cached_and_parallel_wards(self):
+        patients = self.generate().get_patients()
+        os.remove(os.path.join(self.folder, INDEX_FILE))
+        # Taken from the cache, patients are read back from the ward folders
+        self.assertEqual(self.generate().get_patients(), patients)
+        shutil.rmtree(os.path.join(self.folder, 'ward_a'))
+        self.assertEqual(self.generate(jobs=2).get_patients(), patients)
+
+    def test_cached_ward_without_rows_generated(self):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a'], 4, 3, 1, USERS_SCHEMA, self.folder,
+            seed=1)).run()
+        self.assertFalse(os.path.isfile(
+            os.path.join(self.folder, 'ward_a', WARD_INDEX_FILE)))
+        self.assertFalse(os.path.isfile(
+            os.path.join(self.folder, INDEX_FILE)))
+        DemoDataCoordinator(DemoDataConfig(
+            ['a'], 4, 3, 1, USERS_SCHEMA, self.folder,
+            seed=1, index=True)).run()
+        self.assertEqual(len(DemoDataIndex(self.folder).get_patients()), 4)
+
+    def test_no_index(self):
+        self.assertRaises(IOError, DemoDataIndex, self.folder)
+        self.assertEqual(os.listdir(self.folder), [])
@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import ElementTree
+
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.metrics import format_prometheus, get_generator
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Test that the metrics of a run add up to what was written
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.schema = {
+            'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def generate(self, **kwargs):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 4, 3, 1, self.schema, self.folder,
+            seed=1, metrics=True, **kwargs)).run()
+        with open(os.path.join(self.folder, 'metrics.json')) as metrics:
+            return json.load(metrics)
+
+    def count_models(self):
+        models = {}
+        for folder, _, names in os.walk(self.folder):
+            for name in names:
+                if name.endswith('.xml'):
+                    for record in ElementTree(file=os.path.join(
+                            folder, name)).iter('record'):
+                        model = record.get('model')
+                        models[model] = models.get(model, 0) + 1
+        return models
+
+    def test_records_and_bytes(self):
+        metrics = self.generate()
+
+        self.assertEqual(metrics['models'], self.count_models())
+        self.assertEqual(metrics['records'], sum(self.count_models().values()))
+        news = metrics['files']['ward_b/demo_news.xml']
+        self.assertEqual(news['bytes'], os.path.getsize(
+            os.path.join(self.folder, 'ward_b', 'demo_news.xml')))
+        self.assertEqual(
+            sum(metrics['risk_bands'].values()),
+            metrics['models']['nh.clinical.patient.observation.ews'])
+        self.assertEqual(sorted(metrics['sequences']),
+                         ['assessment', 'ews', 'medical'])
+        self.assertEqual(sum(ward['bytes'] for ward in
+                             metrics['wards'].values()) +
+                         metrics['files']['pos.xml']['bytes'] +
+                         metrics['files']['users.xml']['bytes'],
+                         metrics['bytes'])
+        self.assertEqual(sorted(metrics['generators']), [
+            'admissions', 'locations', 'news', 'patients', 'placements',
+            'pos', 'spells', 'users', 'write'])
+        self.assertEqual(metrics['generators']['news']['records'],
+                         sum(metrics['files']['ward_{0}/demo_news.xml'.format(
+                             ward)]['records'] for ward in 'ab'))
+
+    def test_cached_wards(self):
+        """
+        Make sure wards taken from the cache still count
+        """
+        metrics = self.generate()
+        cached = self.generate()
+        self.assertEqual(cached['models'], metrics['models'])
+        self.assertEqual(cached['files'], metrics['files'])
+
+    def test_shards(self):
+        metrics = self.generate(shard_size=10)
+        self.assertEqual(metrics['models'], self.count_models())
+        news = metrics['files']['ward_a/demo_news.xml']
+        self.assertEqual(news['bytes'], sum(
+            os.path.getsize(os.path.join(self.folder, 'ward_a', name))
+            for name in os.listdir(os.path.join(self.folder, 'ward_a'))
+            if name.startswith('demo_news_')))
+
+    def test_prometheus(self):
+        prometheus_path = os.path.join(self.folder, 'metrics.prom')
+        metrics = self.generate(prometheus_path=prometheus_path)
+        with open(prometheus_path) as prometheus_file:
+            lines = prometheus_file.read().splitlines()
+        self.assertEqual(lines, format_prometheus(metrics).splitlines())
+        self.assertTrue(
+            'openeobs_demo_data_records{{model="res.users"}} {0}'.format(
+                metrics['models']['res.users']) in lines)
+        self.assertTrue('# TYPE openeobs_demo_data_file_bytes gauge' in lines)
+
+    def test_get_generator(self):
+        self.assertEqual(get_generator('pos.xml'), 'pos')
+        self.assertEqual(get_generator('ward_a/demo_users.xml'), 'users')
+        self.assertEqual(get_generator('ward_a/demo_news.xml'), 'news')
@@ -0,0 +1,93 @@
+# coding=utf-8
+import unittest
+
+from demo_data_generators.news import NewsGenerator
+from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.placements import PlacementsGenerator
+from demo_data_generators.ward_strategy import WardStrategy
+
+
+class TestNewsTimeline(unittest.TestCase):
+    """
+    Test that NEWS timelines are planned up front and emitted as records.
+    """
+
+    def setUp(self):
+        patients = PatientsGenerator(0, 2, 0, 'a')
+        PlacementsGenerator(patients, [-1, -2])
+        self.patients = patients.patients
+        for patient, offset in zip(self.patients, [-1, -2]):
+            patient.admit_offset = offset
+        risk = {'high': 1, 'medium': 1, 'low': 0, 'none': 0}
+        self.strategy = WardStrategy(self.patients, ['user_1'], risk, 1,
+                                     [30])
+        self.news = NewsGenerator(self.strategy, 0, 0, 0)
+
+    def get_timelines(self):
+        risk = {'high': 1, 'medium': 1, 'low': 0, 'none': 0}
+        strategy = WardStrategy(self.patients, ['user_1'], risk, 1, [30])
+        return self.news.plan_news(strategy)
+
+    def test_timeline_per_patient(self):
+        timelines = self.get_timelines()
+
+        self.assertEqual(len(timelines), 2)
+        self.assertEqual([timeline.offset for timeline in timelines], [1, 2])
+
+    def test_steps_within_history(self):
+        for timeline in self.get_timelines():
+            self.assertTrue(len(timeline.risks) > 0)
+            for minutes in timeline.schedule_minutes:
+                self.assertTrue(minutes < timeline.offset * 24 * 60)
+            self.assertEqual(timeline.user_ids,
+                             ['user_1'] * len(timeline.risks))
+
+    def test_overdue_steps(self):
+        """
+        With every observation overdue, only the first step is on time
+        """
+        for timeline in self.get_timelines():
+            completed = [
+                overdue for overdue, partial in
+                zip(timeline.overdue, timeline.partial) if not partial]
+            self.assertFalse(timeline.overdue[0])
+            self.assertTrue(all(completed[1:]))
+
+    def test_one_record_per_step(self):
+        """
+        Make sure emitting follows the plan: one NEWS record per step, plus
+        the scheduled observation
+        """
+        records = self.news.data.findall(
+            "record[@model='nh.clinical.patient.observation.ews']")
+        planned = self.news.ews_seq
+        self.assertEqual(len(records), planned + len(self.patients))
+
+    def test_notifications_counted_by_model(self):
+        """
+        Make sure notifications are counted by the model of the records
+        emitted, and numbered apart for every model, high risk ones included
+        """
+        # Patients getting better start at high risk
+        risk = {'high': 0, 'medium': 0, 'low': 0, 'none': 2}
+        news = NewsGenerator(
+            WardStrategy(self.patients, ['user_1'], risk, 1, [30]), 0, 0, 0)
+        self.assertTrue(any(
+            field.text == 'Immediately inform medical team'
+            for field in news.data.iter('field')))
+        for model, count in [
+                ('nh.clinical.notification.assessment', news.assess_seq),
+                ('nh.clinical.notification.medical_team', news.medical_seq)]:
+            records = news.data.findall("record[@model='{0}']".format(model))
+            self.assertEqual(len(records), count)
+            ids = [record.get('id') for record in records]
+            self.assertEqual(len(set(ids)), len(ids))
+
+    def test_history_longer_than_nine_days(self):
+        """
+        Make sure the history is not limited to a single digit of days
+        """
+        self.patients[0].admit_offset = -14
+        timeline = self.get_timelines()[0]
+        self.assertEqual(timeline.offset, 14)
+        self.assertTrue(timeline.schedule_minutes[-1] > 13 * 24 * 60)
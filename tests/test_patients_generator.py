@@ -64,3 +64,40 @@ class TestPatientsGenerator(unittest.TestCase):
         records = patientgen.data.findall('record')
         self.assertEqual(8, len(records),
                          'Incorrect number of records generated')
+
+    def test_creates_patient_models(self):
+        """
+        Make sure that a patient model is created for every record, with the
+        data the other generators need
+        """
+        patientgen = PatientsGenerator(7, 1, 1, 'a')
+        self.assertEqual(2, len(patientgen.patients),
+                         'Incorrect number of patients created')
+        bed_patient, patient = patientgen.patients
+        self.assertEqual(bed_patient.id, '7')
+        self.assertEqual(bed_patient.patient_id, 'nhc_demo_patient_7')
+        self.assertEqual(bed_patient.patient_identifier, 'NHSNUM0007')
+        self.assertEqual(bed_patient.other_identifier, 'HOSNUM0007')
+        self.assertEqual(bed_patient.location_id,
+                         'nhc_def_conf_location_wa_b1')
+        self.assertEqual(bed_patient.ward_location_id,
+                         'nhc_def_conf_location_wa')
+        self.assertTrue(bed_patient.in_bed)
+        self.assertEqual(bed_patient.spell_activity_id,
+                         'nhc_activity_demo_spell_7')
+        self.assertEqual(bed_patient.placement_id, 'nhc_demo_placement_7')
+        self.assertEqual(bed_patient.activity_id,
+                         'nhc_activity_demo_placement_7')
+        self.assertEqual(patient.location_id, 'nhc_def_conf_location_wa')
+        self.assertFalse(patient.in_bed)
+
+    def test_patient_models_match_records(self):
+        """
+        Make sure that the patient models match the XML records
+        """
+        patientgen = PatientsGenerator(0, 2, 2, 'a')
+        records = patientgen.data.findall('record')
+        for record, patient in zip(records, patientgen.patients):
+            self.assertEqual(record.attrib['id'], patient.patient_id)
+            location = record.find('field[@name=\'current_location_id\']')
+            self.assertEqual(location.attrib['ref'], patient.location_id)
@@ -0,0 +1,215 @@
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import SubElement, parse
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.pg_copy import CopyExporter, DATA_FILES_FILE, \
+    COPY_TABLES, copy_escape
+from demo_data_generators.sinks import TreeSink, write_xml
+
+
+class TestCopyEscape(unittest.TestCase):
+
+    def test_copy_escape(self):
+        self.assertEqual(copy_escape(None), '\\N')
+        self.assertEqual(copy_escape(True), 't')
+        self.assertEqual(copy_escape(False), 'f')
+        self.assertEqual(copy_escape(40.5), '40.5')
+        self.assertEqual(copy_escape('a\tb\nc\\d'), 'a\\tb\\nc\\\\d')
+        self.assertEqual(copy_escape(u'Zo\xeb'), 'Zo\xc3\xab')
+
+
+class TestCopyExporter(unittest.TestCase):
+    """
+    Test that records of the copied tables are written as COPY rows
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.xml_path = os.path.join(self.folder, 'data.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def export(self, root):
+        write_xml(root, self.xml_path)
+        CopyExporter(self.folder, first_id=10).export_files([self.xml_path])
+
+    def read(self, name):
+        with open(os.path.join(self.folder, '{0}.copy'.format(name))) as \
+                copy_file:
+            return [line.rstrip('\n').split('\t') for line in copy_file]
+
+    def test_patients(self):
+        """
+        Make sure patients get ids and external ids, their location is
+        left to be resolved
+        """
+        self.export(PatientsGenerator(1, 2, 0, 'a', seed=1).root)
+
+        patients = self.read('nh_clinical_patient')
+        self.assertEqual([row[0] for row in patients], ['10', '11'])
+        self.assertEqual(patients[0][5], 'NHSNUM0001')
+        # current_location_id, then the log columns
+        self.assertEqual(patients[0][10], '\\N')
+        self.assertEqual(patients[0][11], '1')
+        self.assertEqual(self.read('ir_model_data')[1][:5], [
+            'nh_eobs_demo', 'nhc_demo_patient_2', 'nh.clinical.patient',
+            '11', 't'])
+        self.assertEqual(self.read('updates')[1], [
+            '2', 'nh_clinical_patient', '11', 'current_location_id', '\\N',
+            '\\N', 'nh_eobs_demo', 'nhc_def_conf_location_wa_b2'])
+
+    def test_activities(self):
+        """
+        Make sure references within the copied tables are written as ids,
+        and records updating an earlier one as updates
+        """
+        sink = TreeSink()
+        activity = SubElement(sink.data, 'record',
+                              {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(activity, 'field', {'name': 'state'}).text = 'completed'
+        SubElement(activity, 'field', {'name': 'location_id',
+                                       'ref': 'location_1'})
+        news = SubElement(sink.data, 'record', {
+            'model': 'nh.clinical.patient.observation.ews', 'id': 'news_1'})
+        SubElement(news, 'field', {'name': 'activity_id', 'ref': 'act_1'})
+        SubElement(news, 'field', {'name': 'oxygen_administration_flag',
+                                   'eval': 'False'})
+        update = SubElement(sink.data, 'record',
+                            {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(update, 'field', {
+            'name': 'data_ref',
+            'eval': "'nh.clinical.patient.observation.ews,' + "
+                    "str(ref('news_1'))"})
+        spell = SubElement(sink.data, 'record',
+                           {'model': 'nh.clinical.spell', 'id': 'spell_1'})
+        SubElement(spell, 'field', {'name': 'activity_id', 'ref': 'act_1'})
+
+        self.export(sink.root)
+
+        self.assertEqual(len(self.read('nh_activity')), 1)
+        self.assertEqual(self.read('nh_activity')[0][5], 'completed')
+        news_row = self.read('nh_clinical_patient_observation_ews')[0]
+        self.assertEqual(news_row[:2], ['10', '10'])
+        self.assertEqual(news_row[6], 'f')
+        self.assertEqual(self.read('updates'), [
+            ['1', 'nh_activity', '10', 'location_id', '\\N', '\\N',
+             'nh_eobs_demo', 'location_1'],
+            ['2', 'nh_activity', '10', 'data_ref',
+             'nh.clinical.patient.observation.ews,10', '\\N', '\\N', '\\N']
+        ])
+        self.assertEqual(len(self.read('ir_model_data')), 2)
+        with open(os.path.join(self.folder, 'load.sql')) as sql_file:
+            self.assertIn("\\copy nh_activity (id, patient_id,",
+                          sql_file.read())
+
+    def test_unknown_column(self):
+        sink = TreeSink()
+        activity = SubElement(sink.data, 'record',
+                              {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(activity, 'field', {'name': 'colour'}).text = 'red'
+
+        self.assertRaises(ValueError, self.export, sink.root)
+
+    def test_copied_records_left_out_of_data_files(self):
+        sink = TreeSink()
+        SubElement(sink.data, 'record',
+                   {'model': 'nh.clinical.location', 'id': 'location_1'})
+        SubElement(sink.data, 'record',
+                   {'model': 'nh.activity', 'id': 'act_1'})
+        spell = SubElement(sink.data, 'record',
+                           {'model': 'nh.clinical.spell', 'id': 'spell_1'})
+        SubElement(spell, 'field', {'name': 'activity_id', 'ref': 'act_1'})
+        write_xml(sink.root, os.path.join(self.folder, 'first.xml'))
+        only_copied = TreeSink(noupdate=False)
+        SubElement(only_copied.data, 'record',
+                   {'model': 'nh.activity', 'id': 'act_2'})
+        write_xml(only_copied.root, os.path.join(self.folder, 'second.xml'))
+        third = TreeSink(noupdate=False)
+        SubElement(third.data, 'record',
+                   {'model': 'res.users', 'id': 'user_1'})
+        write_xml(third.root, os.path.join(self.folder, 'third.xml'))
+
+        CopyExporter(self.folder).export_files([
+            os.path.join(self.folder, name)
+            for name in ('first.xml', 'second.xml', 'third.xml')])
+
+        with open(os.path.join(self.folder, DATA_FILES_FILE)) as list_file:
+            self.assertEqual(list_file.read().splitlines(),
+                             ['001_first.xml', '002_third.xml'])
+        data = parse(os.path.join(self.folder, '001_first.xml')).find('data')
+        self.assertEqual(data.get('noupdate'), '1')
+        self.assertEqual([record.get('id') for record in data],
+                         ['location_1', 'spell_1'])
+        self.assertEqual(data[1][0].attrib,
+                         {'name': 'activity_id', 'ref': 'act_1'})
+        data = parse(os.path.join(self.folder, '002_third.xml')).find('data')
+        self.assertIsNone(data.get('noupdate'))
+        self.assertEqual(len(self.read('nh_activity')), 2)
+
+    def test_unresolved_ids_fail_the_resolve(self):
+        self.export(PatientsGenerator(1, 1, 0, 'a', seed=1).root)
+        with open(os.path.join(self.folder, 'resolve.sql')) as sql_file:
+            sql = sql_file.read()
+        self.assertTrue(sql.startswith('\\set ON_ERROR_STOP on\n'))
+        self.assertIn('RAISE EXCEPTION', sql)
+        self.assertLess(sql.index('RAISE EXCEPTION'), sql.index('UPDATE'))
+
+
+class TestCoordinatorCopy(unittest.TestCase):
+    """
+    Test that the copied records and the data files split the dataset
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def count_records(self, path):
+        models = {}
+        for record in parse(path).iter('record'):
+            model = record.get('model')
+            models[model] = models.get(model, 0) + 1
+        return models
+
+    def test_split(self):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a'], 4, 3, 1,
+            {'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}},
+            self.folder, seed=1, output_format='copy')).run()
+        copy_folder = os.path.join(self.folder, 'copy')
+        with open(os.path.join(copy_folder, DATA_FILES_FILE)) as list_file:
+            names = list_file.read().splitlines()
+        self.assertEqual(names[:3], ['001_pos.xml',
+                                     '002_demo_locations.xml',
+                                     '003_users.xml'])
+        self.assertEqual(sorted(names), sorted(os.listdir(copy_folder))[
+            :len(names)])
+
+        copied = set(model for model, _, _ in COPY_TABLES)
+        written = {}
+        for name in names:
+            for model, count in self.count_records(
+                    os.path.join(copy_folder, name)).iteritems():
+                written[model] = written.get(model, 0) + count
+        self.assertFalse(copied & set(written))
+
+        # Every other record of the XML files is in the data files
+        expected = {}
+        for folder, _, files in os.walk(self.folder):
+            if folder == copy_folder:
+                continue
+            for name in files:
+                if name.endswith('.xml'):
+                    for model, count in self.count_records(
+                            os.path.join(folder, name)).iteritems():
+                        if model not in copied:
+                            expected[model] = expected.get(model, 0) + count
+        self.assertEqual(written, expected)
+        self.assertIn('nh.clinical.spell', written)
@@ -0,0 +1,89 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.profiling import StageProfiler
+
+
+class TestStageProfiler(unittest.TestCase):
+    """
+    Test that every stage leaves its profile and memory usage behind
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_stage_files(self):
+        profiler = StageProfiler(os.path.join(self.folder, 'profile'))
+        with profiler.stage('quick'):
+            pass
+        with profiler.stage('slow'):
+            kept = [[] for _ in xrange(1000)]
+            time.sleep(0.05)
+
+        files = sorted(os.listdir(profiler.folder))
+        self.assertEqual(files, [
+            '01_quick.memory.json', '01_quick.pstats',
+            '02_slow.memory.json', '02_slow.pstats'])
+        stats = pstats.Stats(os.path.join(profiler.folder, '02_slow.pstats'))
+        self.assertTrue(any('sleep' in function[2]
+                            for function in stats.stats))
+        with open(os.path.join(profiler.folder,
+                               '02_slow.memory.json')) as dump:
+            memory = json.load(dump)
+        self.assertEqual(memory['stage'], 'slow')
+        self.assertTrue(memory['objects'] >= len(kept))
+        types = dict((item['type'], item['objects'])
+                     for item in memory['types'])
+        self.assertTrue(types['list'] >= len(kept))
+
+    def test_summary_ranks_stages(self):
+        profiler = StageProfiler(self.folder)
+        with profiler.stage('quick'):
+            pass
+        with profiler.stage('slow'):
+            time.sleep(0.05)
+
+        summary = profiler.write_summary()
+        with open(os.path.join(self.folder, 'summary.txt')) as summary_file:
+            self.assertEqual(summary_file.read(), summary)
+        by_time = summary.split('By memory')[0].splitlines()
+        self.assertTrue(by_time[2].startswith('slow'))
+        self.assertTrue(by_time[3].startswith('quick'))
+
+    def test_coordinator_stages(self):
+        """
+        Make sure every stage of a run is profiled, in order
+        """
+        profile_folder = os.path.join(self.folder, 'profile')
+        schema = {'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}}
+        coordinator = DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 4, 3, 1, schema, self.folder, seed=1,
+            profile_folder=profile_folder))
+        coordinator.run()
+
+        stages = [stage['stage'] for stage in coordinator.profiler.stages]
+        ward_stages = ['locations', 'patients', 'spells', 'admissions',
+                       'placements', 'news', 'write']
+        self.assertEqual(stages, ['pos', 'users'] + [
+            'ward_{0}.{1}'.format(ward, stage)
+            for ward in 'ab' for stage in ward_stages])
+        self.assertTrue(os.path.isfile(
+            os.path.join(profile_folder, '08_ward_a.news.pstats')))
+        self.assertTrue(os.path.isfile(
+            os.path.join(profile_folder, 'summary.txt')))
+
+    def test_not_in_parallel(self):
+        schema = {'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}}
+        self.assertRaises(ValueError, DemoDataConfig, ['a', 'b'], 4, 3,
+                          1, schema, self.folder, jobs=2,
+                          profile_folder=os.path.join(self.folder, 'p'))
@@ -0,0 +1,153 @@
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.progress import ProgressReporter, format_duration
+
+
+class Terminal(StringIO):
+    """A stream passing for a terminal."""
+
+    def isatty(self):
+        return True
+
+
+class Sink(object):
+    """A sink that has written some records."""
+
+    def __init__(self, models):
+        self.models = models
+
+
+class TestProgressReporter(unittest.TestCase):
+    """
+    Test that progress is redrawn on a terminal and logged otherwise
+    """
+
+    def setUp(self):
+        self.log = StringIO()
+        self.handler = logging.StreamHandler(self.log)
+        self.logger = logging.getLogger('demo_data_generators.progress')
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_terminal_redrawn_in_place(self):
+        terminal = Terminal()
+        progress = ProgressReporter(2, 4, terminal, interval=0)
+        progress.start_ward([Sink({'nh.activity': 30, 'res.users': 2})])
+        progress.patient_done(10)
+        progress.patient_done(5)
+        progress.ward_done()
+        progress.finish()
+
+        lines = terminal.getvalue().split('\r')[1:]
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith(
+            'wards 0/2, patients 1/4, 10 observations, '))
+        self.assertTrue(lines[2].startswith(
+            'wards 1/2, patients 2/4, 15 observations, '))
+        self.assertTrue(lines[2].endswith('\n'))
+        self.assertEqual(self.log.getvalue(), '')
+
+    def test_logged_at_intervals(self):
+        stream = StringIO()
+        progress = ProgressReporter(1, 100, stream, interval=3600)
+        for _ in xrange(100):
+            progress.patient_done(3)
+        progress.ward_done()
+        progress.finish()
+
+        self.assertEqual(stream.getvalue(), '')
+        lines = self.log.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith(
+            'wards 1/1, patients 100/100, 300 observations, '))
+        self.assertTrue(lines[0].endswith('ETA 0:00:00'))
+
+    def test_cached_wards_left_out(self):
+        stream = StringIO()
+        progress = ProgressReporter(3, 30, stream, interval=3600)
+        progress.skip_ward(10)
+        progress.ward_done(10, 0)
+        self.assertTrue(self.log.getvalue().startswith(
+            'wards 1/2, patients 10/20, 0 observations, '))
+
+    def test_wards_counted_elsewhere(self):
+        """
+        Make sure the observations of wards generated by another process
+        are counted
+        """
+        stream = StringIO()
+        progress = ProgressReporter(2, 20, stream, interval=3600)
+        progress.ward_done(10, 500, 40)
+        self.assertTrue(self.log.getvalue().startswith(
+            'wards 1/2, patients 10/20, 40 observations, '))
+        self.assertEqual(progress.records_done, 500)
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(3725.5), '1:02:05')
+
+    def generate(self, folder, **kwargs):
+        # Logged, whether the tests run in a terminal or not
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            DemoDataCoordinator(DemoDataConfig(
+                ['a', 'b'], 4, 3, 1,
+                {'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}},
+                folder, seed=1, progress=True, **kwargs)).run()
+        finally:
+            sys.stderr = stderr
+
+    def test_coordinator_progress(self):
+        folder = tempfile.mkdtemp()
+        try:
+            self.generate(folder)
+        finally:
+            shutil.rmtree(folder)
+        lines = self.log.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[-1].startswith('wards 2/2, patients 6/6, '))
+
+    def test_parallel_cached_ward_left_out(self):
+        """
+        Make sure a cached ward generated in parallel is not counted as done
+        """
+        folder = tempfile.mkdtemp()
+        try:
+            self.generate(folder)
+            shutil.rmtree(os.path.join(folder, 'ward_b'))
+            self.log.truncate(0)
+            self.generate(folder, jobs=2)
+        finally:
+            shutil.rmtree(folder)
+        lines = self.log.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('wards 1/1, patients 3/3, '))
+
+    def test_parallel_observations_counted(self):
+        """
+        Make sure wards generated in parallel report the observations the
+        same wards report when generated one after the other
+        """
+        lines = []
+        for jobs in (1, 2):
+            folder = tempfile.mkdtemp()
+            try:
+                self.log.truncate(0)
+                self.generate(folder, jobs=jobs)
+            finally:
+                shutil.rmtree(folder)
+            lines.append(self.log.getvalue().splitlines()[-1])
+        observations = [line.split(', ')[2] for line in lines]
+        self.assertEqual(observations[0], observations[1])
+        self.assertNotEqual(observations[1], '0 observations')
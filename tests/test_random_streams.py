@@ -0,0 +1,133 @@
+# coding=utf-8
+import filecmp
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import tostring
+
+from demo_data_generators.admissions import AdmissionsGenerator
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.news import NewsGenerator
+from demo_data_generators.patients import PatientsGenerator
+from demo_data_generators.random_streams import get_random
+from demo_data_generators.ward_strategy import WardStrategy
+
+
+class TestRandomStreams(unittest.TestCase):
+    """
+    Test that seeded streams depend only on the seed and their key
+    """
+
+    def draw(self, seed, *key):
+        rng = get_random(seed, *key)
+        return [rng.random() for _ in xrange(5)]
+
+    def test_same_key_same_stream(self):
+        self.assertEqual(self.draw(42, 'a', '1', 'news'),
+                         self.draw(42, 'a', '1', 'news'))
+
+    def test_different_keys_different_streams(self):
+        stream = self.draw(42, 'a', '1', 'news')
+        self.assertNotEqual(stream, self.draw(43, 'a', '1', 'news'))
+        self.assertNotEqual(stream, self.draw(42, 'b', '1', 'news'))
+        self.assertNotEqual(stream, self.draw(42, 'a', '2', 'news'))
+        self.assertNotEqual(stream, self.draw(42, 'a', '1', 'admission'))
+
+    def get_fields(self, generator, patient_id):
+        record = generator.data.find(
+            "record[@id='nhc_demo_patient_{0}']".format(patient_id))
+        return dict((field.attrib['name'], field.text) for field in record
+                    if field.attrib['name'] != 'current_location_id')
+
+    def test_patient_regenerated_alone(self):
+        """
+        Make sure a patient generated on its own matches the same patient
+        generated with the rest of the ward
+        """
+        ward = PatientsGenerator(1, 10, 2, 'a', seed=7)
+        alone = PatientsGenerator(6, 1, 0, 'a', seed=7)
+
+        self.assertEqual(self.get_fields(alone, 6),
+                         self.get_fields(ward, 6))
+
+    def generate_news(self, patients):
+        """
+        Admit patients and generate their NEWS the way the coordinator does,
+        returning the admissions and NEWS generators.
+        """
+        for patient in patients.patients:
+            patient.admit_offset = get_random(
+                7, 'a', patient.id, 'admission').choice([-1, -2, -3])
+        offsets = [patient.admit_offset for patient in patients.patients]
+        admissions = AdmissionsGenerator(patients, offsets)
+        strategy = WardStrategy(
+            [patient for patient in patients.patients if patient.in_bed],
+            ['user_1', 'user_2'],
+            {'high': 3, 'medium': 3, 'low': 2, 'none': 2}, 0.5, [30, 60],
+            seed=7, ward='a')
+        return admissions, NewsGenerator(strategy, 0, 0, 0)
+
+    def get_records(self, generator, patient_id, parts):
+        """
+        Return the records of a patient, by the patient id in their id
+        (the last of its parts for admissions, the one before the number
+        for NEWS and notifications).
+        """
+        return [tostring(record) for record in generator.data.iter('record')
+                if record.attrib['id'].rsplit('_', parts)[1] == patient_id]
+
+    def test_news_regenerated_alone(self):
+        """
+        Make sure a patient's admissions and NEWS are the same whether
+        generated alone or with the rest of the ward
+        """
+        ward = PatientsGenerator(1, 10, 2, 'a', seed=7)
+        alone = PatientsGenerator(6, 1, 0, 'a', seed=7)
+        # Beds are handed out by the ward, put the patient back in theirs
+        alone.patients[0].location_id = ward.patients[5].location_id
+        ward_admissions, ward_news = self.generate_news(ward)
+        alone_admissions, alone_news = self.generate_news(alone)
+
+        admissions = self.get_records(alone_admissions, '6', 1)
+        self.assertTrue(admissions)
+        self.assertEqual(self.get_records(ward_admissions, '6', 1),
+                         admissions)
+        news = self.get_records(alone_news, '6', 2)
+        self.assertTrue(news)
+        self.assertEqual(self.get_records(ward_news, '6', 2), news)
+
+
+class TestSeededCoordinator(unittest.TestCase):
+    """
+    Test that generating twice with the same seed writes the same files
+    """
+
+    def setUp(self):
+        self.folders = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        self.schema = {
+            'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}
+        }
+
+    def tearDown(self):
+        for folder in self.folders:
+            shutil.rmtree(folder)
+
+    def test_regenerated_files_identical(self):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 3, 3, 1, self.schema,
+            self.folders[0], seed=5)).run()
+        # In a different process layout
+        DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 3, 3, 1, self.schema,
+            self.folders[1], seed=5, jobs=2)).run()
+
+        for ward in ['ward_a', 'ward_b']:
+            for name in ['demo_patients.xml', 'demo_spells.xml',
+                         'demo_placements.xml', 'demo_users.xml',
+                         'demo_news.xml']:
+                paths = [os.path.join(folder, ward, name)
+                         for folder in self.folders]
+                self.assertTrue(filecmp.cmp(paths[0], paths[1], False),
+                                '{0}/{1} differs'.format(ward, name))
@@ -0,0 +1,118 @@
+# coding=utf-8
+import unittest
+
+from demo_setup_tools.assign_users_to_spells import ReallocateUsersToWards, \
+    ReallocateUsersToBeds
+from odoo_stand_in import StandInOdoo, StandInServer
+
+
+class StandInAllocationOdoo(StandInOdoo):
+    """
+    Stand-in with users allocated to locations (wards or beds).
+    """
+
+    models = ('nh.clinical.user.responsibility.allocation',)
+
+    def __init__(self, wards):
+        super(StandInAllocationOdoo, self).__init__()
+        # Location ids of each user
+        self.wards = wards
+        self.activities = {}
+        self.written = {}
+
+    def search(self, model, domain, *args):
+        if model == 'res.groups':
+            return [1]
+        return sorted(self.wards)
+
+    def read(self, model, ids, fields, *args):
+        return [{'id': user, fields[0]: self.wards[user]} for user in ids]
+
+    def write(self, model, ids, values):
+        with self.lock:
+            for user in ids:
+                self.written[user] = values['location_ids']
+        return True
+
+    def create_activity(self, model, activity, data):
+        with self.lock:
+            activity_id = len(self.activities) + 1
+            self.activities[activity_id] = data
+        return activity_id
+
+    def complete(self, model, activity_id):
+        self.activities[activity_id]['completed'] = True
+        return True
+
+
+class TestReallocateUsersToWards(unittest.TestCase):
+    """
+    Test that ward users are reallocated with their ward data read once
+    """
+
+    def setUp(self):
+        self.wards = dict((user, [user % 3 + 1]) for user in xrange(1, 26))
+        self.odoo = StandInAllocationOdoo(self.wards)
+        self.server = StandInServer(self.odoo)
+
+    def tearDown(self):
+        self.server.close()
+
+    def reallocate(self, **kwargs):
+        reallocator = ReallocateUsersToWards(self.server.url, 'demo',
+                                             **kwargs)
+        del self.odoo.calls[:]
+        reallocator.reallocate_users_by_group('NH Clinical Doctor Group')
+
+    def check_allocations(self):
+        allocated = dict(
+            (data['responsible_user_id'], data['location_ids'][0][2])
+            for data in self.odoo.activities.values()
+            if data.get('completed'))
+        self.assertEqual(allocated, self.wards)
+
+    def test_ward_data_read_once(self):
+        self.reallocate(jobs=1)
+
+        self.assertEqual(self.odoo.calls.count(
+            ('nh.clinical.user.management', 'read')), 1)
+        self.assertEqual(len(self.odoo.get_calls('create_activity')), 25)
+        self.check_allocations()
+
+    def test_concurrent_chunks(self):
+        self.reallocate(chunk_size=4)
+
+        self.assertEqual(self.odoo.calls.count(
+            ('nh.clinical.user.management', 'read')), 1)
+        # One call to create and one to complete each user's allocation
+        self.assertEqual(len(self.odoo.get_calls('create_activity')), 25)
+        self.assertEqual(len(self.odoo.get_calls('complete')), 25)
+        self.check_allocations()
+
+
+class TestReallocateUsersToBeds(unittest.TestCase):
+    """
+    Test that bed users with the same locations are written together
+    """
+
+    def setUp(self):
+        self.beds = dict(
+            (user, [user % 4 + 10, 20]) for user in xrange(1, 41))
+        self.odoo = StandInAllocationOdoo(self.beds)
+        self.server = StandInServer(self.odoo)
+        self.reallocator = ReallocateUsersToBeds(self.server.url, 'demo')
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_write_per_location_set(self):
+        self.reallocator.reallocate_users_by_group('NH Clinical Nurse Group')
+
+        self.assertEqual(len(self.odoo.get_calls('write')), 4)
+        self.assertEqual(self.odoo.written, self.beds)
+
+    def test_group_timing(self):
+        self.reallocator.reallocate_users_by_group('NH Clinical Nurse Group')
+
+        self.assertEqual(self.reallocator.timings.keys(),
+                         ['NH Clinical Nurse Group'])
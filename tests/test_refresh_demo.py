@@ -0,0 +1,46 @@
+# coding=utf-8
+import unittest
+
+from demo_refresh_tools.refresh_demo import RefreshDemo
+
+
+class StandInClient(object):
+    """
+    Stand-in ERPPeek client installing modules and their dependencies
+    """
+
+    def __init__(self):
+        self.installed = []
+
+    def install(self, *modules):
+        self.installed.extend(modules)
+
+    def modules(self, name='', installed=None):
+        return {'installed': list(self.installed)}
+
+    def execute(self, model, method, domain, fields):
+        return [{'name': 'nh_eobs_mobile'}, {'name': 'nh_clinical'}]
+
+
+class TestInstallEobs(unittest.TestCase):
+    """
+    Test that the demo module's data is only installed without a data folder
+    """
+
+    def get_refresh(self, data_folder):
+        refresh = RefreshDemo.__new__(RefreshDemo)
+        refresh.client = StandInClient()
+        refresh.data_folder = data_folder
+        return refresh
+
+    def test_demo_module_installed(self):
+        refresh = self.get_refresh(None)
+        self.assertTrue(refresh.install_eobs())
+        self.assertEqual(refresh.client.installed,
+                         ['nh_eobs_mobile', 'nh_eobs_demo'])
+
+    def test_dependencies_installed_with_data_folder(self):
+        refresh = self.get_refresh('/data')
+        self.assertTrue(refresh.install_eobs())
+        self.assertNotIn('nh_eobs_demo', refresh.client.installed)
+        self.assertIn('nh_clinical', refresh.client.installed)
@@ -0,0 +1,219 @@
+import os
+import shutil
+import tempfile
+import unittest
+from xml.etree.ElementTree import Element, ElementTree, SubElement, Comment
+from demo_data_generators.locations import LocationsGenerator
+from demo_data_generators.sinks import TreeSink, StreamingXMLSink, \
+    ShardedXMLSink, get_shard_paths, write_xml
+
+
+class TestWriteXML(unittest.TestCase):
+    """
+    Test that trees are pretty printed while they are written
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'tree.xml')
+        self.sink = TreeSink()
+        self.sink.data.append(Comment('Patient 1'))
+        record = SubElement(self.sink.data, 'record',
+                            {'model': 'nh.activity', 'id': 'act_1'})
+        field = SubElement(record, 'field', {'name': 'summary'})
+        field.text = 'Assess & inform'
+        SubElement(record, 'field', {'name': 'data_ref',
+                                     'eval': "str(ref('act_1'))"})
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read(self):
+        with open(self.path) as xml_file:
+            return xml_file.read()
+
+    def test_pretty_printed(self):
+        """
+        Make sure every level is indented by two spaces
+        """
+        write_xml(self.sink.root, self.path)
+        self.assertEqual(
+            self.read(),
+            '<openerp>\n'
+            '  <data noupdate="1">\n'
+            '    <!--Patient 1-->\n'
+            '    <record id="act_1" model="nh.activity">\n'
+            '      <field name="summary">Assess &amp; inform</field>\n'
+            '      <field eval="str(ref(\'act_1\'))" name="data_ref" />\n'
+            '    </record>\n'
+            '  </data>\n'
+            '</openerp>\n')
+
+    def test_compact(self):
+        """
+        Make sure compact output has no indentation
+        """
+        write_xml(self.sink.root, self.path, compact=True)
+        self.assertEqual(
+            self.read(),
+            '<openerp><data noupdate="1"><!--Patient 1-->'
+            '<record id="act_1" model="nh.activity">'
+            '<field name="summary">Assess &amp; inform</field>'
+            '<field eval="str(ref(\'act_1\'))" name="data_ref" />'
+            '</record></data></openerp>\n')
+
+    def test_tree_not_modified(self):
+        """
+        Make sure writing the tree does not touch text or tail
+        """
+        write_xml(self.sink.root, self.path)
+        for elem in self.sink.root.iter():
+            self.assertEqual(elem.tail, None, 'Tail modified')
+        self.assertEqual(self.sink.data.text, None, 'Text modified')
+
+    def test_deep_tree(self):
+        """
+        Make sure deep trees do not hit the recursion limit
+        """
+        root = Element('openerp')
+        elem = root
+        for _ in xrange(5000):
+            elem = SubElement(elem, 'field')
+        write_xml(root, self.path, compact=True)
+        self.assertTrue(self.read().startswith('<openerp><field><field>'))
+
+
+class TestStreamingXMLSink(unittest.TestCase):
+    """
+    Test that the streaming sink writes the same XML as a written tree
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_tree(self, root, name, compact=False):
+        path = os.path.join(self.folder, name)
+        write_xml(root, path, compact=compact)
+        with open(path) as xml_file:
+            return xml_file.read()
+
+    def write_stream(self, name, beds, compact=False):
+        path = os.path.join(self.folder, name)
+        sink = StreamingXMLSink(path, compact=compact)
+        LocationsGenerator('a', beds, sink=sink)
+        sink.close()
+        with open(path) as xml_file:
+            return xml_file.read()
+
+    def test_tree_sink_is_default(self):
+        """
+        Make sure generators keep their records in memory by default
+        """
+        gen = LocationsGenerator('a', 2)
+        self.assertTrue(isinstance(gen.sink, TreeSink))
+        self.assertEqual(len(gen.data.findall('record')), 3,
+                         'Incorrect number of records kept')
+
+    def test_streamed_file_matches_tree(self):
+        """
+        Make sure the streamed file is identical to the written tree
+        """
+        tree_output = self.write_tree(LocationsGenerator('a', 3).root,
+                                      'tree.xml')
+        stream_output = self.write_stream('stream.xml', 3)
+        self.assertEqual(stream_output, tree_output,
+                         'Streamed XML differs from tree XML')
+
+    def test_compact_streamed_file_matches_tree(self):
+        """
+        Make sure the compact streamed file is identical to the written tree
+        """
+        tree_output = self.write_tree(LocationsGenerator('a', 3).root,
+                                      'tree.xml', compact=True)
+        stream_output = self.write_stream('stream.xml', 3, compact=True)
+        self.assertEqual(stream_output, tree_output,
+                         'Streamed XML differs from tree XML')
+
+    def test_streamed_records_are_dropped(self):
+        """
+        Make sure flushed records are not kept in memory
+        """
+        sink = StreamingXMLSink(os.path.join(self.folder, 'stream.xml'))
+        gen = LocationsGenerator('a', 3, sink=sink)
+        self.assertEqual(len(gen.data), 0, 'Records kept after flush')
+        self.assertEqual(sink.records_written, 4,
+                         'Incorrect number of records written')
+        sink.close()
+
+    def test_empty_streamed_file_matches_tree(self):
+        """
+        Make sure an empty data element is self-closed like in the tree
+        """
+        path = os.path.join(self.folder, 'empty.xml')
+        StreamingXMLSink(path).close()
+        with open(path) as xml_file:
+            stream_output = xml_file.read()
+        tree_output = self.write_tree(TreeSink().root, 'empty_tree.xml')
+        self.assertEqual(stream_output, tree_output,
+                         'Empty streamed XML differs from tree XML')
+
+
+class TestShardedXMLSink(unittest.TestCase):
+    """
+    Test that the sharded sink splits the records in order
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'demo_locations.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write_shards(self, beds, max_records):
+        sink = ShardedXMLSink(self.path, max_records)
+        LocationsGenerator('a', beds, sink=sink)
+        sink.close()
+        return sink.paths
+
+    def test_shards(self):
+        """
+        Make sure every shard holds at most the maximum number of records,
+        in the original order
+        """
+        paths = self.write_shards(4, 2)
+
+        self.assertEqual([os.path.basename(path) for path in paths], [
+            'demo_locations_001.xml', 'demo_locations_002.xml',
+            'demo_locations_003.xml'])
+        self.assertEqual(get_shard_paths(self.path), paths)
+        ids = []
+        for path in paths:
+            records = ElementTree(file=path).findall('data/record')
+            self.assertTrue(len(records) <= 2)
+            ids.extend(record.get('id') for record in records)
+        self.assertEqual(ids, [
+            record.get('id') for record in
+            LocationsGenerator('a', 4).data.findall('record')])
+
+    def test_comments_stay_with_their_record(self):
+        sink = ShardedXMLSink(self.path, 1)
+        for number in xrange(2):
+            sink.data.append(Comment('Record {0}'.format(number)))
+            SubElement(sink.data, 'record', {'id': str(number)})
+        sink.close()
+
+        second = ElementTree(file=sink.paths[1]).getroot()
+        with open(sink.paths[1]) as xml_file:
+            self.assertIn('<!--Record 1-->', xml_file.read())
+        self.assertEqual(len(second.findall('data/record')), 1)
+
+    def test_shards_of_earlier_run_removed(self):
+        self.write_shards(4, 1)
+        paths = self.write_shards(4, 5)
+
+        self.assertEqual(get_shard_paths(self.path), paths)
+        self.assertEqual(len(paths), 1)
@@ -1,5 +1,4 @@
 import unittest
-import re
 from demo_data_generators.spells import SpellsGenerator
 from demo_data_generators.patients import PatientsGenerator
 
@@ -34,18 +33,6 @@ class TestSpellsGenerator(unittest.TestCase):
                       '.strftime(\'%Y-%m-%d %H:%M:%S\')'
         self.assertEqual(self.spellgen.admit_date_eval_string, eval_string,
                          'Incorrect Admit date eval string List')
-        
-    def test_has_patient_id_regex(self):
-        """
-        Make sure that the patient_id regex is valid
-        """
-        patient_id_groups = re.match(self.spellgen.patient_id_regex,
-                                     'nhc_demo_patient_666')
-        self.assertEqual(len(patient_id_groups.groups()), 1,
-                         'Incorrect regex groups')
-        self.assertEqual(patient_id_groups.groups()[0],
-                         '666',
-                         'Incorrect Regex match')
 
     def test_number_of_records_for_spell(self):
         """
@@ -0,0 +1,49 @@
+# coding=utf-8
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_after(statement, module):
+    """Return whether a module is loaded after running a statement."""
+    output = subprocess.check_output(
+        [sys.executable, '-c',
+         '{0}; import sys; print({1!r} in sys.modules)'.format(
+             statement, module)],
+        cwd=ROOT)
+    return output.strip() == 'True'
+
+
+class TestStartupImports(unittest.TestCase):
+    """
+    Test that heavy dependencies are only imported when they are used
+    """
+
+    def test_generators_do_not_import_faker(self):
+        self.assertFalse(imported_after(
+            'import demo_data_generators.demo_data_coordinator', 'faker'))
+
+    def test_validator_does_not_import_generators(self):
+        self.assertFalse(imported_after(
+            'import demo_data_generators.validate',
+            'demo_data_generators.demo_data_coordinator'))
+
+    def test_demographics_pool_imports_faker(self):
+        self.assertTrue(imported_after(
+            'from demo_data_generators.demographics import get_pool; '
+            'get_pool()', 'faker'))
+
+    def test_console_scripts_defer_imports(self):
+        for module, deferred in [
+                ('demo_data_generators.__main__',
+                 'demo_data_generators.demo_data_coordinator'),
+                ('smoketest.__main__', 'erppeek'),
+                ('demo_setup_tools.__main__', 'erppeek'),
+                ('security.__main__', 'erppeek'),
+                ('demo_refresh_tools.__main__', 'erppeek')]:
+            self.assertFalse(
+                imported_after('import {0}'.format(module), deferred),
+                '{0} imports {1}'.format(module, deferred))
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from xml.etree.ElementTree import Element, SubElement
+from demo_data_generators.news import NewsGenerator
+from demo_data_generators.sinks import StreamingXMLSink, iter_xml
+from demo_data_generators.templates import RecordTemplate
+from demo_data_generators.ward_strategy import WardStrategy
+
+
+class TestRecordTemplate(unittest.TestCase):
+    """
+    Test that records stamped from a template match records built by hand
+    """
+
+    def setUp(self):
+        self.template = RecordTemplate('nh.activity', [
+            ('patient_id', 'ref', None),
+            ('data_model', 'text', 'nh.clinical.patient.observation.ews'),
+            ('state', 'text', None),
+            ('sequence', 'eval', None)
+        ])
+
+    def test_stamp(self):
+        parent = Element('data')
+        self.template.stamp(parent, 'act_1', 'patient_1', 'completed', '3')
+
+        expected = Element('data')
+        record = SubElement(expected, 'record',
+                            {'model': 'nh.activity', 'id': 'act_1'})
+        SubElement(record, 'field', {'name': 'patient_id',
+                                     'ref': 'patient_1'})
+        field = SubElement(record, 'field', {'name': 'data_model'})
+        field.text = 'nh.clinical.patient.observation.ews'
+        field = SubElement(record, 'field', {'name': 'state'})
+        field.text = 'completed'
+        SubElement(record, 'field', {'name': 'sequence', 'eval': '3'})
+        self.assertEqual(''.join(iter_xml(parent)),
+                         ''.join(iter_xml(expected)))
+
+    def test_fixed_fields_copied(self):
+        """
+        Make sure changing a kept record leaves the others alone
+        """
+        parent = Element('data')
+        first = self.template.stamp(parent, 'act_1', 'patient_1', 'a', '1')
+        second = self.template.stamp(parent, 'act_2', 'patient_2', 'b', '2')
+
+        self.assertIsNot(first[1], second[1])
+        first[1].text = 'nh.activity'
+        self.assertEqual(second[1].text,
+                         'nh.clinical.patient.observation.ews')
+        self.assertEqual(second[0].get('ref'), 'patient_2')
+
+    def test_fixed_fields_shared(self):
+        template = RecordTemplate('nh.activity', [
+            ('patient_id', 'ref', None),
+            ('data_model', 'text', 'nh.clinical.patient.observation.ews')
+        ], share=True)
+        parent = Element('data')
+        first = template.stamp(parent, 'act_1', 'patient_1')
+        second = template.stamp(parent, 'act_2', 'patient_2')
+
+        self.assertIs(first[1], second[1])
+        self.assertIsNot(first[0], second[0])
+        self.assertEqual(second[0].get('ref'), 'patient_2')
+
+    def test_shared_for_streaming_sinks(self):
+        """
+        Make sure NEWS records kept in a tree do not share fields, while
+        streamed ones do
+        """
+        news = NewsGenerator(WardStrategy([], ['user_1'], {'none': 1}, 0,
+                                          [30]), 0, 0, 0)
+        self.assertFalse(news.update_activity_template.share)
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            sink = StreamingXMLSink(path)
+            news = NewsGenerator(WardStrategy([], ['user_1'], {'none': 1},
+                                              0, [30]), 0, 0, 0, sink=sink)
+            sink.close()
+        finally:
+            os.remove(path)
+        self.assertTrue(news.update_activity_template.share)
+
+    def test_wrong_number_of_values(self):
+        self.assertRaises(ValueError, self.template.stamp, Element('data'),
+                          'act_1', 'patient_1')
+
+    def test_unknown_kind(self):
+        self.assertRaises(ValueError, RecordTemplate, 'nh.activity',
+                          [('state', 'attribute', None)])
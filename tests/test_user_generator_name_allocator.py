@@ -0,0 +1,53 @@
+# coding=utf-8
+import unittest
+
+from demo_data_generators.users import NameAllocator, UsersGenerator
+
+
+class TestNameAllocator(unittest.TestCase):
+    """
+    Test that names are unique and never run out
+    """
+
+    def test_suffixed_once_exhausted(self):
+        allocator = NameAllocator(['Nadia', 'Nora'])
+        names = [next(allocator) for _ in xrange(5)]
+        self.assertEqual(names, ['Nadia', 'Nora', 'Nadia2', 'Nora2',
+                                 'Nadia3'])
+
+    def test_duplicates_skipped(self):
+        allocator = NameAllocator(['Nadia', 'NADIA', 'Nora'])
+        names = [next(allocator) for _ in xrange(3)]
+        self.assertEqual(names, ['Nadia', 'Nora', 'Nadia2'])
+
+    def test_suffix_clashing_with_name_skipped(self):
+        allocator = NameAllocator(['Nadia', 'Nadia2'])
+        names = [next(allocator) for _ in xrange(4)]
+        self.assertEqual(names, ['Nadia', 'Nadia2', 'Nadia22', 'Nadia3'])
+
+    def test_empty_pool(self):
+        allocator = NameAllocator([])
+        self.assertRaises(StopIteration, next, allocator)
+
+    def test_thousands_of_users(self):
+        """
+        Make sure ids and logins of many users of a role are all unique
+        """
+        schema = {'nurse': {'total': 20000, 'per_ward': 5000,
+                            'unassigned': 0}}
+        gen = UsersGenerator(schema)
+        records = []
+        for ward in 'abcd':
+            doc = gen.generate_users_per_ward(ward, 5000)
+            records.extend(doc.findall('data/record'))
+
+        ids = set(record.get('id') for record in records)
+        logins = set(record.find("field[@name='login']").text
+                     for record in records)
+        self.assertEqual(len(ids), 20000)
+        self.assertEqual(len(logins), 20000)
+        for record in records:
+            login = record.find("field[@name='login']").text
+            self.assertTrue(login.startswith('n'))
+            self.assertEqual(record.get('id'),
+                             'nhc_def_conf_nurse_{0}_user'.format(login))
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from demo_data_generators.demo_data_coordinator import DemoDataConfig, \
+    DemoDataCoordinator
+from demo_data_generators.validate import ReferenceValidator, \
+    get_data_file_paths, get_load_order, FORWARD, MISSING, WRONG_MODEL
+
+DATA = """<openerp>
+  <data noupdate="1">
+{0}
+  </data>
+</openerp>
+"""
+
+
+class TestReferenceValidator(unittest.TestCase):
+    """
+    Test that broken references are found, in load order
+    """
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, name, records):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as xml_file:
+            xml_file.write(DATA.format(records))
+        return path
+
+    def validate(self, *paths, **kwargs):
+        validator = ReferenceValidator()
+        return validator, validator.validate_files(list(paths), **kwargs)
+
+    def test_generated_data(self):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a', 'b'], 4, 3, 1,
+            {'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}},
+            self.folder, seed=1)).run()
+        validator, errors = self.validate(*get_load_order(self.folder))
+        self.assertEqual(errors, [])
+        self.assertEqual(validator.files, 16)
+        self.assertTrue(validator.references > validator.records)
+        self.assertTrue(validator.external > 0)
+
+    def test_sharded_data_in_manifest_order(self):
+        DemoDataCoordinator(DemoDataConfig(
+            ['a'], 4, 3, 1,
+            {'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}},
+            self.folder, seed=1, shard_size=5)).run()
+        paths = get_load_order(self.folder)
+        self.assertEqual(paths[:2], [
+            os.path.join(self.folder, 'pos_001.xml'),
+            os.path.join(self.folder, 'ward_a', 'demo_locations_001.xml')])
+        self.assertEqual(self.validate(*paths)[1], [])
+
+    def test_broken_references(self):
+        first = self.write('first.xml', """
+    <record id="patient_1" model="nh.clinical.patient" />
+    <record id="spell_1" model="nh.activity">
+      <field name="patient_id" ref="nh_eobs_demo.patient_1" />
+      <field name="location_id" ref="ward_x" />
+      <field name="user_ids" eval="[(6, 0, [ref('user_1')])]" />
+      <field name="group_id" ref="nh_clinical.group_nhc_nurse" />
+    </record>
+    <record id="spell_1" model="nh.activity">
+      <field name="data_ref" eval="{0}" />
+    </record>""".format("'nh.clinical.spell,' + str(ref('patient_1'))"))
+        second = self.write('second.xml', """
+    <record id="user_1" model="res.users" />""")
+        validator, errors = self.validate(first, second)
+        self.assertEqual(sorted(errors), [
+            (first, 'spell_1', 'data_ref', 'patient_1', WRONG_MODEL, 1),
+            (first, 'spell_1', 'location_id', 'ward_x', MISSING, 1),
+            (first, 'spell_1', 'user_ids', 'user_1', FORWARD, 1)])
+        self.assertEqual(validator.records, 4)
+        self.assertEqual(validator.references, 5)
+        self.assertEqual(validator.external, 1)
+
+    def test_uses_counted_once_per_file(self):
+        path = self.write('data.xml', """
+    <record id="a_1" model="nh.activity">
+      <field name="patient_id" ref="patient_9" />
+    </record>
+    <record id="a_2" model="nh.activity">
+      <field name="patient_id" ref="patient_9" />
+    </record>""")
+        errors = self.validate(path)[1]
+        self.assertEqual(errors, [
+            (path, 'a_1', 'patient_id', 'patient_9', MISSING, 2)])
+
+    def test_parallel(self):
+        first = self.write('first.xml', """
+    <record id="patient_1" model="nh.clinical.patient" />""")
+        second = self.write('second.xml', """
+    <record id="spell_1" model="nh.activity">
+      <field name="patient_id" ref="patient_1" />
+      <field name="parent_id" ref="spell_0" />
+    </record>""")
+        self.assertEqual(
+            self.validate(first, second, jobs=2)[1],
+            [(second, 'spell_1', 'parent_id', 'spell_0', MISSING, 1)])
+
+    def test_other_files_opt_in(self):
+        """
+        Make sure only the data files are checked unless other files are
+        asked for, and the export folders are always left out
+        """
+        DemoDataCoordinator(DemoDataConfig(
+            ['a'], 4, 3, 1,
+            {'nurse': {'total': 2, 'per_ward': 1, 'unassigned': 0}},
+            self.folder, seed=1, output_format='copy')).run()
+        extra = self.write('extra.xml', '')
+
+        paths = get_load_order(self.folder)
+        self.assertEqual(paths, get_data_file_paths(self.folder))
+        self.assertEqual(get_load_order(self.folder, True), paths + [extra])
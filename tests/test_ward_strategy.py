@@ -5,7 +5,7 @@ from demo_data_generators.placements import PlacementsGenerator
 from demo_data_generators.patients import PatientsGenerator
 from demo_data_generators.users import UsersGenerator
 from demo_data_generators.ward_strategy import patients_factory, WardStrategy,\
-    get_hca_nurse_users, get_role, Patient
+    get_hca_nurse_users, get_role, Patient, index_records
 
 
 class TestWardStrategy(unittest.TestCase):
@@ -19,10 +19,11 @@ class TestWardStrategy(unittest.TestCase):
         """
         bed_patient = PatientsGenerator(0, 2, 0, 'a')
         self.gen = PlacementsGenerator(bed_patient, [-1, -2])
-        self.patients = patients_factory(self.gen.root)
+        self.patients = patients_factory(self.gen.root,
+                                         self.gen.admit_offsets)
         risk = {'high': 1, 'medium': 2, 'low': 10, 'none': 15}
         self.user_ids = ['user_1', 'user_2']
-        self.strategy = WardStrategy(self.patients, self.user_ids, risk, 1, 1,
+        self.strategy = WardStrategy(self.patients, self.user_ids, risk, 1,
                                      [30])
 
     def test_pick_user_id(self):
@@ -71,8 +72,17 @@ class TestPatient(unittest.TestCase):
 
         self.assertEqual(patient.id, '12')
 
+    def test_placements_admit_offsets(self):
+        self.assertEqual(self.gen.admit_offsets, {'nhc_demo_patient_0': -1,
+                                                  'nhc_demo_patient_1': -2})
+
+    def test_patients_factory_admit_offset(self):
+        patients = patients_factory(self.gen.root, self.gen.admit_offsets)
+
+        self.assertEqual([p.admit_offset for p in patients], [-1, -2])
+
     def test_patients_factory(self):
-        patients = patients_factory(self.gen.root)
+        patients = patients_factory(self.gen.root, self.gen.admit_offsets)
         patient_1 = patients[0]
         patient_2 = patients[1]
 
@@ -97,7 +107,16 @@ class TestPatient(unittest.TestCase):
         self.assertEqual(patient_2.spell_activity_id,
                          'nhc_activity_demo_spell_1')
 
+    def test_index_records(self):
+        records = index_records(self.gen.root)
 
+        activity = records['nhc_activity_demo_placement_0']
+        self.assertEqual(len(activity), 2)
+        self.assertEqual(activity[0]['spell_activity_id'].attrib['ref'],
+                         'nhc_activity_demo_spell_0')
+        self.assertTrue('data_ref' in activity[1])
 
-
-
+        placement = records['nhc_demo_placement_1']
+        self.assertEqual(len(placement), 1)
+        self.assertEqual(placement[0]['patient_id'].attrib['ref'],
+                         'nhc_demo_patient_1')